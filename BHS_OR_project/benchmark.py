@@ -0,0 +1,347 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from instance import *
+from solver import *
+
+# Sizes of the benchmark instances: (num_sources, num_intermediates, baggage
+# per source). The number of destinations is the number of sources.
+BENCHMARK_SIZES = [(4, 6, 1000), (4, 6, 10000), (8, 12, 100000),
+                   (8, 12, 1000000)]
+
+# Steps measured for each size: the instance generation and the solvers
+BENCHMARK_STEPS = ("generation", "min_cost_computation",
+                   "local_search_with_neighborhood",
+                   "aggregated_flow_computation", "exact_computation")
+
+# Relative optimality gap accepted by 'exact_computation' in the benchmark:
+# on the large instances the proof of the last fraction of the gap takes
+# much longer than the solution itself
+EXACT_GAP = 1e-6
+
+# Default tolerances used to flag a regression with respect to the baseline:
+# relative increase of time and peak memory, and time differences below
+# 'MIN_TIME_DIFFERENCE' seconds are ignored since they are just noise.
+TIME_TOLERANCE = 0.2
+MEMORY_TOLERANCE = 0.2
+MIN_TIME_DIFFERENCE = 0.05
+
+
+def build_benchmark_instance(size, seed, degree = None):
+
+    """ It builds the instance of a benchmark size with the vectorized
+    generator. Each source has exactly the given number of baggage and the
+    belt capacities are chosen so that about half of the S -> I capacity is
+    needed, keeping the instance feasible at any size. If 'degree' is given
+    the network is sparse, each source being linked to 'degree' intermediate
+    nodes (see 'draw_topology'). It returns G and edges_list. """
+
+    num_sources, num_intermediates, num_baggage = size
+
+    links = num_intermediates if degree is None else min(degree, num_intermediates)
+    min_c = max(1, 2*num_baggage // links)
+    max_c = 2*min_c
+
+    G, sources, intermediates, destinations = create_tripartite_graph_nodes(num_sources=num_sources, num_destinations=num_sources, num_intermediates=num_intermediates, seed=seed, min_baggage=num_baggage, max_baggage=num_baggage, vectorized=True)
+    graph, edges_list = generate_edges(G, sources, intermediates, destinations, seed=seed, min_c=min_c, max_c=max_c, vectorized=True, degree=degree)
+
+    return G, edges_list
+
+
+def objective(baggage_path):
+
+    """ Sum of the baggage consumption of a 'min_cost_computation' or
+    'aggregated_flow_computation' solution (any number of belts per path),
+    or None if it is infeasible. """
+
+    if not baggage_path:
+        return None
+
+    return total_consumption(baggage_path)
+
+
+def measure_step(step, size, seed, lns_iterations, measure_memory = True,
+                 repeat = 1, degree = None):
+
+    """
+    This function measures one benchmark step. It returns a dictionary with:
+    - time: wall time of the step [s], the best one of 'repeat' runs
+    - peak_memory: peak of the memory allocated by Python during the step
+      [bytes], measured with tracemalloc (None if 'measure_memory' is False)
+    - of: objective function of the solution (None for the generation or an
+      infeasible solution)
+    Since tracemalloc slows down the code, the time and the memory are
+    measured in two different runs of the step.
+
+    """
+
+    def run(instance):
+
+        if step == "generation":
+            build_benchmark_instance(size, seed, degree)
+            return None
+
+        G, edges_list = instance
+
+        if step == "min_cost_computation":
+            return objective(min_cost_computation(G, edges_list))
+
+        if step == "aggregated_flow_computation":
+            return objective(aggregated_flow_computation(G, edges_list))
+
+        if step == "exact_computation":
+            return objective(exact_computation(G, edges_list, gap=EXACT_GAP))
+
+        baggage_path, of = local_search_with_neighborhood(G, edges_list, max_iterations=lns_iterations, seed=seed)
+        return of
+
+    def new_instance():
+        if step == "generation":
+            return None
+        return build_benchmark_instance(size, seed, degree)
+
+    wall_time = None
+
+    for r in range(repeat):
+
+        instance = new_instance()
+        time_start = time.perf_counter()
+        of = run(instance)
+        run_time = time.perf_counter() - time_start
+
+        if wall_time is None or run_time < wall_time:
+            wall_time = run_time
+
+    peak_memory = None
+
+    if measure_memory:
+
+        instance = new_instance()
+        tracemalloc.start()
+        try:
+            run(instance)
+            current_memory, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return {"time": wall_time, "peak_memory": peak_memory, "of": of}
+
+
+def run_benchmark(sizes = BENCHMARK_SIZES, steps = BENCHMARK_STEPS, seed = 0,
+                  lns_iterations = 20, measure_memory = True, repeat = 1,
+                  degree = None, verbose = True):
+
+    """ It runs all the benchmark 'steps' for each size of 'sizes' and it
+    returns a benchmark run, i.e. a dictionary with the run information
+    (date, git commit, Python version, parameters) and the list of the
+    'results', one for each (size, step). """
+
+    results = []
+
+    for size in sizes:
+        for step in steps:
+
+            result = measure_step(step, size, seed, lns_iterations,
+                                  measure_memory, repeat, degree)
+            result = dict({"size": list(size), "step": step}, **result)
+            results.append(result)
+
+            if verbose:
+                print(format_result(result))
+
+    return {
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "seed": seed,
+        "lns_iterations": lns_iterations,
+        "repeat": repeat,
+        "degree": degree,
+        "results": results,
+    }
+
+
+def git_commit():
+
+    """ It returns the current git commit hash, or None if it is not
+    available. """
+
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                              cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def format_result(result):
+
+    """ One line description of a benchmark result. """
+
+    size = "x".join(str(value) for value in result["size"])
+    memory = (f"{result['peak_memory']/2**20:.1f} MB"
+              if result["peak_memory"] is not None else "-")
+    of = f"{result['of']:.2f}" if result["of"] is not None else "-"
+
+    return f"{size:>14} {result['step']:>32} {result['time']:9.3f} s {memory:>10} OF {of}"
+
+
+def load_history(path):
+
+    """ It returns the list of the benchmark runs saved in the JSON history
+    file 'path' (empty if the file does not exist). """
+
+    if not os.path.exists(path):
+        return []
+
+    with open(path) as file:
+        return json.load(file)
+
+
+def save_json(path, data):
+
+    with open(path, "w") as file:
+        json.dump(data, file, indent=2)
+
+
+def find_regressions(run, baseline, time_tolerance = TIME_TOLERANCE,
+                     memory_tolerance = MEMORY_TOLERANCE,
+                     min_time_difference = MIN_TIME_DIFFERENCE):
+
+    """
+    This function compares a benchmark 'run' with a 'baseline' run and it
+    returns the list of the regressions found, as strings. For each (size,
+    step) measured in both runs:
+    - time: the time grew more than 'time_tolerance' (relative) and more
+      than 'min_time_difference' seconds.
+    - memory: the peak memory grew more than 'memory_tolerance' (relative).
+    - objective: the solution became infeasible or its objective function
+      got worse (the objective is minimized).
+
+    """
+
+    baseline_results = {(tuple(result["size"]), result["step"]): result
+                        for result in baseline["results"]}
+
+    regressions = []
+
+    for result in run["results"]:
+
+        key = (tuple(result["size"]), result["step"])
+        base = baseline_results.get(key)
+        if base is None:
+            continue
+
+        name = f"{'x'.join(str(value) for value in key[0])} {key[1]}"
+
+        if (result["time"] > base["time"]*(1 + time_tolerance) and
+                result["time"] - base["time"] > min_time_difference):
+            regressions.append(f"{name}: time {base['time']:.3f} s -> {result['time']:.3f} s")
+
+        if (result["peak_memory"] is not None and base["peak_memory"] is not None
+                and result["peak_memory"] > base["peak_memory"]*(1 + memory_tolerance)):
+            regressions.append(f"{name}: peak memory {base['peak_memory']/2**20:.1f} MB -> {result['peak_memory']/2**20:.1f} MB")
+
+        if base["of"] is not None:
+            if result["of"] is None:
+                regressions.append(f"{name}: the solution became infeasible")
+            elif result["of"] > base["of"]*(1 + 1e-9):
+                regressions.append(f"{name}: objective {base['of']:.2f} -> {result['of']:.2f}")
+
+    return regressions
+
+
+def parse_size(text):
+
+    """ Argument type of --sizes: it converts "SxIxB" in the tuple (S, I,
+    B) of positive integers, or it raises an ArgumentTypeError, so that the
+    parser reports the invalid size. """
+
+    try:
+        size = tuple(int(value) for value in text.split("x"))
+    except ValueError:
+        size = ()
+
+    if len(size) != 3 or min(size) < 1:
+        raise argparse.ArgumentTypeError(f"invalid size '{text}', expected SxIxB "
+                                         "with positive integers")
+
+    return size
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Scaling benchmark of the "
+                                     "instance generation and of the solvers.")
+    parser.add_argument("--sizes", nargs="+", metavar="SxIxB", type=parse_size,
+                        help="instance sizes as sources x intermediates x "
+                        "baggage per source (default: "
+                        + " ".join("x".join(map(str, size)) for size in BENCHMARK_SIZES) + ")",
+                        default=list(BENCHMARK_SIZES))
+    parser.add_argument("--steps", nargs="+", choices=BENCHMARK_STEPS,
+                        default=list(BENCHMARK_STEPS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--lns-iterations", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="timed runs of each step, the best one is kept")
+    parser.add_argument("--degree", type=int, default=None,
+                        help="intermediate nodes linked to each source "
+                        "(sparse network, default: complete network)")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="do not measure the peak memory")
+    parser.add_argument("--history", default="benchmark_history.json",
+                        help="JSON file where the runs are appended")
+    parser.add_argument("--baseline", default="benchmark_baseline.json",
+                        help="JSON file of the reference run")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="store this run as the new baseline")
+    parser.add_argument("--time-tolerance", type=float, default=TIME_TOLERANCE)
+    parser.add_argument("--memory-tolerance", type=float, default=MEMORY_TOLERANCE)
+    args = parser.parse_args()
+
+    run = run_benchmark(args.sizes, args.steps, args.seed, args.lns_iterations,
+                        not args.no_memory, max(1, args.repeat), args.degree)
+
+    # the run is appended to the history
+    history = load_history(args.history)
+    history.append(run)
+    save_json(args.history, history)
+
+    if args.save_baseline:
+        save_json(args.baseline, run)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline found ({args.baseline}): use --save-baseline to store one")
+        return 0
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+
+    if baseline.get("degree") != run["degree"]:
+        print(f"\nThe baseline ({baseline['commit']}) was measured on a different "
+              "network degree: no comparison")
+        return 0
+
+    regressions = find_regressions(run, baseline, args.time_tolerance,
+                                   args.memory_tolerance)
+
+    if regressions:
+        print(f"\nRegressions with respect to the baseline ({baseline['commit']}):")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+
+    print(f"\nNo regressions with respect to the baseline ({baseline['commit']})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,52 @@
 from .graph_gen import create_tripartite_graph_nodes
 from .graph_gen import generate_edges
 from .graph_gen import plot_graph
+from .graph_gen import draw_belt_data
+from .graph_gen import draw_topology
+from .graph_gen import check_adjacency
+from .graph_gen import build_belt_index
+from .graph_gen import get_belt_index
+from .graph_gen import get_belt_store
+from .graph_gen import get_graph_core
 
 from .instance_gen import Conveyor_belt
 from .instance_gen import Baggage
 
+from .belt_store import Belt_store
+from .belt_store import build_belt_store
+
+from .baggage_table import Baggage_table
+from .baggage_table import get_baggage_table
+
+from .graph_core import Graph_core
+from .graph_core import build_graph_core
+
+from .instance_cache import save_instance
+from .instance_cache import load_instance
+from .instance_cache import cached_instance
+from .instance_cache import instance_directory
+
 __all__ = [
     "create_tripartite_graph_nodes",
     "generate_edges",
     "plot_graph",
+    "draw_belt_data",
+    "draw_topology",
+    "check_adjacency",
+    "build_belt_index",
+    "get_belt_index",
+    "get_belt_store",
+    "get_graph_core",
     "Conveyor_belt",
     "Baggage",
+    "Belt_store",
+    "build_belt_store",
+    "Baggage_table",
+    "get_baggage_table",
+    "Graph_core",
+    "build_graph_core",
+    "save_instance",
+    "load_instance",
+    "cached_instance",
+    "instance_directory",
 ]
\ No newline at end of file
@@ -0,0 +1,75 @@
+import numpy as np
+from .instance_gen import Baggage
+
+class Baggage_table:
+
+    """ Columnar store of all the baggage of an instance. Instead of one
+    Baggage object per bag, each attribute is a NumPy array and a bag is
+    identified by its row in the table. Start and destination are stored as
+    indexes in the 'sources' and 'destinations' name lists, so that the
+    graph nodes can hold just ranges or lists of rows as buffers. """
+
+    def __init__(self, id, weight, start, destination, sources, destinations):
+
+        # baggage identification numbers
+        self.id = np.asarray(id, dtype=np.int64)
+        # baggage weights (the dtype of the given values is kept)
+        self.weight = np.asarray(weight)
+        # index of the baggage input node in 'sources'
+        self.start = np.asarray(start, dtype=np.int32)
+        # index of the baggage output node in 'destinations'
+        self.destination = np.asarray(destination, dtype=np.int32)
+
+        # node names related to the start and destination indexes
+        self.sources = list(sources)
+        self.destinations = list(destinations)
+
+
+    def __len__(self):
+        return len(self.id)
+
+
+    def baggage(self, row):
+
+        """ It returns a Baggage instance with the data of the given row. It
+        is used when some code needs a single object instead of the arrays. """
+
+        return Baggage(self.weight[row].item(),
+                       self.sources[self.start[row]],
+                       self.destinations[self.destination[row]],
+                       self.id[row].item())
+
+
+    def row_selector(self, rows):
+
+        """ It converts a range or a list of rows in an object selecting them
+        from the table arrays: a slice for a range (no copy is made) or an
+        array of indexes. """
+
+        if isinstance(rows, range):
+            return slice(rows.start, rows.stop)
+
+        return np.asarray(rows, dtype=np.int64)
+
+
+    def rows_data(self, rows):
+
+        """ Given a range or a list of rows, it returns three Python lists with
+        the baggage ids, weights and destination names of those rows. Python
+        values are faster than NumPy scalars when the heuristics scan the
+        baggage one by one. """
+
+        rows = self.row_selector(rows)
+
+        destination_names = [self.destinations[d]
+                             for d in self.destination[rows].tolist()]
+
+        return self.id[rows].tolist(), self.weight[rows].tolist(), destination_names
+
+
+def get_baggage_table(graph):
+
+    """ It returns the Baggage_table stored in the graph by
+    'create_tripartite_graph_nodes'. """
+
+    return graph.graph["baggage_table"]
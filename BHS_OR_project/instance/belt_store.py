@@ -0,0 +1,106 @@
+import numpy as np
+
+class Belt_store:
+
+    """ Struct-of-arrays container of the conveyor belt state. Each array is
+    indexed by the belt id, so the position 0 is never used since ids start
+    from 1. Conveyor_belt instances created by 'generate_edges' are thin views
+    over one row of these arrays, so the heuristics can either work on a
+    single belt or evaluate a whole set of candidate belts with one
+    vectorized call. """
+
+    def __init__(self, size):
+
+        # size is the largest belt id + 1
+        self.size = size
+
+        # static data of the belts
+        self.max_capacity = np.zeros(size, dtype=np.int64)
+        self.max_weight = np.zeros(size, dtype=np.float64)
+        self.power = np.zeros(size, dtype=np.float64)
+
+        # residual capacity and weight on the belts
+        self.capacity_available = np.zeros(size, dtype=np.int64)
+        self.weight_available = np.zeros(size, dtype=np.float64)
+
+        # total weight of the baggage sent through the belts
+        self.total_weight = np.zeros(size, dtype=np.float64)
+
+
+    def add_belt(self, id, capacity, weight, power):
+
+        """ It initializes the row 'id' with the belt data. The residual values
+        start from the maximum ones since the belt is empty. """
+
+        self.max_capacity[id] = capacity
+        self.max_weight[id] = weight
+        self.power[id] = power
+        self.capacity_available[id] = capacity
+        self.weight_available[id] = weight
+        self.total_weight[id] = 0
+
+
+    def check_candidates(self, ids, baggage_weight):
+
+        """ Given an array of belt ids 'ids' and the weight of a baggage, it
+        checks all the candidate belts at once. It returns:
+        - feasible: boolean mask of the belts having enough capacity and
+          weight available to take the baggage
+        - baggage_consumption: consumption related only to that baggage
+        - total_consumption: total belt consumption if the baggage was added
+        Nothing is modified, so the belt state is the same after the call."""
+
+        feasible = ((self.capacity_available[ids] - 1 >= 0) &
+                    (self.weight_available[ids] - baggage_weight >= 0))
+
+        power = self.power[ids]
+        baggage_consumption = baggage_weight * power
+        total_consumption = (self.total_weight[ids] + baggage_weight) * power
+
+        return feasible, baggage_consumption, total_consumption
+
+
+    def commit(self, id, baggage_weight):
+
+        """ It adds a baggage of the given weight to the belt 'id', updating
+        its residual capacity and weight and its total weight. """
+
+        self.capacity_available[id] -= 1
+        self.weight_available[id] -= baggage_weight
+        self.total_weight[id] += baggage_weight
+
+
+    def release(self, id, baggage_weight):
+
+        """ It removes a baggage of the given weight from the belt 'id'. It is
+        the opposite of 'commit', used when a baggage is moved to another 
+        path. """
+
+        self.capacity_available[id] += 1
+        self.weight_available[id] += baggage_weight
+        self.total_weight[id] -= baggage_weight
+
+
+    def commit_bulk(self, id, count, weight):
+
+        """ It adds 'count' baggage with total weight 'weight' to the belt 
+        'id' at once. It is the same of calling 'commit' for each baggage. """
+
+        self.capacity_available[id] -= count
+        self.weight_available[id] -= weight
+        self.total_weight[id] += weight
+
+
+def build_belt_store(edges_list):
+
+    """ It builds a Belt_store from an 'edges_list' whose conveyor belts were
+    created one by one, binding each belt to a row of the new store. The
+    current belt statistics are copied, so nothing is lost. """
+
+    belts = [edge["info"] for edge in edges_list.values()]
+    store = Belt_store(max([belt.id for belt in belts], default=0) + 1)
+
+    for belt in belts:
+        belt.bind(store)
+
+    return store
@@ -0,0 +1,185 @@
+import networkx as nx
+import numpy as np
+
+# node kinds of the Graph_core
+SOURCE = 0
+INTERMEDIATE = 1
+DESTINATION = 2
+
+class Graph_core:
+
+    """ Compact integer-indexed description of the BHS network. Nodes are
+    numbered from 0 (sources, then intermediates, then destinations) and the
+    belts keep their ids, so the solvers can work on NumPy arrays instead of
+    networkx attribute dictionaries with string keys. The belts leaving a
+    node are stored in CSR format: the ids of the belts leaving the node 'n'
+    are adjacency[indptr[n]:indptr[n+1]], in the order they were generated.
+    The numeric data of the belts are the ones of the Belt_store 'store'.
+    A networkx graph is built only when needed, with 'to_networkx'. """
+
+    def __init__(self, sources, intermediates, destinations, store):
+
+        # node names and kinds, and the index of each name
+        self.node_names = list(sources) + list(intermediates) + list(destinations)
+        self.node_index = {name: n for n, name in enumerate(self.node_names)}
+        self.node_kind = np.array([SOURCE]*len(sources) +
+                                  [INTERMEDIATE]*len(intermediates) +
+                                  [DESTINATION]*len(destinations), dtype=np.int8)
+        self.num_nodes = len(self.node_names)
+
+        # node indexes of each kind, in the order of the name lists
+        self.sources = np.arange(len(sources))
+        self.intermediates = np.arange(len(sources), len(sources) + len(intermediates))
+        self.destinations = np.arange(len(sources) + len(intermediates), self.num_nodes)
+
+        # demand of the nodes (negative for the sources)
+        self.demand = np.zeros(self.num_nodes, dtype=np.int64)
+
+        # belt data, indexed by the belt id (the row 0 is not used)
+        self.store = store
+        self.tail = np.full(store.size, -1, dtype=np.int32) # input node
+        self.head = np.full(store.size, -1, dtype=np.int32) # output node
+
+        # security state of the links I -> D, indexed by the belt id: number
+        # and weight of the baggage already sent to the intermediate node of
+        # the belt and directed to its destination. They replace the
+        # 'current_edge_capacity' and 'current_edge_weight' node attributes.
+        self.reserved_capacity = np.zeros(store.size, dtype=np.int64)
+        self.reserved_weight = np.zeros(store.size, dtype=np.float64)
+
+        # CSR adjacency, built by 'build_adjacency'
+        self.indptr = np.zeros(self.num_nodes + 1, dtype=np.int64)
+        self.adjacency = np.empty(0, dtype=np.int64)
+
+        # sorted (tail, head) keys of the belts and their ids, built by
+        # 'find_belts' the first time it is called
+        self.pair_keys = None
+        self.pair_ids = None
+
+
+    def add_belt(self, id, input_node, output_node):
+
+        """ It records the end nodes (names) of the belt 'id'. The adjacency
+        must be built again with 'build_adjacency' after adding belts. """
+
+        self.tail[id] = self.node_index[input_node]
+        self.head[id] = self.node_index[output_node]
+
+
+    def build_adjacency(self):
+
+        """ It builds the CSR adjacency from the end nodes of the belts. """
+
+        ids = np.flatnonzero(self.tail >= 0)
+        order = np.argsort(self.tail[ids], kind='stable')
+
+        self.adjacency = ids[order].astype(np.int64)
+        self.indptr = np.zeros(self.num_nodes + 1, dtype=np.int64)
+        self.indptr[1:] = np.cumsum(np.bincount(self.tail[ids], minlength=self.num_nodes))
+
+        self.pair_keys = None
+        self.pair_ids = None
+
+
+    def out_belts(self, n):
+
+        """ Ids of the belts leaving the node of index 'n'. """
+
+        return self.adjacency[self.indptr[n]:self.indptr[n+1]]
+
+
+    def out_belts_of(self, nodes):
+
+        """ Ids of the belts leaving any of the nodes of the array 'nodes',
+        gathered from the CSR adjacency with one vectorized call. """
+
+        starts = self.indptr[nodes]
+        counts = self.indptr[np.asarray(nodes) + 1] - starts
+
+        # position of each belt in the adjacency: the start of its node plus
+        # its offset among the belts of the node
+        positions = (np.repeat(starts - np.cumsum(counts) + counts, counts) +
+                     np.arange(counts.sum()))
+
+        return self.adjacency[positions]
+
+
+    def find_belts(self, tails, heads):
+
+        """ Vectorized search of the belts linking the nodes tails[k] to the
+        nodes heads[k] (node indexes). It returns the array of their ids,
+        with 0 where there is no such belt. Each search is a binary search on
+        the sorted (tail, head) keys, so no dense node x node table is
+        needed. """
+
+        if self.pair_keys is None:
+            keys = self.tail[self.adjacency].astype(np.int64)*self.num_nodes + self.head[self.adjacency]
+            order = np.argsort(keys, kind='stable')
+            self.pair_keys = keys[order]
+            self.pair_ids = self.adjacency[order]
+
+        keys = (np.asarray(tails, dtype=np.int64)*self.num_nodes +
+                np.asarray(heads, dtype=np.int64))
+
+        if len(self.pair_keys) == 0:
+            return np.zeros(len(keys), dtype=np.int64)
+
+        positions = np.minimum(np.searchsorted(self.pair_keys, keys),
+                               len(self.pair_keys) - 1)
+
+        return np.where(self.pair_keys[positions] == keys,
+                        self.pair_ids[positions], 0)
+
+
+    def find_belt(self, input_node, output_node):
+
+        """ Id of the belt linking two nodes (names), or 0 if it does not
+        exist. """
+
+        return int(self.find_belts([self.node_index[input_node]],
+                                   [self.node_index[output_node]])[0])
+
+
+    def to_networkx(self):
+
+        """ It exports the network as a networkx DiGraph, e.g. to plot it or to
+        check it with the networkx algorithms. Nodes have the 'demand'
+        attribute and edges the 'capacity', 'weight', 'power' and 'id' ones
+        (the maximum values of the belts), like the graphs built by
+        'generate_edges' before the Graph_core was introduced. """
+
+        G = nx.DiGraph()
+
+        for n, name in enumerate(self.node_names):
+            G.add_node(name, demand=int(self.demand[n]))
+
+        for id in self.adjacency.tolist():
+            G.add_edge(self.node_names[self.tail[id]], self.node_names[self.head[id]],
+                       capacity=int(self.store.max_capacity[id]),
+                       weight=float(self.store.max_weight[id]),
+                       power=float(self.store.power[id]), id=id)
+
+        return G
+
+
+def build_graph_core(graph, edges_list, store):
+
+    """ It builds the Graph_core of a graph whose nodes were created by
+    'create_tripartite_graph_nodes', with the belts of 'edges_list' (stored
+    in the Belt_store 'store'). """
+
+    names = list(graph.nodes)
+    core = Graph_core([name for name in names if name.startswith('S')],
+                      [name for name in names if name.startswith('I')],
+                      [name for name in names if name.startswith('D')], store)
+
+    for n, name in enumerate(core.node_names):
+        core.demand[n] = graph.nodes[name].get('demand', 0)
+
+    for edge in edges_list.values():
+        belt = edge["info"]
+        core.add_belt(belt.id, belt.input_node, belt.output_node)
+
+    core.build_adjacency()
+
+    return core
@@ -1,17 +1,23 @@
 import networkx as nx
 import matplotlib.pyplot as plt
 import random
-from networkx.algorithms.flow import min_cost_flow
+import numpy as np
 from .instance_gen import *
+from .belt_store import Belt_store, build_belt_store
+from .baggage_table import Baggage_table
+from .graph_core import build_graph_core
 
 def create_tripartite_graph_nodes(num_sources=2, num_destinations=2, 
     num_intermediates=3, seed = None, min_baggage = 10, max_baggage = 30, 
-    min_b_weight = 10, max_b_weight = 25):
+    min_b_weight = 10, max_b_weight = 25, vectorized = False):
     
     """This function exploits the networkx framework to build the graph nodes, 
         having as input parameters the number of inputs,intermediates and output
         nodes and data related to baggage. More in detail, upper and lower
-        bounds are specified for baggage amount and their weights"""
+        bounds are specified for baggage amount and their weights. If 
+        'vectorized' is True, all the random values are drawn in bulk from a 
+        seeded numpy.random.Generator instead of the 'random' module, which
+        is much faster for large instances."""
     
     # Step 1: fix the seed and verify that the number of input nodes is equal 
     # to the destinations
@@ -41,90 +47,120 @@ def create_tripartite_graph_nodes(num_sources=2, num_destinations=2,
     # Step 5: Define the supply at sources and corresponding demand 
     # at destinations
 
-    bag_id_index = 1 # index used to assign a unique identifier to each baggage
+    # All the baggage are stored in a columnar Baggage_table, whose arrays 
+    # are filled up with the following values. The bag identifier is its row
+    # in the table + 1.
+
+    if vectorized:
+
+        # All the supplies and baggage weights are drawn in bulk from a 
+        # NumPy Generator seeded with 'seed'. The distributions are the same
+        # (uniform integers with inclusive bounds) but the values differ from
+        # the ones of the 'random' module.
+
+        rng = np.random.default_rng(seed)
+
+        supplies = rng.integers(min_baggage, max_baggage, size=num_sources, 
+                                endpoint=True)
+        baggage_weight = rng.integers(min_b_weight, max_b_weight, 
+                                      size=int(supplies.sum()), endpoint=True)
+        baggage_start = np.repeat(np.arange(num_sources, dtype=np.int32), 
+                                  supplies)
+        # each source sends its baggage to the destination with its index;
+        # a copy, so that the two columns of the table are independent
+        baggage_destination = baggage_start.copy()
+        supplies = supplies.tolist()
+
+    else:
+
+        supplies = []
+        baggage_weight = []
+        baggage_start = []
+        baggage_destination = []
+
+        for i in range(num_sources):
+
+            # Random supply between min and max baggage
+            supply = random.randint(min_baggage,max_baggage)  
+            supplies.append(supply)
+
+            # all the baggages are created: their attributes (weight, 
+            # destination, start) are added to the table columns
+
+            # it starts from 0 since the upper bound is exclusive
+            for j in range(0,supply): 
+                
+                baggage_weight.append(random.randint(min_b_weight,max_b_weight))
+                baggage_start.append(i)
+                baggage_destination.append(i)
+
+    first_row = 0 # first table row of the node baggage
 
     for i in range(num_sources):
 
-        # Random supply between min and max baggage
-        supply = random.randint(min_baggage,max_baggage)  
+        supply = supplies[i]
         
         # G.nodes is a NodeView object. Specifying the node name following 
         # the sintax G.nodes['node_name'] you can access the node attributes. 
         # In this case there are 'demand' related to the number of baggages 
-        # generated or collected by that node, and 'baggage_list' that is a 
-        # dictionary where the key is a generic index j and the value is a 
-        # Baggage class instance
+        # generated or collected by that node, and 'baggage_list' that is the
+        # range of rows of the Baggage_table related to the node baggage
 
         # Store supply as negative demand
         G.nodes[f'S{i+1}']['demand'] = -supply
         
-        # initialize the data structure to collect all the info about baggage
-        # stored in the node
-        G.nodes[f'S{i+1}']['baggage_list'] = {} 
-
-        # Once the node structure is defined, all the baggages are created and 
-        # added to the baggage_list
-
-        # it starts from 0 since the upper bound is exclusive
-        for j in range(0,supply): 
-            
-            # a baggage is a Baggage class instance, so we need to define
-            # its attributes (weight,destination, start, id)
-            baggage_weight = random.randint(min_b_weight,max_b_weight)
-            baggage_destination = f'D{i+1}'
-            baggage_start = f'S{i+1}'
-            baggage_id = bag_id_index
-            baggage = Baggage(baggage_weight,baggage_start, baggage_destination,
-                               baggage_id)
-            bag_id_index += 1
-            
-            G.nodes[f'S{i+1}']['baggage_list'][j+1] = baggage
+        # the node buffer is the range of the table rows of its baggage
+        G.nodes[f'S{i+1}']['baggage_list'] = range(first_row, first_row + supply)
+        first_row += supply
         
-        # For destination and intermediate nodes, empty sets are created to be
-        # filled during the heuristic algorithm.
+        # For destination and intermediate nodes, empty lists are created to be
+        # filled with table rows during the heuristic algorithm.
         # Matching demand at the corresponding destination:
         G.nodes[f'D{i+1}']['demand'] = supply
-        G.nodes[f'D{i+1}']['baggage_list'] = {}
+        G.nodes[f'D{i+1}']['baggage_list'] = []
+
+    G.graph["baggage_table"] = Baggage_table(
+        np.arange(1, first_row + 1), baggage_weight, baggage_start,
+        baggage_destination, sources, destinations)
 
     # Step 6: set demand for intermediate nodes to zero
 
     for i in intermediates:
 
         G.nodes[i]['demand'] = 0
-        G.nodes[i]['baggage_list'] = {}
-
-        # The following parameters are used in MCF_heu.py for the security check
+        G.nodes[i]['baggage_list'] = []
 
-        # these parameters associated only to intermediate nodes, report the
-        # capacity and weight values of the links connecting 'i' to each
-        # destination nodes with the sintax {'destination name': weight/capacity}
-        G.nodes[i]["output_edge_capacity"] = {}
-        G.nodes[i]["output_edge_weight"] = {}
-
-        # these parameters have the same structure of the previous two but they
-        # are related to the total amount of weight and capacity used by those
-        # baggage that have already been sent to that given output link.
-        G.nodes[i]["current_edge_weight"] = {}
-        G.nodes[i]["current_edge_capacity"] = {}
-        
-        for d in destinations:
-            # destination values initialization
-            G.nodes[i]["current_edge_weight"][d] = 0
-            G.nodes[i]["current_edge_capacity"][d] = 0      
-        
-      
+        # The capacity and weight of the links connecting 'i' to each 
+        # destination, and the traffic already sent towards them, used by
+        # MCF_heu.py for the security check, are stored in the Graph_core
+        # built by 'generate_edges' (one value per belt).
 
     return G, sources, intermediates, destinations
 
 
 def generate_edges(graph, sources, intermediates, destinations, 
     seed = None, min_c = 10, max_c = 20, 
-    min_power = 1, max_power = 10 ):
+    min_power = 1, max_power = 10, vectorized = False, adjacency = None,
+    degree = None, stages = None):
    
     """This function aims to create graph edges with random capacities, wieghts
         and power coefficient. It receives as inputs the previous generated
         graph 'graph', the lists of nodes, and upper and lower
-        bounds values for weight, capacity and power of the edge """
+        bounds values for weight, capacity and power of the edge. If 
+        'vectorized' is True, the random values are drawn in bulk from a 
+        seeded numpy.random.Generator (see 'draw_belt_data').
+        By default the network is complete (every source is linked to every
+        intermediate node and every intermediate node to every destination).
+        A sparse network can be built giving its 'adjacency', an iterable of
+        (input node, output node) pairs S -> I, I -> I or I -> D, or a target
+        out 'degree' of the sources and of the intermediate nodes, to draw a 
+        random topology (see 'draw_topology').
+        A multi-stage network is built giving the number of intermediate
+        nodes of each stage in 'stages' (e.g. [4, 2] puts I1..I4 in the 
+        first stage and I5, I6 in the second one): the belts link each stage
+        to the next one, from the sources to the destinations (see 
+        'draw_stage_topology' for the sparse version). Multi-stage networks 
+        are routed by 'dag_routing_computation'."""
 
     # Step 1: fix the seed and initialize edge_list. It is a dictionary
     # { 'key': 'edge x to y', value: {'info': conveyor_belt instance} }.
@@ -136,79 +172,392 @@ def generate_edges(graph, sources, intermediates, destinations,
     edges_list = {}
     id_index = 1
 
-    # Step 2: Generate edges from source to intermediate nodes
-
-    for s in sources:
-
-        for i in intermediates:
-
-            # Random capacity
-            max_capacity = random.randint(min_c,max_c)
-
-            # Random weight related to the capacity. More capacity means
-            # more supported weight. Lower and upper bounds are choosen 
-            # as the product between the min capacity of the edge times
-            # the average weight of a baggage, and the max capacity of the edge
-            # times the maximum baggage weight.
-
-            max_weight = random.uniform(max_capacity*((25+10)/2), max_capacity*((25+10)/2) ) 
-            
-            # power coefficient
-            kp = random.uniform(0.00001*max_capacity*min_power,
-                                0.00001*max_capacity*max_power) 
-            
-            # Conveyor belt index
-            id = id_index 
-            id_index += 1
-            
-            # The edge is added to the graph through networkx function
-            graph.add_edge(s, i, capacity = max_capacity , weight = max_weight, 
-                           power = kp, id=id)
-            
-            # An equivalent edge object instance is created. It is easier to 
-            # be managed for next computations with respect to the graph 
-            # edge data
-            edge = Conveyor_belt(max_capacity,max_weight, kp, i, s, id)
-            
-            info = {}
-            info["info"] = edge
-            edges_list[f"edge {s} to {i}"] = info
-
-    # Step 3: Generate edges form Intermediate to Destination nodes
-    for i in intermediates:
+    # The pairs of nodes linked by a belt, (input node, output node): first 
+    # the ones from source to intermediate nodes, then the ones between the
+    # intermediate stages (if any) and the ones from intermediate to 
+    # destination nodes.
+
+    if adjacency is not None and (degree is not None or stages is not None):
+        raise ValueError("the adjacency already defines the network, degree and stages cannot be given")
+
+    if stages is not None:
+        layers = [sources] + split_stages(intermediates, stages) + [destinations]
+    else:
+        layers = [sources, intermediates, destinations]
+
+    if adjacency is not None:
+        pairs = check_adjacency(adjacency, sources, intermediates, destinations)
+    elif degree is not None and stages is not None:
+        pairs = draw_stage_topology(layers, degree, seed)
+    elif degree is not None:
+        pairs = draw_topology(sources, intermediates, destinations, degree, seed)
+    else:
+        pairs = [(u, v) for tails, heads in zip(layers[:-1], layers[1:])
+                 for u in tails for v in heads]
+
+    # All the belt numeric data are stored in a Belt_store, whose arrays are
+    # indexed by the belt id. Each Conveyor_belt is a view over its row.
+
+    num_belts = len(pairs)
+    belt_store = Belt_store(num_belts + 1)
+
+    # The random data of all the belts (capacity, weight, power) are drawn
+    # before building them, in the same order used to generate the edges
+
+    belt_data = iter(draw_belt_data(num_belts, seed, min_c, max_c, min_power, 
+                                    max_power, vectorized))
+
+    # Step 2: Generate the edges of the linked pairs. Only these pairs are
+    # visited, so the work grows with the number of belts.
+
+    for input_node, output_node in pairs:
+
+        # Random capacity, weight and power coefficient (see 
+        # 'draw_belt_data')
+        max_capacity, max_weight, kp = next(belt_data)
+        
+        # Conveyor belt index
+        id = id_index 
+        id_index += 1
+        
+        # The edge is created as a conveyor belt instance. Its data are
+        # not duplicated in networkx edge attributes: the Graph_core 
+        # built at the end gives the topology, and a networkx graph with
+        # the edges can be exported from it when needed.
+        edge = Conveyor_belt(max_capacity,max_weight, kp, output_node, 
+                             input_node, id, belt_store)
+        
+        info = {}
+        info["info"] = edge
+        edges_list[f"edge {input_node} to {output_node}"] = info
+
+    # Step 3: every source must reach its destination (the one with the 
+    # same index) through at least one intermediate node
 
-        for d in destinations:
-            
-            # Generate a random capacity for the edge, respecting the 
-            # intermediate node's capacity
-            max_capacity = random.randint(min_c, max_c)
-            max_weight = random.uniform(max_capacity*((25+10)/2), max_capacity*((25+10)/2) )
-            kp = random.uniform(0.00001*max_capacity*min_power,
-                                0.00001*max_capacity*max_power)
-            id = id_index
-            id_index += 1
-            
-            graph.add_edge(i, d, capacity = max_capacity, weight = max_weight, 
-                           power = kp, id = id)
-            edge = Conveyor_belt(max_capacity,max_weight, kp, d, i, id)
-            
-            info = {}
-            info["info"] = edge
-            edges_list[f"edge {i} to {d}"] = info
-
-            graph.nodes[i]["output_edge_capacity"][d] = max_capacity
-            graph.nodes[i]["output_edge_weight"][d] = max_weight
+    check_reachability(pairs, sources, destinations)
 
 
+    # Step 4: build the belt index once, so that the solvers can reach the 
+    # belts leaving a node (or linking two given nodes) without scanning 
+    # the whole edges_list for each baggage. It is stored among the graph
+    # attributes since it describes the same conveyor belt instances.
+
+    graph.graph["belt_index"] = build_belt_index(edges_list)
+    graph.graph["belt_store"] = belt_store
+
+    # Step 5: integer-indexed view of the network (CSR adjacency and NumPy
+    # arrays), used by the solvers instead of the networkx attributes.
+
+    graph.graph["graph_core"] = build_graph_core(graph, edges_list, belt_store)
+
     #plot_graph(len(intermediates), len(destinations), sources, intermediates, destinations, graph)
 
     return graph, edges_list
+
+
+def check_adjacency(adjacency, sources, intermediates, destinations):
+
+    """This function checks a given network 'adjacency', an iterable of
+        (input node, output node) pairs, and it returns it as a list with
+        the S -> I pairs first, then the I -> I ones and the I -> D pairs 
+        at the end (each group in the given order). A ValueError is raised 
+        for a pair that is not S -> I, I -> I or I -> D, for a belt from a
+        node to itself or for a repeated pair. Cycles among the 
+        intermediate nodes are found by the router (see 'Dag_router')."""
+
+    sources_set = set(sources)
+    intermediates_set = set(intermediates)
+    destinations_set = set(destinations)
+
+    first_stage = []
+    middle_stages = []
+    last_stage = []
+    seen = set()
+
+    for input_node, output_node in adjacency:
+
+        if (input_node, output_node) in seen:
+            raise ValueError(f"repeated belt {input_node} -> {output_node}")
+        seen.add((input_node, output_node))
+
+        if input_node in sources_set and output_node in intermediates_set:
+            first_stage.append((input_node, output_node))
+        elif (input_node in intermediates_set and output_node in intermediates_set
+                and input_node != output_node):
+            middle_stages.append((input_node, output_node))
+        elif input_node in intermediates_set and output_node in destinations_set:
+            last_stage.append((input_node, output_node))
+        else:
+            raise ValueError(f"invalid belt {input_node} -> {output_node}: "
+                             "belts must go from a source to an intermediate "
+                             "node, between two intermediate nodes or from an"
+                             " intermediate node to a destination")
+
+    return first_stage + middle_stages + last_stage
+
+
+def draw_topology(sources, intermediates, destinations, degree, seed = None):
+
+    """This function draws a random sparse topology: each source is linked 
+        to 'degree' random intermediate nodes (all of them if they are less)
+        and each intermediate node is linked to the destinations of its 
+        sources, so that every belt leaving a source can be used by its 
+        baggage. Intermediate nodes with less than 'degree' destinations are
+        linked to other random ones. The pairs are returned in the order of
+        the complete network, i.e. the one of 'generate_edges' without a 
+        topology."""
+
+    if degree < 1:
+        raise ValueError("the degree of the network must be at least 1")
+
+    rng = np.random.default_rng(seed)
+    num_intermediates = len(intermediates)
+    num_destinations = len(destinations)
+
+    # chosen intermediate nodes of each source (indexes)
+    source_links = [np.sort(rng.choice(num_intermediates, min(degree, num_intermediates), replace=False)).tolist()
+                    for s in sources]
+
+    # destinations of each intermediate node: the ones of its sources (the
+    # source k sends its baggage to the destination k)
+    intermediate_links = [set() for i in intermediates]
+
+    for k, links in enumerate(source_links):
+        for i in links:
+            intermediate_links[i].add(k)
+
+    for links in intermediate_links:
+
+        missing = min(degree, num_destinations) - len(links)
+
+        if missing > 0:
+            others = np.setdiff1d(np.arange(num_destinations), list(links))
+            links.update(rng.choice(others, missing, replace=False).tolist())
+
+    return ([(sources[k], intermediates[i]) for k, links in enumerate(source_links) for i in links] +
+            [(intermediates[i], destinations[d]) for i, links in enumerate(intermediate_links) for d in sorted(links)])
+
+
+def split_stages(intermediates, stages):
+
+    """This function splits the list of the intermediate nodes in stages of
+        the given sizes, in their order. A ValueError is raised if the sizes
+        do not match the number of intermediate nodes."""
+
+    if any(size < 1 for size in stages) or sum(stages) != len(intermediates):
+        raise ValueError(f"the stages {list(stages)} do not match the "
+                         f"{len(intermediates)} intermediate nodes")
+
+    bounds = np.cumsum([0] + list(stages)).tolist()
+
+    return [intermediates[bounds[k]:bounds[k+1]] for k in range(len(stages))]
+
+
+def draw_stage_topology(layers, degree, seed = None):
+
+    """This function draws a random sparse multi-stage topology. 'layers' 
+        is the list of the node lists: sources, intermediate stages and 
+        destinations. Like in 'draw_topology', each source is linked to 
+        'degree' random nodes of the first stage (all of them if they are
+        less), and from each of them a random chain of belts goes through 
+        the next stages up to the destination of the source, so that every
+        belt leaving a source can be used by its baggage. Intermediate 
+        nodes with less than 'degree' belts leaving them are linked to 
+        other random nodes of the next layer. The pairs are returned in the
+        order of the complete network."""
+
+    if degree < 1:
+        raise ValueError("the degree of the network must be at least 1")
+
+    rng = np.random.default_rng(seed)
+
+    # links[l][a]: indexes of the nodes of the layer l+1 linked to the
+    # node a of the layer l
+    links = [[set() for u in tails] for tails in layers[:-1]]
+
+    # chains from each source k to the destination k
+    for k in range(len(layers[0])):
+
+        first_nodes = rng.choice(len(layers[1]), min(degree, len(layers[1])), replace=False)
+
+        for b in first_nodes.tolist():
+
+            links[0][k].add(b)
+            a = b
+
+            for l in range(2, len(layers) - 1):
+                b = int(rng.integers(len(layers[l])))
+                links[l-1][a].add(b)
+                a = b
+
+            links[-1][a].add(k)
+
+    # random belts up to the degree of the intermediate nodes
+    for l in range(1, len(layers) - 1):
+        for node_links in links[l]:
+
+            missing = min(degree, len(layers[l+1])) - len(node_links)
+
+            if missing > 0:
+                others = np.setdiff1d(np.arange(len(layers[l+1])), list(node_links))
+                node_links.update(rng.choice(others, missing, replace=False).tolist())
+
+    return [(layers[l][a], layers[l+1][b]) for l in range(len(links))
+            for a in range(len(layers[l])) for b in sorted(links[l][a])]
+
+
+def check_reachability(pairs, sources, destinations):
+
+    """This function raises a ValueError if a source cannot reach its
+        destination (the one with the same index) through the belts of
+        'pairs'. The network is explored from each source with a depth 
+        first search, stopped as soon as the destination is found."""
+
+    successors = {}
+    for input_node, output_node in pairs:
+        successors.setdefault(input_node, []).append(output_node)
+
+    for s, d in zip(sources, destinations):
+
+        stack = [s]
+        visited = {s}
+        found = False
+
+        while stack and not found:
+            for node in successors.get(stack.pop(), []):
+                if node == d:
+                    found = True
+                    break
+                if node not in visited:
+                    visited.add(node)
+                    stack.append(node)
+
+        if not found:
+            raise ValueError(f"the source {s} cannot reach its destination")
+
+
+def draw_belt_data(num_belts, seed = None, min_c = 10, max_c = 20, 
+    min_power = 1, max_power = 10, vectorized = False):
+
+    """This function draws the random data of 'num_belts' conveyor belts and
+        returns them as a list of (capacity, weight, power coefficient) 
+        tuples. If 'vectorized' is True, all the values are drawn in bulk 
+        from a numpy.random.Generator seeded with 'seed', otherwise they are 
+        drawn one by one from the 'random' module (already seeded by 
+        'generate_edges')."""
+
+    if vectorized:
+
+        rng = np.random.default_rng(seed)
+
+        capacities = rng.integers(min_c, max_c, size=num_belts, endpoint=True)
+        weights = capacities*((25+10)/2)
+        powers = rng.uniform(0.00001*capacities*min_power,
+                             0.00001*capacities*max_power)
+
+        return list(zip(capacities.tolist(), weights.tolist(), powers.tolist()))
+
+    belt_data = []
+
+    for b in range(num_belts):
+
+        # Random capacity
+        max_capacity = random.randint(min_c,max_c)
+
+        # Random weight related to the capacity. More capacity means
+        # more supported weight. Lower and upper bounds are choosen 
+        # as the product between the min capacity of the edge times
+        # the average weight of a baggage, and the max capacity of the edge
+        # times the maximum baggage weight.
+
+        max_weight = random.uniform(max_capacity*((25+10)/2), max_capacity*((25+10)/2) ) 
+        
+        # power coefficient
+        kp = random.uniform(0.00001*max_capacity*min_power,
+                            0.00001*max_capacity*max_power) 
+
+        belt_data.append((max_capacity, max_weight, kp))
+
+    return belt_data
+
+
+def build_belt_index(edges_list):
+
+    """This function builds the lookup structures used by the heuristics to 
+        access the conveyor belts. It receives the 'edges_list' generated by
+        'generate_edges' and returns a dictionary with three views of the same
+        Conveyor_belt instances:
+        - 'by_nodes': {(input_node, output_node): conveyor belt}
+        - 'by_id': {belt id: conveyor belt}
+        - 'by_input': {input_node: [conveyor belts leaving that node]}, where
+          the belts keep the order in which they were generated.
+        - 'ids_by_input': {input_node: numpy array of the ids of the same
+          belts}, used for the vectorized checks on the Belt_store."""
+
+    belt_index = {"by_nodes": {}, "by_id": {}, "by_input": {}, 
+                  "ids_by_input": {}}
+
+    for edge in edges_list.values():
+
+        belt = edge["info"]
+
+        belt_index["by_nodes"][(belt.input_node, belt.output_node)] = belt
+        belt_index["by_id"][belt.id] = belt
+        belt_index["by_input"].setdefault(belt.input_node, []).append(belt)
+
+    for node, belts in belt_index["by_input"].items():
+        belt_index["ids_by_input"][node] = np.array([belt.id for belt in belts],
+                                                    dtype=np.int64)
+
+    return belt_index
+
+
+def get_belt_index(graph, edges_list):
+
+    """It returns the belt index stored in the graph by 'generate_edges'. If
+        the graph was built in a different way, the index is created from 
+        'edges_list' and stored for the next calls."""
+
+    if "belt_index" not in graph.graph:
+        graph.graph["belt_index"] = build_belt_index(edges_list)
+
+    return graph.graph["belt_index"]
+
+
+def get_belt_store(graph, edges_list):
+
+    """It returns the Belt_store stored in the graph by 'generate_edges'. If
+        the graph was built in a different way, the belts of 'edges_list' are
+        moved to a new store that is saved for the next calls."""
+
+    if "belt_store" not in graph.graph:
+        graph.graph["belt_store"] = build_belt_store(edges_list)
+
+    return graph.graph["belt_store"]
+
+
+def get_graph_core(graph, edges_list):
+
+    """It returns the Graph_core stored in the graph by 'generate_edges'. If
+        the graph was built in a different way, it is created from the nodes
+        of the graph and the belts of 'edges_list', and stored for the next
+        calls."""
+
+    if "graph_core" not in graph.graph:
+        graph.graph["graph_core"] = build_graph_core(
+            graph, edges_list, get_belt_store(graph, edges_list))
+
+    return graph.graph["graph_core"]
                 
 
 def plot_graph(num_intermediates, num_destinations, sources, intermediates, 
                destinations, G):
     
-    """Graph plot generation function"""
+    """Graph plot generation function. The edges are taken from the 
+        Graph_core of 'G', if it has one."""
+
+    if "graph_core" in G.graph:
+        G = G.graph["graph_core"].to_networkx()
 
     # Set positions for sources
     pos = {node: (0, i) for i, node in enumerate(sources + 
@@ -0,0 +1,252 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import networkx as nx
+import numpy as np
+from .instance_gen import Conveyor_belt
+from .belt_store import Belt_store
+from .baggage_table import Baggage_table, get_baggage_table
+from .graph_gen import (create_tripartite_graph_nodes, generate_edges,
+                        build_belt_index, get_belt_store)
+from .graph_core import build_graph_core
+
+# version of the on-disk format: it is part of the instance key, so the
+# instances written with an older format are simply built again
+CACHE_VERSION = 1
+
+# arrays of the Baggage_table saved in the instance directory. They are
+# reloaded through memory mapping since the solvers only read them.
+BAGGAGE_ARRAYS = ("id", "weight", "start", "destination")
+
+# arrays of the Belt_store saved in the instance directory. They are copied
+# in memory when reloaded since the solvers update the residual values.
+BELT_ARRAYS = ("max_capacity", "max_weight", "power", "capacity_available",
+               "weight_available", "total_weight")
+
+
+def instance_key(**params):
+
+    """ It returns the key of an instance, i.e. a hash of its generation
+    parameters (seed included) and of the format version. The same
+    parameters always give the same key. """
+
+    data = json.dumps(dict(params, version=CACHE_VERSION), sort_keys=True)
+
+    return hashlib.sha256(data.encode()).hexdigest()[:16]
+
+
+def save_instance(directory, G, sources, intermediates, destinations,
+                  edges_list, params = None):
+
+    """
+    This function writes an instance to 'directory' in a compact binary
+    format: one .npy file for each array of the Baggage_table and of the
+    Belt_store, plus a small 'header.json' with the node names, the source
+    buffers, the belt end nodes and the generation parameters 'params'. Only
+    instances not solved yet can be saved, since the intermediate and
+    destination buffers are not stored: otherwise a ValueError is raised.
+    The files are written in a temporary directory that is then renamed, so
+    a reader never finds an instance written only in part.
+
+    """
+
+    for node in intermediates + destinations:
+        if len(G.nodes[node]['baggage_list']) > 0:
+            raise ValueError("Only instances not solved yet can be saved.")
+
+    baggage_table = get_baggage_table(G)
+    belt_store = get_belt_store(G, edges_list)
+
+    belts = [edge["info"] for edge in edges_list.values()]
+
+    header = {
+        "version": CACHE_VERSION,
+        "params": params,
+        "sources": sources,
+        "intermediates": intermediates,
+        "destinations": destinations,
+        # range of the table rows stored in each source
+        "baggage_list": {source: [G.nodes[source]['baggage_list'].start,
+                                  G.nodes[source]['baggage_list'].stop]
+                         for source in sources},
+        # belt id, input node and output node, in the edges_list order
+        "belts": [[belt.id, belt.input_node, belt.output_node]
+                  for belt in belts],
+    }
+
+    parent = os.path.dirname(os.path.abspath(directory))
+    os.makedirs(parent, exist_ok=True)
+    temporary = tempfile.mkdtemp(dir=parent)
+
+    try:
+        for name in BAGGAGE_ARRAYS:
+            np.save(os.path.join(temporary, f"baggage_{name}.npy"),
+                    getattr(baggage_table, name))
+
+        for name in BELT_ARRAYS:
+            np.save(os.path.join(temporary, f"belt_{name}.npy"),
+                    getattr(belt_store, name))
+
+        with open(os.path.join(temporary, "header.json"), "w") as file:
+            json.dump(header, file)
+
+        os.rename(temporary, directory)
+
+    except OSError:
+        shutil.rmtree(temporary, ignore_errors=True)
+        # another process saved the same instance in the meantime
+        if not os.path.exists(os.path.join(directory, "header.json")):
+            raise
+
+
+def load_instance(directory, mmap = True):
+
+    """ This function reloads an instance written by 'save_instance'. The
+    baggage arrays are memory mapped (if 'mmap' is True), so they are read
+    from the disk only when needed and the processes loading the same
+    instance share their pages. The belt arrays are copied, since they are
+    updated by the solvers. It returns the same values of
+    'create_tripartite_graph_nodes' and 'generate_edges': G, sources,
+    intermediates, destinations, edges_list. """
+
+    with open(os.path.join(directory, "header.json")) as file:
+        header = json.load(file)
+
+    if header["version"] != CACHE_VERSION:
+        raise ValueError(f"Unsupported instance format {header['version']}.")
+
+    sources = header["sources"]
+    intermediates = header["intermediates"]
+    destinations = header["destinations"]
+
+    mmap_mode = 'r' if mmap else None
+
+    # Step 1: nodes and baggage
+
+    G = nx.DiGraph()
+    G.add_nodes_from(sources + intermediates + destinations)
+
+    baggage_arrays = {name: np.load(os.path.join(directory, f"baggage_{name}.npy"),
+                                    mmap_mode=mmap_mode)
+                      for name in BAGGAGE_ARRAYS}
+
+    G.graph["baggage_table"] = Baggage_table(
+        baggage_arrays["id"], baggage_arrays["weight"], baggage_arrays["start"],
+        baggage_arrays["destination"], sources, destinations)
+
+    for source, destination in zip(sources, destinations):
+
+        start, stop = header["baggage_list"][source]
+        supply = stop - start
+
+        G.nodes[source]['demand'] = -supply
+        G.nodes[source]['baggage_list'] = range(start, stop)
+        G.nodes[destination]['demand'] = supply
+        G.nodes[destination]['baggage_list'] = []
+
+    for i in intermediates:
+
+        G.nodes[i]['demand'] = 0
+        G.nodes[i]['baggage_list'] = []
+
+    # Step 2: conveyor belts, rebuilt over a Belt_store holding the saved
+    # values
+
+    belt_arrays = {name: np.load(os.path.join(directory, f"belt_{name}.npy"))
+                   for name in BELT_ARRAYS}
+
+    belt_store = Belt_store(len(belt_arrays["max_capacity"]))
+    edges_list = {}
+
+    for id, input_node, output_node in header["belts"]:
+
+        max_capacity = int(belt_arrays["max_capacity"][id])
+        max_weight = float(belt_arrays["max_weight"][id])
+        kp = float(belt_arrays["power"][id])
+
+        edge = Conveyor_belt(max_capacity, max_weight, kp, output_node,
+                             input_node, id, belt_store)
+        edges_list[f"edge {input_node} to {output_node}"] = {"info": edge}
+
+    # residual values, in case the instance was saved after some changes
+    for name in BELT_ARRAYS:
+        getattr(belt_store, name)[:] = belt_arrays[name]
+
+    G.graph["belt_index"] = build_belt_index(edges_list)
+    G.graph["belt_store"] = belt_store
+    G.graph["graph_core"] = build_graph_core(G, edges_list, belt_store)
+
+    return G, sources, intermediates, destinations, edges_list
+
+
+def cached_instance(cache_dir, num_sources=2, num_destinations=2,
+    num_intermediates=3, seed = None, min_baggage = 10, max_baggage = 30,
+    min_b_weight = 10, max_b_weight = 25, min_c = 10, max_c = 20,
+    min_power = 1, max_power = 10, vectorized = False, adjacency = None,
+    degree = None, stages = None, mmap = True):
+
+    """
+    This function returns the instance generated by
+    'create_tripartite_graph_nodes' and 'generate_edges' with the given
+    parameters, reading it from the cache directory 'cache_dir' when it was
+    already built. Otherwise the instance is generated and saved in
+    'cache_dir/<key>' (see 'instance_key') before being reloaded, so that
+    the result is the same in both cases. A fixed 'seed' is required, since
+    a random instance cannot be found again. 'adjacency', 'degree' and
+    'stages' describe the network topology, like in 'generate_edges'. It 
+    returns: G, sources, intermediates, destinations, edges_list.
+
+    """
+
+    directory = instance_directory(cache_dir, num_sources, num_destinations,
+        num_intermediates, seed, min_baggage, max_baggage, min_b_weight,
+        max_b_weight, min_c, max_c, min_power, max_power, vectorized,
+        adjacency, degree, stages)
+
+    return load_instance(directory, mmap=mmap)
+
+
+def instance_directory(cache_dir, num_sources=2, num_destinations=2,
+    num_intermediates=3, seed = None, min_baggage = 10, max_baggage = 30,
+    min_b_weight = 10, max_b_weight = 25, min_c = 10, max_c = 20,
+    min_power = 1, max_power = 10, vectorized = False, adjacency = None,
+    degree = None, stages = None):
+
+    """ It returns the directory of the cached instance with the given
+    generation parameters (the same of 'cached_instance'), generating and
+    saving the instance first if it is not in the cache yet. It is useful
+    to pass just the directory to other processes, which then load the
+    instance with 'load_instance'. """
+
+    if seed is None:
+        raise ValueError("A seed is required to cache an instance.")
+
+    params = {"num_sources": num_sources, "num_destinations": num_destinations,
+              "num_intermediates": num_intermediates, "seed": seed,
+              "min_baggage": min_baggage, "max_baggage": max_baggage,
+              "min_b_weight": min_b_weight, "max_b_weight": max_b_weight,
+              "min_c": min_c, "max_c": max_c, "min_power": min_power,
+              "max_power": max_power, "vectorized": vectorized}
+
+    # the topology parameters are part of the key only when they are given,
+    # so the keys of the complete networks do not change
+    if adjacency is not None:
+        params["adjacency"] = [[input_node, output_node] for input_node, output_node in adjacency]
+    if degree is not None:
+        params["degree"] = int(degree)
+    if stages is not None:
+        params["stages"] = [int(stage) for stage in stages]
+
+    directory = os.path.join(cache_dir, instance_key(**params))
+
+    if not os.path.exists(os.path.join(directory, "header.json")):
+
+        G, sources, intermediates, destinations = create_tripartite_graph_nodes(num_sources=num_sources, num_destinations=num_destinations, num_intermediates=num_intermediates, seed=seed, min_baggage=min_baggage, max_baggage=max_baggage, min_b_weight=min_b_weight, max_b_weight=max_b_weight, vectorized=vectorized)
+        graph, edges_list = generate_edges(G, sources, intermediates, destinations, seed=seed, min_c=min_c, max_c=max_c, min_power=min_power, max_power=max_power, vectorized=vectorized, adjacency=adjacency, degree=degree, stages=stages)
+
+        save_instance(directory, G, sources, intermediates, destinations,
+                      edges_list, params)
+
+    return directory
@@ -1,63 +1,171 @@
+from .belt_store import Belt_store
+
 class Conveyor_belt:
 
-    def __init__(self,capacity,weight,power, output_node, input_node, id):
+    """ A conveyor belt of the graph. Its numeric state (capacity, weight,
+    power and totals) is stored in a row of a Belt_store, and the attributes
+    below read and write that row. When no store is given, the belt owns a
+    private one-row store, so it can still be used alone. """
+
+    def __init__(self,capacity,weight,power, output_node, input_node, id, 
+                 store = None):
         
-        # max number of baggage on the belt
-        self.max_capacity = capacity
-        # max number of total baggage weight on the belt 
-        self.max_weight = weight
-        # power coefficient of the belt 
-        self.power = power
         # identification number of the belt
         self.id = id
 
-        # current weight on the belt
-        self.current_weight_available = self.max_weight
-        # current capacity on the belt
-        self.current_capacity_available = self.max_capacity
+        # row of the Belt_store holding the belt state. 
+        if store is None:
+            store = Belt_store(1)
+            self._row = 0
+        else:
+            self._row = id
+        self._store = store
+
+        # max number of baggage on the belt, max number of total baggage 
+        # weight on the belt and power coefficient of the belt. The current
+        # weight and capacity available start from these values.
+        store.add_belt(self._row, capacity, weight, power)
 
         # start and end node of the belt
         self.output_node = output_node
         self.input_node = input_node
 
-        # the following attirbutes are needed for the power consumption 
+        # the following attirbute is needed for the power consumption 
         # computation function. 
-        self.total_weight = 0
-        self.total_consumption = 0 #consumo complessivo ocnsiderando tutti i bagagli passati sul nastro
         self.baggage_consumption = 0 #consumo relativo all'aggiunta di un singolo bagaglio
 
 
-    def power_consumption_computation(self,bagagge):
-        
-        """ This function is used to update the conveyor belt statistics any 
-        time a new baggage is added to the line. Given a baggage, it returns
-        the consumption related only to that specific bag 
-        "self.baggage_consumption" and also the total conveyor belt consumption 
-        "self.total_consumption" taking into account the weight contribution
-        of all the other baggage on the edge."""
+    def bind(self, store):
+
+        """ It moves the belt state to the row 'id' of 'store', copying the 
+        current values, so that the belt becomes a view over that store. """
+
+        old_store, old_row = self._store, self._row
+
+        store.add_belt(self.id, old_store.max_capacity[old_row],
+                       old_store.max_weight[old_row], old_store.power[old_row])
+        store.capacity_available[self.id] = old_store.capacity_available[old_row]
+        store.weight_available[self.id] = old_store.weight_available[old_row]
+        store.total_weight[self.id] = old_store.total_weight[old_row]
+
+        self._store, self._row = store, self.id
+
+
+    # max number of baggage on the belt
+    @property
+    def max_capacity(self):
+        return int(self._store.max_capacity[self._row])
+
+    # max number of total baggage weight on the belt 
+    @property
+    def max_weight(self):
+        return float(self._store.max_weight[self._row])
+
+    # power coefficient of the belt 
+    @property
+    def power(self):
+        return float(self._store.power[self._row])
+
+    # current capacity on the belt
+    @property
+    def current_capacity_available(self):
+        return int(self._store.capacity_available[self._row])
+
+    @current_capacity_available.setter
+    def current_capacity_available(self, value):
+        self._store.capacity_available[self._row] = value
+
+    # current weight on the belt
+    @property
+    def current_weight_available(self):
+        return float(self._store.weight_available[self._row])
+
+    @current_weight_available.setter
+    def current_weight_available(self, value):
+        self._store.weight_available[self._row] = value
+
+    # total weight of the baggage passed on the belt
+    @property
+    def total_weight(self):
+        return float(self._store.total_weight[self._row])
+
+    @total_weight.setter
+    def total_weight(self, value):
+        self._store.total_weight[self._row] = value
+
+    # consumo complessivo considerando tutti i bagagli passati sul nastro
+    @property
+    def total_consumption(self):
+        return self.total_weight * self.power
 
-        # Weight update
-        available_weight = self.current_weight_available - bagagge.weight
-        self.current_weight_available = available_weight
 
-        # Capacity update
-        self.current_capacity_available -= 1
+    def consumption_query(self, weight):
+
+        """ This function answers the question "what would a baggage of this 
+        'weight' cost on this belt?" without changing the belt statistics. 
+        It returns the total conveyor belt consumption if the baggage was 
+        added and the consumption related only to that specific bag. It is 
+        used to compare the candidate belts of a baggage, so that only the 
+        selected one is then updated with 'consumption_commit'."""
+
+        power = self.power
+        total_consumption = (self.total_weight + weight) * power
+        baggage_consumption = weight * power
+
+        return total_consumption, baggage_consumption
+
+
+    def consumption_commit(self, weight):
+
+        """ This function is used to update the conveyor belt statistics any 
+        time a new baggage of the given 'weight' is added to the line. It 
+        returns the same values of 'consumption_query', i.e. the total 
+        conveyor belt consumption "self.total_consumption", taking into 
+        account the weight contribution of all the other baggage on the edge, 
+        and the consumption related only to that specific bag 
+        "self.baggage_consumption"."""
+
+        # Weight, capacity and total weight update
+        self._store.commit(self._row, weight)
 
         # single baggage consumption given by the product between baggage weight
         # and power coefficient of the belt
-        self.baggage_consumption = bagagge.weight*self.power
+        self.baggage_consumption = weight*self.power
 
         # Total consumption on the belt, given by the total amount of baggage
         # weight on the Conveyor belt
 
-        self.total_weight += bagagge.weight
-        self.total_consumption = self.total_weight * self.power 
-
         return self.total_consumption, self.baggage_consumption
 
+
+    def consumption_release(self, weight):
+
+        """ This function removes a baggage of the given 'weight' from the 
+        belt, bringing its statistics back to the values they had before the
+        baggage was committed. It is used when a baggage changes path. """
+
+        self._store.release(self._row, weight)
+
+
+    def power_consumption_computation(self,bagagge):
+        
+        """ This function is used to update the conveyor belt statistics any 
+        time a new baggage is added to the line. Given a baggage, it returns
+        the consumption related only to that specific bag 
+        "self.baggage_consumption" and also the total conveyor belt consumption 
+        "self.total_consumption" taking into account the weight contribution
+        of all the other baggage on the edge. It is the same of 
+        'consumption_commit' but it receives the Baggage instance."""
+
+        return self.consumption_commit(bagagge.weight)
+
     
 class Baggage:
 
+    # __slots__ avoids a per-instance dictionary, since many Baggage objects
+    # may be created from the Baggage_table rows
+    __slots__ = ("weight", "start", "destination", "id")
+
     def __init__(self,weight,start,destination, id):
         
         # Baggage weight
@@ -1,9 +1,10 @@
 import math 
+import json
 import pandas as pd
-import time
 import numpy as np  # added to manage NaN
 from instance import *
 from solver import *
+from sweep import *
 
 # This exclude "FutureWarning: The behavior of DataFrame concatenation with 
 # empty or all-NA entries is deprecated. In a future version, this will no 
@@ -27,6 +28,10 @@ min_c_range = range(min_c, max_c, min_c) #min_c
 min_b = 400 #400
 max_b = 800 #800
 seed = 22 # 22
+profile = False # if True, the heuristics statistics are saved to stats_file
+stats_file = "solver_stats.json"
+warm_start = "mcf" # LNS starting solution: None (random), "mcf" or "previous"
+lower_bound = True # if True, the optimality gaps with respect to the LP lower bound are shown
 
 # tabel result initialization --------------------------------------------------
 
@@ -50,105 +55,91 @@ def add_to_results(method, seed, min_b, max_b, min_c, max_c, of, sol_time, build
 
 # ------------------------------------------------------------------------------
 
-# Lists to save the solutions in order to compute the optimality gap
-of_method_1 = []
-of_method_2 = []
-optimality_values = []
+# All the methods are run by the sweep engine: each instance is built once
+# and shared by the three methods, and the runs are solved in parallel.
+# The points are sorted by method and then by min_c, so the table keeps the
+# same order of the sequential loops.
 
-#-------------------------------------------------------------------------------
+# METHOD 1: min cost flow heuristic
+# METHOD 2: LNS (100 iterations)
+# METHOD 3: exact solution of the baggage classes (same source, destination
+# and weight) with the HiGHS MILP solver. It is the reference used to compute
+# the optimality gap of the two heuristics.
 
-# METHOD 1
+grid = build_grid(seeds=[seed], sizes=[(num_sources, num_intermediates, num_destinations)], min_c_values=min_c_range, max_c_values=[max_c], min_b_values=[min_b], max_b_values=[max_b])
+grid.sort(key=lambda point: METHODS.index(point["method"]))
 
-for min_c in min_c_range:
-    
-    built_time_start = time.time()
-    G, sources, intermediates, destinations = create_tripartite_graph_nodes(num_sources=num_sources, num_destinations=num_destinations, num_intermediates=num_intermediates, seed=seed, min_baggage=min_b, max_baggage=max_b)
-    graph, edges_list = generate_edges(G, sources, intermediates, destinations, seed=seed, min_c=min_c, max_c=max_c)
-    built_time_stop = time.time()
+if __name__ == "__main__":
 
-    sim_time_start1 = time.time()
-    baggage_path = min_cost_computation(G, edges_list)
-    sim_time_stop1 = time.time()
+    sweep_results = run_sweep(grid, max_iterations=100, profile=profile,
+                              warm_start=warm_start, lower_bound=lower_bound)
 
-    sim_time1 = sim_time_stop1 - sim_time_start1
-    built_time = built_time_stop - built_time_start
+    # objective functions {min_c: [of of method 1, 2, 3]}, to compute the
+    # optimality gap of the heuristics with respect to the method 3 one, and
+    # gaps of all the methods with respect to the LP lower bound of their
+    # instance, {min_c: [gap of method 1, 2, 3]}
+    of_values = {}
+    bound_gaps = {}
 
-    total_baggage_consumption = 0
+    for point in sweep_results:
 
-    # given baggage_path, the of value is computed summing all the 
-    # baggage consumption associated to thei paths.
+        of = point["of"]  # None if the solution is infeasible
 
-    if baggage_path:
-        for bag_id, bag_info in baggage_path.items():
-            single_baggage_consumption = bag_info[1][2] + bag_info[2][2]
-            total_baggage_consumption += single_baggage_consumption
-        of = total_baggage_consumption
-    else:
-        of = np.nan  # Nan if the OF is infeasible
+        of_values.setdefault(point["min_c"], []).append(of)
 
-    of_method_1.append(of) # The solution is saved
-    
-    # Add the solution to the table
-    add_to_results('Method 1', seed, min_b, max_b, min_c, max_c, of, sim_time1, built_time)
+        if lower_bound:
+            bound_gaps.setdefault(point["min_c"], []).append(optimality_gap(of, point["bound"]))
 
-# ------------------------------------------------------------------------------
-
-# METHOD 2
-
-# enumerate is needed since (i,capacity) structure is useful to exploit
-# the index 'i' to compute the optimality gap at the end of each for iteration
-
-for min_c_index, min_c in enumerate(min_c_range):
+        # Add the solution to the table
+        add_to_results(point["method"], point["seed"], point["min_b"], point["max_b"], point["min_c"], point["max_c"], of, point["sol_time"], point["build_time"])
 
-    built_time_start = time.time()
-    G, sources, intermediates, destinations = create_tripartite_graph_nodes(num_sources=num_sources, num_destinations=num_destinations, num_intermediates=num_intermediates, seed=seed, min_baggage=min_b, max_baggage=max_b)
-    graph, edges_list = generate_edges(G, sources, intermediates, destinations, seed=seed, min_c=min_c, max_c=max_c,)
-    built_time_stop = time.time()
+    # results show
+    print("\n")
+    print(results)
+    print("\n")
 
-    sim_time_start2 = time.time()
-    baggage_path, of = local_search_with_neighborhood(G, edges_list, max_iterations=100)
-    sim_time_stop2 = time.time()
+    # Optimality gap show
 
-    sim_time2 = sim_time_stop2 - sim_time_start2
-    built_time = built_time_stop - built_time_start
-
-    of_method_2.append(of) # save the solution
-
-    # Optimality gap computation between method 1 and method 2 solutions
-    # related to the same iteration.
+    def format_gap(value):
+        if isinstance(value, (int, float)):
+            if isinstance(value, float) and math.isnan(value):
+                return f"{value}"
+            else:
+                # a solution as good as the optimum can differ from it by
+                # the rounding of the sums, shown as 0.00 and not -0.00
+                return f"{round(value, 2) + 0.0:.2f} %"
+        else:
+            return f"{value}"
 
-    of1 = of_method_1[min_c_index] # here is where the enumerate helps
+    print("Optimality Gap percentage of Method1 and Method2 with respect to Method3 for each iteration:\n")
 
-    if isinstance(of1, (float, int)) and isinstance(of, (float, int)):
-        # Feasible solution
-        optm_gap = abs(of1 - of) / of * 100
-        optimality_values.append(optm_gap)
+    for i, (of_1, of_2, of_3) in enumerate(of_values.values(), start=1):
+        gaps = [optimality_gap(of_heu, of_3) for of_heu in (of_1, of_2)]
+        print(f"{i}: Method1 {format_gap(gaps[0])}, Method2 {format_gap(gaps[1])}")
+    print("\n")
 
-    else:
-        # Infeasible solution
-        optm_gap = None
-        optimality_values.append(optm_gap)
+    if lower_bound:
+        print("Optimality Gap percentage of each method with respect to the LP lower bound for each iteration:\n")
 
-    # Addition of the solution to the table
-    add_to_results('Method 2', seed, min_b, max_b, min_c, max_c, of, sim_time2, built_time)
+        for i, gaps in enumerate(bound_gaps.values(), start=1):
+            print(f"{i}: " + ", ".join(f"Method{m} {format_gap(gap)}" for m, gap in enumerate(gaps, start=1)))
+        print("\n")
 
-# results show
-print("\n")
-print(results)
-print("\n")
-print("Optimality Gap percentage between Method1 and Method2 for each iteration:\n")
+    # solutions that do not respect the belt limits or the supply and 
+    # demand of the instance (see 'validate_solution')
+    invalid = [point for point in sweep_results if point["valid"] is False]
 
-# Optimality gap show
+    if invalid:
+        print("Solutions not passing the feasibility validation:\n")
 
-i = 1
-for value in optimality_values:
-    if isinstance(value, (int, float)):
-        if isinstance(value, float) and math.isnan(value):
-            print(f"{i}: {value}")
-        else:
-            print(f"{i}: {value:.2f} %")
-    else:
-        print(f"{i}: {value}")
-    i += 1
-print("\n")
+        for point in invalid:
+            print(f"{point['method']}, Min_c {point['min_c']}, Max_c {point['max_c']}")
+        print("\n")
 
+    # statistics of the heuristics, saved as JSON next to the results table
+    if profile:
+        solver_stats = [{"method": point["method"], "min_c": point["min_c"], **point["stats"].to_dict()}
+                        for point in sweep_results if point["stats"] is not None]
+        with open(stats_file, "w") as file:
+            json.dump(solver_stats, file, indent=2)
+        print(f"Solver statistics saved to {stats_file}\n")
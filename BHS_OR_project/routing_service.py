@@ -0,0 +1,246 @@
+import argparse
+import asyncio
+import time
+import numpy as np
+from instance import *
+from solver import *
+
+class Routing_service:
+
+    """
+    Asyncio routing service. The clients send their baggage with 'route',
+    and the requests are grouped in micro-batches: a batch is closed when
+    'batch_window' seconds passed since its first request or when it has
+    'max_batch_size' requests. Each batch is routed with an Online_router,
+    i.e. with the same cost model of the other solvers, and each client
+    receives the path of its baggage (None if it was rejected).
+
+    Inside a batch the heaviest baggage are routed first, like in the
+    disaggregation of 'aggregated_flow_computation', so that they get the
+    cheapest paths. The service clock starts with 'start' and it is the
+    time used by the router to release the belts ('transit_time' seconds
+    after a baggage entered them).
+
+    """
+
+    def __init__(self, G, edges_list, batch_window = 0.005,
+                 max_batch_size = 256, transit_time = 1.0):
+
+        self.router = Online_router(G, edges_list, transit_time)
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+
+        self.queue = None
+        self.batcher = None
+        self.start_time = None
+
+        # latency of each request [s] and size of each batch
+        self.latencies = []
+        self.batch_sizes = []
+        self.first_request = None
+        self.last_response = None
+
+
+    async def start(self):
+
+        """ It starts the task that collects and routes the batches. """
+
+        self.queue = asyncio.Queue()
+        self.start_time = time.perf_counter()
+        self.batcher = asyncio.create_task(self.batch_loop())
+
+
+    async def stop(self):
+
+        """ It stops the service once all the queued requests are routed. """
+
+        await self.queue.join()
+        self.batcher.cancel()
+
+        try:
+            await self.batcher
+        except asyncio.CancelledError:
+            pass
+
+
+    async def route(self, bag):
+
+        """ It sends the Baggage 'bag' to the service and it waits for its
+        path, with the same structure used by 'min_cost_computation'. """
+
+        future = asyncio.get_running_loop().create_future()
+        request_time = time.perf_counter()
+
+        if self.first_request is None:
+            self.first_request = request_time
+
+        await self.queue.put((bag, future, request_time))
+
+        return await future
+
+
+    async def batch_loop(self):
+
+        while True:
+
+            # the batch starts with the first request received
+            batch = [await self.queue.get()]
+            deadline = time.perf_counter() + self.batch_window
+
+            while len(batch) < self.max_batch_size:
+
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            self.route_batch(batch)
+
+            for request in batch:
+                self.queue.task_done()
+
+
+    def route_batch(self, batch):
+
+        """ It routes a batch of (bag, future, request time) requests and it
+        sends each path to its client. """
+
+        now = time.perf_counter()
+        service_time = now - self.start_time
+
+        # heaviest baggage first
+        batch.sort(key=lambda request: -request[0].weight)
+
+        for bag, future, request_time in batch:
+
+            path = self.router.route(service_time, bag)
+
+            if not future.cancelled():
+                future.set_result(path)
+
+        response_time = time.perf_counter()
+
+        self.latencies.extend(response_time - request_time
+                              for bag, future, request_time in batch)
+        self.batch_sizes.append(len(batch))
+        self.last_response = response_time
+
+
+    def report(self):
+
+        """ It returns a dictionary with the service statistics: number of
+        requests, routed and rejected baggage, p50 and p99 latency [ms],
+        throughput [requests/s], number of batches and mean batch size. """
+
+        latencies = np.array(self.latencies)
+
+        if len(latencies) == 0:
+            return {"requests": 0}
+
+        elapsed = self.last_response - self.first_request
+
+        return {
+            "requests": len(latencies),
+            "routed": self.router.routed,
+            "rejected": self.router.rejected,
+            "p50_latency_ms": float(np.percentile(latencies, 50))*1000,
+            "p99_latency_ms": float(np.percentile(latencies, 99))*1000,
+            "throughput": len(latencies)/elapsed if elapsed > 0 else float("inf"),
+            "batches": len(self.batch_sizes),
+            "mean_batch_size": float(np.mean(self.batch_sizes)),
+        }
+
+
+async def generate_load(service, G, rate = 1000.0, num_requests = 10000,
+                        seed = None):
+
+    """
+    Local synthetic load generator. It sends 'num_requests' baggage of the
+    instance 'G' (see 'baggage_arrivals', repeated if the instance has less
+    baggage) to the service as an open loop Poisson process of 'rate'
+    requests per second: each request is sent at its arrival time, without
+    waiting for the previous answers. It returns the list of the paths.
+
+    """
+
+    loop_start = time.perf_counter()
+    requests = []
+
+    while len(requests) < num_requests:
+
+        # a new pass over the instance baggage starts after the previous one
+        offset = time.perf_counter() - loop_start if requests else 0.0
+        arrivals = baggage_arrivals(G, rate, seed)
+
+        for arrival_time, bag in arrivals:
+
+            if len(requests) == num_requests:
+                break
+
+            delay = offset + arrival_time - (time.perf_counter() - loop_start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            requests.append(asyncio.create_task(service.route(bag)))
+
+        if seed is not None:
+            seed += 1
+
+    return await asyncio.gather(*requests)
+
+
+async def run_load_test(G, edges_list, rate = 1000.0, num_requests = 10000,
+                        batch_window = 0.005, max_batch_size = 256,
+                        transit_time = 1.0, seed = None):
+
+    """ It starts a Routing_service on the given instance, it loads it with
+    'generate_load' and it returns the service report. """
+
+    service = Routing_service(G, edges_list, batch_window, max_batch_size,
+                              transit_time)
+    await service.start()
+    await generate_load(service, G, rate, num_requests, seed)
+    await service.stop()
+
+    return service.report()
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Load test of the asyncio "
+                                     "routing service on a generated instance.")
+    parser.add_argument("--sources", type=int, default=4)
+    parser.add_argument("--intermediates", type=int, default=6)
+    parser.add_argument("--min-b", type=int, default=400)
+    parser.add_argument("--max-b", type=int, default=800)
+    parser.add_argument("--min-c", type=int, default=100)
+    parser.add_argument("--max-c", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=22)
+    parser.add_argument("--rate", type=float, default=1000.0,
+                        help="requests per second")
+    parser.add_argument("--requests", type=int, default=10000)
+    parser.add_argument("--window", type=float, default=0.005,
+                        help="batch window [s]")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--transit-time", type=float, default=1.0,
+                        help="time a baggage stays on a belt [s]")
+    args = parser.parse_args()
+
+    G, sources, intermediates, destinations = create_tripartite_graph_nodes(num_sources=args.sources, num_destinations=args.sources, num_intermediates=args.intermediates, seed=args.seed, min_baggage=args.min_b, max_baggage=args.max_b, vectorized=True)
+    graph, edges_list = generate_edges(G, sources, intermediates, destinations, seed=args.seed, min_c=args.min_c, max_c=args.max_c, vectorized=True)
+
+    report = asyncio.run(run_load_test(G, edges_list, args.rate, args.requests,
+                                       args.window, args.batch_size,
+                                       args.transit_time, args.seed))
+
+    for name, value in report.items():
+        print(f"{name:>16}: {value:.2f}" if isinstance(value, float)
+              else f"{name:>16}: {value}")
+
+
+if __name__ == "__main__":
+    main()
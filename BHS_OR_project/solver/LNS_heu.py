@@ -1,6 +1,11 @@
 from instance.instance_gen import *
-import copy
+from instance.graph_gen import get_belt_index, get_belt_store
+from instance.baggage_table import get_baggage_table
+from .compact_solution import Compact_solution
+from .evaluation import total_consumption
+import numpy as np
 import random
+import time
 
 def first_feasible_solution_generator(G,edges):
 
@@ -33,7 +38,7 @@ def first_feasible_solution_generator(G,edges):
     # "data = True" is specified according to take node data during the for loop.
     # Without this specification, "node" would be just a string with the node name
     # On the other hand, with this instruction, node is a tuple structure
-    # ("node name", {"demand": x, "baggage_list": {} }).
+    # ("node name", {"demand": x, "baggage_list": rows of the Baggage_table }).
 
     for node in G.nodes(data = True):
         if node[0] == f'S{s+1}':
@@ -45,6 +50,11 @@ def first_feasible_solution_generator(G,edges):
         if node[0] == f'D{d+1}':
             output.append(node)
             d += 1
+
+    # belt index built by 'generate_edges': it gives the belts leaving each
+    # node and the belt linking two given nodes without scanning 'edges'
+
+    belt_index = get_belt_index(G, edges)
      
     # dictionary filled up as explained at the beginnin of the function. Here
     # it is reported again its sintax {'baggage_id':["starting node", 
@@ -53,23 +63,30 @@ def first_feasible_solution_generator(G,edges):
 
     first_baggage_path_guess = {}
 
-    j = 1  # baggage index in the baggage list of the graph nodes
+    # The baggage data are stored in the Baggage_table, while the node 
+    # buffers 'baggage_list' hold the table rows of the node baggage.
 
-    # total amount of intermediate nodes, tht is exploted in the next for
-    int_node = len(intermediate) 
+    baggage_table = get_baggage_table(G)
 
-    # node is ('node_name', {'demand: , 'baggage_list': {} } )
+    # node is ('node_name', {'demand: , 'baggage_list': range of table rows } )
     for node in input: 
         
         i = 1 # intermediate node index
 
+        # intermediate nodes that can be used by the node baggage for each
+        # destination, i.e. the ones reached by a belt of the node and 
+        # linked to that destination. In a complete network they are all 
+        # the intermediate nodes, in their order.
+        targets_by_destination = {}
+
         # for each input node, we scan all its baggage one by one
-        for b in range(1,len(node[1]['baggage_list'])+1):
+        for row in node[1]['baggage_list']:
             
             # we take the information related to the baggage still stored
-            # in the input node buffer
+            # in the input node buffer. A Baggage instance is created since
+            # it is part of the path structure.
 
-            bag = node[1]['baggage_list'][b]
+            bag = baggage_table.baggage(row)
             bag_w = bag.weight
             bag_d = bag.destination
             bag_s = bag.start
@@ -85,13 +102,14 @@ def first_feasible_solution_generator(G,edges):
             check_F = False # feasibility check
            
             # The starting solution is found just assigning one baggage per 
-            # intermediate node (e.g there are 3 intermediate node, these
+            # usable intermediate node (e.g there are 3 intermediate node, these
             # are the assignements --> b1 to I1, b2 to I2, b3 to I3, b4 to I1,
             # b5 to I2, b6 to I3... and so on). The reason is that we are just
             # looking for a feasible solution, so there are no conspumption
             # consideration until now
 
-            # For each baggage we randomly shuffle the edges list. This 
+            # For each baggage we randomly shuffle the belts leaving the 
+            # source node (the only ones that can be selected). This 
             # beacuse here an edge is selected if it simply satisfies weight 
             # and capacity constraints, so if for any baggage the order to 
             # scan the edges is always the same, it ends up to send all the 
@@ -100,7 +118,17 @@ def first_feasible_solution_generator(G,edges):
             # it would generate an infeasible solution because the first 
             # intermediate nodes would have too many baggage to manage.
 
-            shuffled_edges = sorted(edges.values(), key=lambda x: random.random())
+            shuffled_belts = sorted(belt_index["by_input"].get(node[0], []), key=lambda x: random.random())
+
+            targets = targets_by_destination.get(bag_d)
+
+            if targets is None:
+                targets = [belt.output_node for belt in belt_index["by_input"].get(node[0], [])
+                           if (belt.output_node, bag_d) in belt_index["by_nodes"]]
+                targets_by_destination[bag_d] = targets
+
+            # total amount of usable intermediate nodes
+            int_node = len(targets)
 
             # if i is larger, it means we exceeded the number of intermediate
             # nodes of the system. As said before, to ensure fairness we
@@ -111,44 +139,40 @@ def first_feasible_solution_generator(G,edges):
             if i > int_node:
                 i = 1
 
-            for edge in  shuffled_edges:
+            for belt in shuffled_belts:
                 
-                # it is checked if the output node is an intermediate one, since
-                # in this loop they are the only to be taken into account 
-                # among all the "shuffled_edges". Then, if it is true, two 
+                # it is checked if the output node is the intermediate one 
+                # selected for this baggage. Then, if it is true, two 
                 # constraints has to be satisfied: 1) Capacity 2) Weight,
                 # meaning that the edge should have space to take another 
                 # baggage and it should be able to support that total weight.
 
-                if edge['info'].output_node == f'I{i}' and edge['info'].input_node == node[0]:
+                if i <= int_node and belt.output_node == targets[i-1]:
                     i+=1
-                    if edge["info"].current_capacity_available - 1 >= 0 and edge["info"].current_weight_available - bag_w >= 0:
+                    if belt.current_capacity_available - 1 >= 0 and belt.current_weight_available - bag_w >= 0:
                         check_c = True
 
                 if check_c == True:
                     
                     check_F = True
-                    
-                    # the baggage is deleted form the list of its source node.
-                    del node[1]['baggage_list'][b]
 
                     # It is the consumption related to that single baggage
-                    # sent to that specific edge.
+                    # sent to that specific edge. The belt statistics are
+                    # updated, so that the next baggage see the residual 
+                    # capacity and weight.
 
-                    baggage_consumption = bag_w * edge["info"].power
+                    total_consumption, baggage_consumption = belt.consumption_commit(bag_w)
 
                     # "info_tuple" is the data structure defined as described
-                    # in the 'first baggage_pathguess' explaination at line 46
+                    # in the 'first baggage_path_guess' explaination at the beginning
                     
-                    info_tuple = (edge["info"].output_node, edge["info"].id, baggage_consumption)
+                    info_tuple = (belt.output_node, belt.id, baggage_consumption)
                     first_baggage_path_guess[bag.id].append(info_tuple)
                     
                     # the baggage is added to the baggage list of the node
                     # it will reach through the selcted edge
 
-                    G.nodes[edge["info"].output_node]['baggage_list'][j] = bag
-
-                    j += 1
+                    G.nodes[belt.output_node]['baggage_list'].append(row)
 
                     break # we found the edge, we can break the loop
             
@@ -159,63 +183,53 @@ def first_feasible_solution_generator(G,edges):
 
                 first_baggage_path_guess = None
                 return first_baggage_path_guess
+
+        # all the baggage left the node, so its buffer becomes empty
+        rows = node[1]['baggage_list']
+        node[1]['baggage_list'] = range(rows.stop, rows.stop)
     
 
-    # Remember that node is ('node_name', {'demand: , 'baggage_list': {} } )
+    # Remember that node is ('node_name', {'demand: , 'baggage_list': [rows] } )
     # Now baggage go from intermediate nodes to destinations
 
     for node in intermediate: 
-        
-        #--------------------------------------------
-        # We are numbering the baggage list of intermediate nodes from scratch 
-        # because we need that the luggage go from index 1 to x, where x is the 
-        # last luggage. Otherwise we have that in the previous for, the indices 
-        # are given by j, which is a unique index for all luggage associated 
-        # with any node, and in that case it is not possible to
-        # scroll through the luggage as done in line 180.
-
-        baggage = list(node[1]["baggage_list"].values())
-        node[1]["baggage_list"].clear()
-
-        for i, value in enumerate(baggage):
-            node[1]["baggage_list"][i+1] = value
-        #--------------------------------------------
-
-        # len + 1 since baggage start from 1
-        for b in range(1,len(node[1]['baggage_list'])+1): 
-            bag = node[1]['baggage_list'][b]
-            bag_w = bag.weight
-            bag_d = bag.destination
+
+        # the intermediate buffer is the list of the table rows received
+        # from the sources, in FIFO order
+
+        rows = node[1]['baggage_list']
+        bag_ids, bag_weights, bag_destinations = baggage_table.rows_data(rows)
+
+        for b, row in enumerate(rows): 
+            bag_id = bag_ids[b]
+            bag_w = bag_weights[b]
+            bag_d = bag_destinations[b]
 
             check_c = False # constraints check
             check_F = False # feasibility check
             
-            for edge in edges.values():
+            # == bag_d since tha baggage has to arrive to its assigned 
+            # destination, so only the belt linking the intermediate node 
+            # to 'bag_d' is taken from the belt index. Then, the code is 
+            # almost the same as before
 
-                # == bag_d since tha baggage has to arrive to its
-                # assigned destination. Then, the code is almost the same 
-                # as before
-            
-                if edge['info'].output_node == bag_d and edge['info'].input_node == node[0]:
+            belt = belt_index["by_nodes"].get((node[0], bag_d))
 
-                    if edge["info"].current_capacity_available - 1 >= 0 and edge["info"].current_weight_available - bag_w >= 0:
-                        check_c = True
+            if belt is not None:
 
-                if check_c == True:
+                if belt.current_capacity_available - 1 >= 0 and belt.current_weight_available - bag_w >= 0:
+                    check_c = True
 
-                    check_F = True
+            if check_c == True:
 
-                    del node[1]['baggage_list'][b]
-                    baggage_consumption = bag_w * edge["info"].power
+                check_F = True
 
-                    info_tuple = (edge["info"].output_node, edge["info"].id, baggage_consumption)
-                    first_baggage_path_guess[bag.id].append(info_tuple)
-                    
-                    G.nodes[edge["info"].output_node]['baggage_list'][j] = bag
-                    
-                    j += 1
-                    
-                    break
+                total_consumption, baggage_consumption = belt.consumption_commit(bag_w)
+
+                info_tuple = (belt.output_node, belt.id, baggage_consumption)
+                first_baggage_path_guess[bag_id].append(info_tuple)
+                
+                G.nodes[belt.output_node]['baggage_list'].append(row)
         
             if check_F == False:
                 
@@ -224,52 +238,394 @@ def first_feasible_solution_generator(G,edges):
                 first_baggage_path_guess = None
                 
                 return first_baggage_path_guess
+
+        # all the baggage reached their destination
+        node[1]['baggage_list'] = []
             
     return first_baggage_path_guess
 
 
+def warm_start_solution(G, edges, initial_solution):
+
+    """
+    This function builds the starting solution of the local search from a
+    given solution 'initial_solution', e.g. the one of 'min_cost_computation'
+    on the same instance or the best one of a previous sweep point whose 
+    instance differs only in the belt capacities. Its paths can have the 
+    structure of 'min_cost_computation' or the one of the local search (with
+    the baggage instance). The baggage still stored in the sources are taken
+    in the order of their buffers:
+    1) a baggage keeps its path if it is a valid S -> I -> D path of this
+       instance (its belts exist and link its source to its destination) and
+       if its belts can still take it.
+    2) the other baggage (missing, invalid or over capacity paths) are 
+       repaired: from the heaviest to the lightest, each one is inserted in 
+       the cheapest path of its source and destination that can still take
+       it, like in 'greedy_insertion'.
+    It returns the solution, with the same structure of 
+    'first_feasible_solution_generator', and the number of repaired 
+    baggage. If a baggage cannot be inserted the solution is None and the 
+    belt statistics and node buffers are left unchanged, so the caller can
+    start from another solution.
+    
+    """
+
+    belt_index = get_belt_index(G, edges)
+    belts_by_id = belt_index["by_id"]
+    belt_store = get_belt_store(G, edges)
+    baggage_table = get_baggage_table(G)
+
+    capacity = belt_store.capacity_available
+    weight_available = belt_store.weight_available
+
+    # (row, source, destination, weight, S->I belt, I->D belt) of each 
+    # baggage, the belts are None until the baggage has a feasible path
+    assignments = []
+    pending = []
+
+    for source in baggage_table.sources:
+
+        rows = G.nodes[source]['baggage_list']
+        bag_ids, bag_weights, bag_destinations = baggage_table.rows_data(rows)
+
+        for b, row in enumerate(rows):
+
+            bag_w = bag_weights[b]
+            bag_d = bag_destinations[b]
+            path = initial_solution.get(bag_ids[b])
+            belts = None
+
+            if path is not None:
+
+                # the hops after the starting node (and the baggage instance)
+                hops = path[2:] if len(path) > 1 and isinstance(path[1], Baggage) else path[1:]
+
+                if len(hops) == 2:
+                    first_belt = belts_by_id.get(hops[0][1])
+                    second_belt = belts_by_id.get(hops[1][1])
+
+                    if (first_belt is not None and second_belt is not None and
+                            first_belt.input_node == source and
+                            second_belt.input_node == first_belt.output_node and
+                            second_belt.output_node == bag_d and
+                            capacity[first_belt.id] >= 1 and weight_available[first_belt.id] >= bag_w and
+                            capacity[second_belt.id] >= 1 and weight_available[second_belt.id] >= bag_w):
+
+                        belt_store.commit(first_belt.id, bag_w)
+                        belt_store.commit(second_belt.id, bag_w)
+                        belts = (first_belt, second_belt)
+
+            if belts is None:
+                pending.append(len(assignments))
+                belts = (None, None)
+
+            assignments.append((row, source, bag_d, bag_w) + belts)
+
+    # repair of the remaining baggage, heaviest first, in the cheapest 
+    # feasible path of their commodity
+    pending.sort(key=lambda a: -assignments[a][3])
+    commodity_paths = {}
+
+    for a in pending:
+
+        row, source, bag_d, bag_w = assignments[a][:4]
+        paths = commodity_paths.get((source, bag_d))
+
+        if paths is None:
+
+            paths = []
+            for belt in belt_index["by_input"].get(source, []):
+                next_belt = belt_index["by_nodes"].get((belt.output_node, bag_d))
+                if next_belt is not None:
+                    paths.append((belt.power + next_belt.power, belt.id, next_belt.id))
+            paths.sort()
+
+            paths = (np.array([path[1] for path in paths], dtype=np.int64),
+                     np.array([path[2] for path in paths], dtype=np.int64))
+            commodity_paths[(source, bag_d)] = paths
+
+        first_ids, second_ids = paths
+        feasible = ((capacity[first_ids] >= 1) & (weight_available[first_ids] >= bag_w) &
+                    (capacity[second_ids] >= 1) & (weight_available[second_ids] >= bag_w))
+
+        if not feasible.any():
+
+            # the belts go back to their previous state
+            for row, source, bag_d, bag_w, first_belt, second_belt in assignments:
+                if first_belt is not None:
+                    belt_store.release(first_belt.id, bag_w)
+                    belt_store.release(second_belt.id, bag_w)
+
+            return None, len(pending)
+
+        p = int(np.argmax(feasible))
+        first_belt = belts_by_id[int(first_ids[p])]
+        second_belt = belts_by_id[int(second_ids[p])]
+
+        belt_store.commit(first_belt.id, bag_w)
+        belt_store.commit(second_belt.id, bag_w)
+        assignments[a] = (row, source, bag_d, bag_w, first_belt, second_belt)
+
+    # solution and node buffers: the baggage reached their destinations
+    warm_baggage_path = {}
+
+    for row, source, bag_d, bag_w, first_belt, second_belt in assignments:
+
+        bag = baggage_table.baggage(row)
+        warm_baggage_path[bag.id] = [
+            source, bag,
+            (first_belt.output_node, first_belt.id, bag_w*first_belt.power),
+            (second_belt.output_node, second_belt.id, bag_w*second_belt.power)]
+
+        G.nodes[bag_d]['baggage_list'].append(row)
+
+    for source in baggage_table.sources:
+        rows = G.nodes[source]['baggage_list']
+        G.nodes[source]['baggage_list'] = range(rows.stop, rows.stop)
+
+    return warm_baggage_path, len(pending)
+
+
 # Calculate the total power consumption
 def calculate_total_consumption(baggage_path):
 
     """ 
     Given the baggage path, it computes the total consupmtion of the 
     system just summing the consumption related to each baggage. 
-    It is used in the local search function.
+    It is used in the local search function. The consumption of all the
+    belts of the paths, after the starting node and the Baggage, are 
+    gathered in one array and summed by 'total_consumption'.
     
     """
 
-    total_baggage_consumption = 0
-    
-    for bag_info in baggage_path.values():
-        
-        # consumption from source -> intermediate: 'bag_info[2][2]'
-        # consumption from intermediate -> destination: 'bag_info[3][2]'
+    return total_consumption(baggage_path)
+
+
+def build_search_state(baggage_path, belt_index, belt_store):
+
+    """
+    This function builds the array representation of a solution used by the
+    destroy and repair operators. Each baggage of 'baggage_path' is a 
+    position in the arrays of the returned dictionary:
+    - 'bag_ids': baggage ids, in the order of the positions
+    - 'weight': baggage weights
+    - 'first', 'second': ids of the S->I and I->D belts used by the baggage
+    - 'commodity': index of the (source, destination) pair of the baggage
+    - 'commodity_paths': for each commodity, the arrays of the S->I and I->D
+      belt ids of all its possible paths, sorted by increasing cost
+    - 'min_power': for each commodity, the power of its cheapest path
+    - 'destination': destination node of each commodity
+    - 'belt_store': the Belt_store of the belt statistics
+
+    """
+
+    bag_ids = list(baggage_path.keys())
+
+    weight = np.array([baggage_path[b][1].weight for b in bag_ids], dtype=np.float64)
+    first = np.array([baggage_path[b][2][1] for b in bag_ids], dtype=np.int64)
+    second = np.array([baggage_path[b][3][1] for b in bag_ids], dtype=np.int64)
+
+    commodity_index = {}
+    commodity = np.empty(len(bag_ids), dtype=np.int64)
+
+    for position, b in enumerate(bag_ids):
+        key = (baggage_path[b][0], baggage_path[b][1].destination)
+        commodity[position] = commodity_index.setdefault(key, len(commodity_index))
+
+    commodity_paths = []
+    min_power = np.zeros(len(commodity_index))
+    destination = []
 
-        single_baggage_consumption = bag_info[2][2] + bag_info[3][2] 
+    for (source, bag_d), c in commodity_index.items():
 
-        total_baggage_consumption += single_baggage_consumption
+        paths = []
+
+        for belt in belt_index["by_input"].get(source, []):
+            next_belt = belt_index["by_nodes"].get((belt.output_node, bag_d))
+            if next_belt is not None:
+                paths.append((belt.power + next_belt.power, belt.id, next_belt.id))
+
+        paths.sort()
+
+        commodity_paths.append((np.array([path[1] for path in paths], dtype=np.int64),
+                                np.array([path[2] for path in paths], dtype=np.int64)))
+        min_power[c] = paths[0][0]
+        destination.append(bag_d)
+
+    return {"bag_ids": bag_ids, "weight": weight, "first": first, 
+            "second": second, "commodity": commodity, 
+            "commodity_paths": commodity_paths, "min_power": min_power,
+            "destination": destination, "belt_store": belt_store}
+
+
+# Destroy operators. Each one receives the search state and the number of 
+# baggage 'q' to be removed, and it returns the array of the positions of the
+# baggage to be removed from the solution.
+
+def random_removal(state, q):
+
+    """ It removes 'q' baggage selected at random. """
+
+    return np.array(random.sample(range(len(state["bag_ids"])), q), dtype=np.int64)
+
+
+def worst_cost_removal(state, q):
+
+    """ It removes 'q' baggage among the 2q ones with the largest extra 
+    consumption with respect to the cheapest path of their commodity. """
+
+    power = state["belt_store"].power
+    extra_cost = state["weight"] * (power[state["first"]] + power[state["second"]] 
+                                    - state["min_power"][state["commodity"]])
+
+    worst = np.argpartition(-extra_cost, min(2*q, len(extra_cost)) - 1)[:2*q]
+
+    return np.array(random.sample(worst.tolist(), q), dtype=np.int64)
+
+
+def belt_removal(state, q):
+
+    """ It removes up to 'q' baggage passing through a belt selected at 
+    random among the used ones. """
+
+    used_belts = np.unique(np.concatenate((state["first"], state["second"])))
+    belt = random.choice(used_belts.tolist())
+
+    positions = np.flatnonzero((state["first"] == belt) | (state["second"] == belt))
+
+    return np.array(random.sample(positions.tolist(), min(q, len(positions))), dtype=np.int64)
+
+
+def destination_removal(state, q):
+
+    """ It removes up to 'q' baggage directed to a destination selected at 
+    random. """
+
+    c = random.randrange(len(state["commodity_paths"]))
+    positions = np.flatnonzero(state["commodity"] == c)
+
+    return np.array(random.sample(positions.tolist(), min(q, len(positions))), dtype=np.int64)
+
+
+def greedy_insertion(state, positions):
+
+    """
+    Repair operator: the removed baggage are inserted again one by one, from
+    the heaviest to the lightest, each one in the cheapest path of its 
+    commodity that satisfies the capacity and weight constraints of both its
+    belts. The belt statistics and the 'first' and 'second' arrays are 
+    updated. It returns True if all the baggage are inserted and the list of
+    the inserted positions. If a baggage can not be inserted it stops, and 
+    the caller has to undo the move of the baggage inserted so far.
     
-    return total_baggage_consumption
+    """
+
+    belt_store = state["belt_store"]
+    capacity = belt_store.capacity_available
+    weight_available = belt_store.weight_available
+
+    order = positions[np.argsort(-state["weight"][positions], kind="stable")]
+    inserted = []
+
+    for position in order.tolist():
+
+        bag_w = state["weight"][position]
+        first_ids, second_ids = state["commodity_paths"][state["commodity"][position]]
+
+        feasible = ((capacity[first_ids] >= 1) & (weight_available[first_ids] >= bag_w) &
+                    (capacity[second_ids] >= 1) & (weight_available[second_ids] >= bag_w))
+
+        if not feasible.any():
+            return False, inserted
+
+        # paths are sorted by cost, so the first feasible is the cheapest
+        p = int(np.argmax(feasible))
+
+        belt_store.commit(first_ids[p], bag_w)
+        belt_store.commit(second_ids[p], bag_w)
+        state["first"][position] = first_ids[p]
+        state["second"][position] = second_ids[p]
+        inserted.append(position)
 
+    return True, inserted
 
-def local_search_with_neighborhood(G, edges_list, max_iterations = 100):
+
+def local_search_with_neighborhood(G, edges_list, max_iterations = 100, 
+                                   destroy_fraction = 0.1, seed = None,
+                                   time_limit = None, incumbent = None,
+                                   prune_gap = None, stats = None,
+                                   initial_solution = None, compact = False):
     
     """
-    Perform local search with neighborhood exploration to minimize power 
-    consumption. Its arguments are: - G: The graph representing sources, 
-    intermediates, and destinations. - edges_list: The list of edges in the 
-    graph. - max_iterations: Maximum number of iterations to explore the 
-    neighborhood. Then, it returns: - best_baggage_path: The best baggage path 
-    found. - best_of: The best objective function (total power consumption) 
-    found.
+    Perform a large neighborhood search (LNS) with destroy and repair 
+    operators to minimize power consumption. Its arguments are: - G: The 
+    graph representing sources, intermediates, and destinations. - 
+    edges_list: The list of edges in the graph. - max_iterations: Maximum 
+    number of iterations to explore the neighborhood. - destroy_fraction: 
+    fraction of the baggage removed by each destroy operator. - seed: seed of
+    the random choices (if None, the current 'random' state is used). - 
+    time_limit: wall-clock budget in seconds (None means no limit). - 
+    incumbent: optional shared value (multiprocessing.Value('d')) with the 
+    best objective found by a group of parallel searches; it is updated 
+    with each improvement. - prune_gap: if given, the search stops early 
+    when its best objective is worse than the incumbent by more than this 
+    fraction. - stats: optional Solver_stats instance collecting the phase 
+    timings and the move counters (see 'record_search_stats'). - 
+    initial_solution: optional solution of the same instance (or of one 
+    that differs only in the belt capacities) used as starting solution, 
+    repaired if needed (see 'warm_start_solution'); if it cannot be 
+    repaired the search starts from a random feasible solution. - compact:
+    if True, the paths of the moved baggage are not updated during the 
+    search and the best solution is returned as a Compact_solution, built 
+    from the belt arrays of the search state. Then, it returns: - 
+    best_baggage_path: The best baggage path found. - best_of: The best 
+    objective function (total power consumption) found.
+
+    At each iteration a destroy operator is selected with a roulette wheel
+    on adaptive weights: operators that find better solutions are selected
+    more often in the next iterations. The removed baggage release the 
+    capacity of their belts and they are inserted again by the greedy 
+    cheapest insertion. If the neighbor is not better, the belts and paths 
+    go back to the previous state.
 
     """
+
+    start_time = time.time()
+
+    # statistics are collected only if requested, in local dictionaries
+    # stored in 'stats' at the end of the search
+    profile = stats is not None
+    if profile:
+        timings = dict.fromkeys(("initial_solution", "destroy", "repair",
+                                 "acceptance"), 0.0)
+        counters = dict.fromkeys(("iterations", "baggage_removed",
+                                  "moves_improving", "moves_equal",
+                                  "moves_rejected", "repair_failures"), 0)
+        phase_start = time.perf_counter()
+
+    if seed is not None:
+        random.seed(seed)
    
-    # it picks a first random feasible solution  
-    current_baggage_path = first_feasible_solution_generator(G,edges_list)
+    # it starts from the given solution, if any, otherwise it picks a first
+    # random feasible solution
+    current_baggage_path = None
+
+    if initial_solution is not None:
+        current_baggage_path, repaired = warm_start_solution(G, edges_list, initial_solution)
+        if profile:
+            counters["warm_start"] = int(current_baggage_path is not None)
+            counters["warm_start_repaired"] = repaired
+
+    if current_baggage_path is None:
+        current_baggage_path = first_feasible_solution_generator(G,edges_list)
+
+    if profile:
+        timings["initial_solution"] += time.perf_counter() - phase_start
 
     if current_baggage_path is None:
         # INFEASIBLE SOLUTION
+        if profile:
+            record_search_stats(stats, timings, counters)
         return None, None
     
     # current_baggage_path is the best feasible solution known so far.
@@ -277,110 +633,200 @@ def local_search_with_neighborhood(G, edges_list, max_iterations = 100):
 
     best_baggage_path = current_baggage_path
     best_of = calculate_total_consumption(best_baggage_path)
+    share_incumbent(incumbent, best_of)
+
+    if len(best_baggage_path) == 0:
+        if profile:
+            record_search_stats(stats, timings, counters)
+        if compact:
+            best_baggage_path = Compact_solution.from_dict(G, edges_list, best_baggage_path)
+        return best_baggage_path, best_of
+
+    belt_index = get_belt_index(G, edges_list)
+    belt_store = get_belt_store(G, edges_list)
+
+    # array representation of the solution used by the operators
+    state = build_search_state(best_baggage_path, belt_index, belt_store)
+    power = belt_store.power
+
+    # destroy operators and their adaptive weights. 'scores' and 'uses' are
+    # collected along a segment of 'segment_length' iterations, then the 
+    # weights are updated with the 'reaction' factor.
+
+    operators = [random_removal, worst_cost_removal, belt_removal, destination_removal]
+    weights = [1.0]*len(operators)
+    scores = [0.0]*len(operators)
+    uses = [0]*len(operators)
+    segment_length = 10
+    reaction = 0.2
+
+    # scores given to an operator when the neighbor is better or equal
+    score_better = 3.0
+    score_equal = 1.0
+
+    q = max(1, int(destroy_fraction*len(state["bag_ids"])))
 
     iteration = 0 # iterations for the local search
     
     while iteration < max_iterations:
-        
-        # neighbor_baggage_path is a copy of the best solution so far. It is 
-        # done to find new possible solution without destroying the 
-        # already existing one.
 
-        neighbor_baggage_path = copy.deepcopy(best_baggage_path) 
-        
-        # Explore the neighborhood. How? just changing the intermediate nodes,
-        # and so the edge selection, of a set of baggage. Morover, this baggage
-        # portion is changed at each iteration to find always different 
-        # solutions. If it is better, it is stored.
-        # These are the steps:
-        # 1) baggage shuffling
-        # 2) Is the solution better? store it and shuffle again taking
-        #    into account the new changes
-        # 3) Is the solution worse? discard it and shuffle again to find
-        #    a better one.
-        # 4) Go to step 1 if iteration < max_iteration
+        if time_limit is not None and time.time() - start_time >= time_limit:
+            break
 
-        # Convert dictionary to list of tuples to perform shuffling
-        shuffled_baggages = list(best_baggage_path.items())
+        if profile:
+            phase_start = time.perf_counter()
 
-        # Shuffle the list  
-        random.shuffle(shuffled_baggages)  
+        # Step 1: destroy operator selection (roulette wheel)
+        op = random.choices(range(len(operators)), weights=weights)[0]
+        positions = operators[op](state, q)
+        uses[op] += 1
 
-        # Slice only 1/3 of the shuffled list. If we shuffled all the 
-        # baggage list, the new solution would not be a "neighbor" solution.
+        # Step 2: destroy. The baggage leave their belts; the old belts are 
+        # the undo information of the move.
 
-        sliced_baggages = shuffled_baggages[:int(len(shuffled_baggages)/3)]
+        bag_w = state["weight"][positions]
+        old_first = state["first"][positions].copy()
+        old_second = state["second"][positions].copy()
 
-        for element in sliced_baggages:
+        for belts in (old_first, old_second):
+            np.add.at(belt_store.capacity_available, belts, 1)
+            np.add.at(belt_store.weight_available, belts, bag_w)
+            np.subtract.at(belt_store.total_weight, belts, bag_w)
 
-            bag_id = element[0] # baggage id
-            current_path = element[1] # baggage path 
+        if profile:
+            repair_start = time.perf_counter()
+            timings["destroy"] += repair_start - phase_start
+            counters["baggage_removed"] += len(positions)
+            operator_key = "uses_" + operators[op].__name__
+            counters[operator_key] = counters.get(operator_key, 0) + 1
 
-            check_change = False # change edge check
-            check_c = False # check constraint
+        # Step 3: repair and objective function variation
 
-            # Generate a neighbor by swapping this baggage to a 
-            # different path (intermediate node)
+        repaired, inserted = greedy_insertion(state, positions)
 
-            baggage = current_path[1] # baggage instance
-           
-            # swap the intermediate node for this baggage
+        if profile:
+            acceptance_start = time.perf_counter()
+            timings["repair"] += acceptance_start - repair_start
 
-            for edge_info in edges_list.values():
-                
-                edge = edge_info['info']
-                
-                # It enters the 'if' only if a change has not been performed yet
-                if edge.input_node == current_path[0] and check_change is not True:  
-                    
-                    # A new edge is selected: Once it is verified that the input
-                    # of the edge is the same, then we choose a different edge
-                    # looking for a different edge output node with respect
-                    # to the previous one.
+        if repaired:
+            delta_of = float(np.sum(bag_w*(power[state["first"][positions]] + power[state["second"][positions]]))
+                             - np.sum(bag_w*(power[old_first] + power[old_second])))
 
-                    if edge.output_node != current_path[2][0] and edge.current_capacity_available - 1 >= 0 and edge.current_weight_available - baggage.weight >= 0:  # Ensure we're not swapping to the same intermediate node
-                        
-                        # next_input will be the input of the edge that will
-                        # lead to the final destination in the next for
+        # Step 4: acceptance. If the neighbor is better or equal, the paths
+        # of the moved baggage are updated, otherwise the move is undone.
 
-                        next_input = edge.output_node
+        if repaired and delta_of <= 0:
 
-                        # update the new edge parameters
+            best_of += delta_of
+            scores[op] += score_better if delta_of < 0 else score_equal
 
-                        edge.current_capacity_available -= 1
-                        edge.current_weight_available -= baggage.weight
-                        baggage_consumption = edge.power * baggage.weight
+            if delta_of < 0:
+                share_incumbent(incumbent, best_of)
 
-                        # Perform the swap
+            for position in ([] if compact else positions.tolist()):
 
-                        neighbor_baggage_path[bag_id][2] = (edge.output_node, edge.id, baggage_consumption)
+                path = best_baggage_path[state["bag_ids"][position]]
+                weight = path[1].weight
+                first_belt = belt_index["by_id"][int(state["first"][position])]
+                second_belt = belt_index["by_id"][int(state["second"][position])]
 
-                        check_change = True
+                path[2] = (first_belt.output_node, first_belt.id, weight*first_belt.power)
+                path[3] = (second_belt.output_node, second_belt.id, weight*second_belt.power)
 
-            # from the intermediate to the destination
-            for edge_info in edges_list.values(): 
+        else:
 
-                edge = edge_info['info']
-                
-                # Here the new edge is selected juest verifying the constraints 
-                # and the association with the final destination of the baggage
+            # the baggage inserted by the repair leave their new belts, then
+            # all the baggage go back to the old belts
+            inserted_positions = np.array(inserted, dtype=np.int64)
 
-                if edge.output_node == baggage.destination and edge.input_node == next_input and check_c is not True: 
+            for belts in (state["first"][inserted_positions], state["second"][inserted_positions]):
+                np.add.at(belt_store.capacity_available, belts, 1)
+                np.add.at(belt_store.weight_available, belts, state["weight"][inserted_positions])
+                np.subtract.at(belt_store.total_weight, belts, state["weight"][inserted_positions])
 
-                    if edge.current_capacity_available - 1 >= 0 and edge.current_weight_available - baggage.weight >= 0:
-                        check_c = True
-                        baggage_consumption += edge.power * baggage.weight
-                        edge.current_capacity_available -= 1
-                        edge.current_weight_available -= baggage.weight
-                        neighbor_baggage_path[bag_id][3] = (edge.output_node, edge.id, baggage_consumption)
-            
-        new_of = calculate_total_consumption(neighbor_baggage_path) 
+            state["first"][positions] = old_first
+            state["second"][positions] = old_second
+
+            for belts in (old_first, old_second):
+                np.subtract.at(belt_store.capacity_available, belts, 1)
+                np.subtract.at(belt_store.weight_available, belts, bag_w)
+                np.add.at(belt_store.total_weight, belts, bag_w)
+
+        if profile:
+            timings["acceptance"] += time.perf_counter() - acceptance_start
+            counters["iterations"] += 1
+            if not repaired:
+                counters["repair_failures"] += 1
+                counters["moves_rejected"] += 1
+            elif delta_of < 0:
+                counters["moves_improving"] += 1
+            elif delta_of == 0:
+                counters["moves_equal"] += 1
+            else:
+                counters["moves_rejected"] += 1
 
-        # If this neighbor is better, accept it
-        if new_of < best_of:
-            best_baggage_path = neighbor_baggage_path
-            best_of = new_of
-        
         iteration += 1
+
+        # Step 5: adaptive weights update at the end of each segment
+        if iteration % segment_length == 0:
+            for o in range(len(operators)):
+                if uses[o] > 0:
+                    weights[o] = (1 - reaction)*weights[o] + reaction*scores[o]/uses[o]
+                # every operator keeps a minimum chance to be selected
+                weights[o] = max(weights[o], 0.05)
+                scores[o] = 0.0
+                uses[o] = 0
+
+            # pruning: this search is too far from the best one of the group
+            if incumbent is not None and prune_gap is not None:
+                if best_of > incumbent.value*(1 + prune_gap):
+                    if profile:
+                        counters["pruned"] = 1
+                    break
+
+    if profile:
+        record_search_stats(stats, timings, counters)
+
+    if compact:
+        best_baggage_path = Compact_solution.from_belts(G, edges_list, state["bag_ids"],
+                                                        state["first"], state["second"])
     
     return best_baggage_path, best_of
+
+
+def record_search_stats(stats, timings, counters):
+
+    """ It stores in the Solver_stats 'stats' the phase timings and the 
+    counters collected by 'local_search_with_neighborhood':
+    - initial_solution: starting solution (warm start or first feasible)
+    - destroy: operator selection and removal of the baggage from the belts
+    - repair: greedy insertion of the removed baggage
+    - acceptance: objective variation, acceptance or undo of the move
+    - iterations: destroy/repair moves performed
+    - baggage_removed: baggage removed by the destroy operators
+    - moves_improving / moves_equal: accepted moves that improve or keep
+      the objective function
+    - moves_rejected: moves undone, since worse or not repaired
+    - repair_failures: moves whose baggage could not all be inserted
+    - uses_<operator>: times each destroy operator was selected
+    - pruned: 1 if the search was stopped by the incumbent pruning
+    - warm_start: 1 if the search started from the given solution
+    - warm_start_repaired: baggage of the given solution repaired """
+
+    for phase, seconds in timings.items():
+        stats.add_time(phase, seconds)
+    for name, value in counters.items():
+        stats.count(name, value)
+
+
+def share_incumbent(incumbent, of):
+
+    """ It updates the shared 'incumbent' objective with 'of' if it is 
+    better. Nothing is done when no incumbent is shared. """
+
+    if incumbent is None:
+        return
+
+    with incumbent.get_lock():
+        if of < incumbent.value:
+            incumbent.value = of
@@ -0,0 +1,106 @@
+import math
+import multiprocessing
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from .LNS_heu import local_search_with_neighborhood
+from .solver_stats import Solver_stats
+
+# Data shared by all the searches run in a worker process. They are set once
+# per process by 'init_worker', so the instance is sent to each worker only
+# once instead of once per search.
+worker_instance = None
+worker_incumbent = None
+
+
+def init_worker(instance_bytes, incumbent):
+
+    """ Process pool initializer: it stores the pickled instance (graph,
+    edges_list and initial solution) and the shared incumbent objective in
+    the worker. """
+
+    global worker_instance, worker_incumbent
+    worker_instance = instance_bytes
+    worker_incumbent = incumbent
+
+
+def run_local_search_start(seed, max_iterations, destroy_fraction, time_limit,
+                           prune_gap, profile = False):
+
+    """ It runs one LNS start in a worker. Each start works on its own copy
+    of the instance, since the search modifies the belt statistics and the
+    node buffers. It returns (seed, baggage path, objective function, 
+    Solver_stats of the start or None if 'profile' is False). """
+
+    G, edges_list, initial_solution = pickle.loads(worker_instance)
+
+    stats = Solver_stats() if profile else None
+
+    baggage_path, of = local_search_with_neighborhood(
+        G, edges_list, max_iterations=max_iterations,
+        destroy_fraction=destroy_fraction, seed=seed, time_limit=time_limit,
+        incumbent=worker_incumbent, prune_gap=prune_gap, stats=stats,
+        initial_solution=initial_solution)
+
+    return seed, baggage_path, of, stats
+
+
+def multi_start_local_search(G, edges_list, num_starts = 4, workers = None,
+                             seeds = None, max_iterations = 100,
+                             destroy_fraction = 0.1, time_limit = None,
+                             prune_gap = None, stats = None,
+                             initial_solution = None):
+
+    """
+    This function runs 'num_starts' independent LNS searches with distinct
+    seeds in a process pool of 'workers' processes (default: one per CPU,
+    at most one per start) and it returns the best solution. Its arguments
+    are the same of 'local_search_with_neighborhood' plus: - seeds: list of
+    the seeds of the starts (default 0, 1, ..., num_starts - 1). -
+    time_limit: wall-clock budget in seconds of each start. - prune_gap: the
+    workers share the best objective found so far and a start stops early
+    when it is worse than that by more than this fraction (None disables the
+    pruning). - stats: optional Solver_stats where the statistics of all the
+    starts are added. - initial_solution: optional warm start solution
+    shared by all the starts (see 'warm_start_solution'), which then differ
+    only in the random choices of the search. It returns: - best_baggage_path - best_of, or (None, None) if
+    no start finds a feasible solution. The graph 'G' and the edges are not
+    modified, since each start works on a copy.
+
+    """
+
+    if seeds is None:
+        seeds = list(range(num_starts))
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(seeds)))
+
+    # the instance is pickled once and each start loads its own copy
+    instance_bytes = pickle.dumps((G, edges_list, initial_solution))
+
+    # best objective shared among the workers
+    incumbent = multiprocessing.Value('d', math.inf)
+
+    best_baggage_path, best_of = None, None
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(instance_bytes, incumbent)) as pool:
+
+        futures = [pool.submit(run_local_search_start, seed, max_iterations,
+                               destroy_fraction, time_limit, prune_gap,
+                               stats is not None)
+                   for seed in seeds]
+
+        # results are collected as soon as each start finishes
+        for future in as_completed(futures):
+
+            seed, baggage_path, of, start_stats = future.result()
+
+            if stats is not None:
+                stats.merge(start_stats)
+
+            if of is not None and (best_of is None or of < best_of):
+                best_baggage_path, best_of = baggage_path, of
+
+    return best_baggage_path, best_of
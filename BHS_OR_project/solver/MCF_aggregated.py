@@ -0,0 +1,229 @@
+import networkx as nx
+import numpy as np
+from instance.instance_gen import *
+from instance.graph_gen import get_belt_index, get_belt_store
+from instance.baggage_table import get_baggage_table
+
+# network simplex needs integer costs, so the per-baggage costs of the
+# aggregated flows are scaled by this factor and rounded
+COST_SCALE = 10**6
+
+
+def group_commodities(G, baggage_table):
+
+    """ This function aggregates the baggage still stored in the source nodes
+    into commodities, i.e. groups of baggage with the same source and the
+    same destination. It returns a dictionary {(source, destination): numpy
+    array of the Baggage_table rows}. Since each source is matched with a
+    single destination, a belt is always used by one commodity only: if this
+    is not true a ValueError is raised, since the aggregated problem would
+    become a multi-commodity flow. """
+
+    commodities = {}
+
+    for source in baggage_table.sources:
+
+        rows = G.nodes[source]['baggage_list']
+        rows = np.arange(rows.start, rows.stop)
+
+        destination_index = baggage_table.destination[rows]
+
+        for d in np.unique(destination_index):
+            destination = baggage_table.destinations[d]
+            commodities[(source, destination)] = rows[destination_index == d]
+
+    sources = [key[0] for key in commodities]
+    destinations = [key[1] for key in commodities]
+
+    if len(set(sources)) != len(sources) or len(set(destinations)) != len(destinations):
+        raise ValueError("Each source must send its baggage to a single "
+                         "destination to aggregate them in flows.")
+
+    return commodities
+
+
+def aggregated_flow_computation(G, edges):
+
+    """ This function computes the baggage paths from the min cost flow
+    problem of the aggregated baggage flows. The approach is the following:
+    1) the baggage are grouped in commodities (source, destination), each
+       one with the number of baggage and their average weight.
+    2) a flow network is built, where each intermediate node is duplicated
+       for each commodity, so that the flow S -> I -> D of a commodity never
+       mixes with the other ones. The capacity of an arc is the number of
+       baggage the belt can still take (with respect to both its capacity and
+       its weight, considering the average baggage weight) and its cost is
+       the consumption of an average baggage on that belt.
+    3) the flow problem is solved with the networkx network simplex.
+    4) the flows are split again in single baggage paths: the heaviest
+       baggage are sent through the cheapest paths with flow, always
+       checking the real capacity and weight of the belts. A baggage that
+       does not fit in any path with flow is sent through the cheapest path
+       that can still take it, regardless of the flow.
+    The average weight makes the aggregated problem a relaxation of the
+    capacity and weight constraints of the single baggage, and the
+    disaggregation is greedy, so the result is a heuristic solution. The
+    optimum of the instance is computed by 'exact_computation'.
+    It receives the graph 'G' and the edges_list 'edges' as input parameters,
+    like 'min_cost_computation', and it returns "baggage_best_path" with the
+    same format {'baggage_id':["starting node", ('next node', conveyor belt
+    used to reach the next node, single baggage consumption)] }, or None if
+    the instance is infeasible. The belt statistics are updated with the
+    selected paths. """
+
+    belt_index = get_belt_index(G, edges)
+    belts_by_nodes = belt_index["by_nodes"]
+    belt_store = get_belt_store(G, edges)
+    baggage_table = get_baggage_table(G)
+
+    # Step 1: baggage aggregation
+
+    commodities = group_commodities(G, baggage_table)
+
+    # Step 2: flow network definition. 'paths' reports, for each commodity,
+    # the list of the paths [(S->I belt, I->D belt)] it can use.
+
+    H = nx.DiGraph()
+    paths = {}
+
+    for (source, destination), rows in commodities.items():
+
+        num_bags = len(rows)
+        if num_bags == 0:
+            continue
+
+        mean_weight = float(baggage_table.weight[rows].mean())
+
+        # source supply and destination demand
+        H.add_node(source, demand=-num_bags)
+        H.add_node(destination, demand=num_bags)
+
+        paths[(source, destination)] = []
+
+        for belt_in in belt_index["by_input"].get(source, []):
+
+            # the intermediate node copy related to this commodity
+            intermediate = belt_in.output_node
+            belt_out = belts_by_nodes.get((intermediate, destination))
+
+            if belt_out is None:
+                continue
+
+            paths[(source, destination)].append((belt_in, belt_out))
+
+            for belt, u, v in ((belt_in, source, (intermediate, destination)),
+                               (belt_out, (intermediate, destination), destination)):
+
+                # number of average baggage the belt can still take
+                capacity = min(belt.current_capacity_available,
+                               int(belt.current_weight_available // mean_weight))
+
+                H.add_edge(u, v, capacity=max(capacity, 0),
+                           weight=int(round(belt.power*mean_weight*COST_SCALE)))
+
+    # Step 3: solution of the aggregated problem
+
+    try:
+        flow_cost, flow = nx.network_simplex(H)
+    except nx.NetworkXUnfeasible:
+        # INFEASIBLE SOLUTION
+        return None
+
+    # Step 4: baggage disaggregation.
+
+    baggage_best_path = {}
+
+    for (source, destination), rows in commodities.items():
+
+        if len(rows) == 0:
+            continue
+
+        # The commodity paths are sorted by their cost per unit of weight,
+        # while the baggage are sorted by decreasing weight, so that heavy
+        # baggage are sent through cheap paths. For each path, the flow
+        # found by the network simplex and the real residual capacity and
+        # weight (the minimum of its two belts) are tracked.
+
+        commodity_paths = sorted(paths[(source, destination)],
+                                 key=lambda path: path[0].power + path[1].power)
+
+        path_flow = [flow[source][(belt_in.output_node, destination)]
+                     for belt_in, belt_out in commodity_paths]
+        capacity_left = [min(belt_in.current_capacity_available,
+                             belt_out.current_capacity_available)
+                         for belt_in, belt_out in commodity_paths]
+        weight_left = [min(belt_in.current_weight_available,
+                           belt_out.current_weight_available)
+                       for belt_in, belt_out in commodity_paths]
+
+        weights = baggage_table.weight[rows]
+        order = np.argsort(-weights, kind='stable')
+        sorted_weights = weights[order].tolist()
+
+        # path selected for each baggage (aligned with 'order')
+        selected = [0]*len(order)
+
+        for b, bag_w in enumerate(sorted_weights):
+
+            choice = None
+
+            # first choice: the cheapest path with flow left
+            for p in range(len(commodity_paths)):
+                if path_flow[p] > 0 and capacity_left[p] >= 1 and weight_left[p] >= bag_w:
+                    choice = p
+                    break
+
+            # second choice: the cheapest path that can still take the bag,
+            # since the flow was computed with the average baggage weight
+            if choice is None:
+                for p in range(len(commodity_paths)):
+                    if capacity_left[p] >= 1 and weight_left[p] >= bag_w:
+                        choice = p
+                        break
+
+            if choice is None:
+                # INFEASIBLE SOLUTION
+                return None
+
+            path_flow[choice] -= 1
+            capacity_left[choice] -= 1
+            weight_left[choice] -= bag_w
+            selected[b] = choice
+
+        # the selected path of each row, in the original baggage order
+        path_of_row = np.empty(len(rows), dtype=np.int64)
+        path_of_row[order] = selected
+
+        # belt statistics update, once per belt
+        for p, (belt_in, belt_out) in enumerate(commodity_paths):
+
+            path_mask = path_of_row == p
+            count = int(path_mask.sum())
+
+            if count > 0:
+                path_weight = float(weights[path_mask].sum())
+                belt_store.commit_bulk(belt_in.id, count, path_weight)
+                belt_store.commit_bulk(belt_out.id, count, path_weight)
+
+        # baggage paths, with the same structure of 'min_cost_computation'
+        bag_ids, bag_weights, _ = baggage_table.rows_data(rows)
+
+        for b, p in enumerate(path_of_row.tolist()):
+
+            belt_in, belt_out = commodity_paths[p]
+            bag_w = bag_weights[b]
+
+            baggage_best_path[bag_ids[b]] = [
+                source,
+                (belt_in.output_node, belt_in.id, bag_w*belt_in.power),
+                (belt_out.output_node, belt_out.id, bag_w*belt_out.power)]
+
+        # the baggage reached their destination
+        G.nodes[destination]['baggage_list'].extend(rows.tolist())
+
+    # all the source buffers are empty now
+    for source, destination in commodities:
+        rows = G.nodes[source]['baggage_list']
+        G.nodes[source]['baggage_list'] = range(rows.stop, rows.stop)
+
+    return baggage_best_path
@@ -0,0 +1,110 @@
+import numpy as np
+from scipy.optimize import milp, LinearConstraint, Bounds
+from instance.graph_gen import get_graph_core
+from instance.baggage_table import get_baggage_table
+from .lower_bound import assignment_model
+from .compact_solution import Compact_solution
+
+
+def exact_computation(G, edges, gap = 0.0, time_limit = None):
+
+    """ This function computes the optimal baggage paths of the instance.
+    The approach is the following:
+    1) the baggage are grouped in classes with the same source, destination
+       and weight (see 'assignment_model'). The baggage of a class are
+       interchangeable, so the problem is the same if, instead of the path of
+       each baggage, the number of baggage of each class sent through each
+       S -> I -> D path is chosen.
+    2) the number of baggage of each (class, path) is an integer variable,
+       with the real capacity and weight constraints of the belts, and the
+       integer problem is solved to optimality with the HiGHS MILP solver of
+       SciPy. Since the weight constraints link the classes, the problem is
+       not a network flow and network simplex cannot be used.
+    3) the rows of each class are assigned to its paths following the
+       integer numbers of the solution.
+    The size of the problem depends on the number of classes and paths and
+    not on the number of baggage, since the weights are integer values. With
+    'gap' = 0 the solution is the proven optimum of the instance, so it is
+    the reference of the optimality gap of the heuristics. On large
+    instances closing the last fraction of the gap can take long: a positive
+    'gap' accepts a solution whose relative distance from the optimum is at
+    most 'gap' (certified by the bound of the solver). 'time_limit' [s]
+    stops the solver: then, None is returned, since the required gap was
+    not reached.
+    It receives the graph 'G' and the edges_list 'edges' as input parameters,
+    like 'min_cost_computation', and it returns "baggage_best_path" with the
+    same format {'baggage_id':["starting node", ('next node', conveyor belt
+    used to reach the next node, single baggage consumption)] }, or None if
+    the instance is infeasible. The belt statistics are updated with the
+    selected paths. """
+
+    core = get_graph_core(G, edges)
+    store = core.store
+    baggage_table = get_baggage_table(G)
+
+    # Step 1: baggage classes and their paths
+
+    model = assignment_model(G, edges)
+
+    if model["no_path"]:
+        # INFEASIBLE SOLUTION
+        return None
+
+    if model["cost"] is None:
+        return {}
+
+    # Step 2: integer solution of the assignment
+
+    options = {"mip_rel_gap": gap}
+    if time_limit is not None:
+        options["time_limit"] = time_limit
+
+    solution = milp(model["cost"],
+                    constraints=[LinearConstraint(model["A_eq"], model["b_eq"], model["b_eq"]),
+                                 LinearConstraint(model["A_ub"], -np.inf, model["b_ub"])],
+                    integrality=np.ones(model["num_variables"]),
+                    bounds=Bounds(0, np.inf), options=options)
+
+    if solution.status != 0:
+        # INFEASIBLE SOLUTION (or gap not reached in the time limit)
+        return None
+
+    count = np.rint(solution.x).astype(np.int64)
+
+    # Step 3: baggage disaggregation. The variables are grouped by class, in
+    # the class order, so repeating each variable by its number of baggage
+    # gives the variable of each row, once the rows are sorted by class.
+
+    order = np.argsort(model["row_class"], kind='stable')
+    rows = model["rows"][order]
+    variable = np.repeat(np.arange(model["num_variables"]), count)
+
+    first = model["variable_first"][variable]
+    second = model["variable_second"][variable]
+
+    # belt statistics update, once per belt
+    weights = baggage_table.weight[rows]
+    belts, belt_rows = np.unique(np.concatenate((first, second)), return_inverse=True)
+    belt_count = np.bincount(belt_rows, minlength=len(belts))
+    belt_weight = np.bincount(belt_rows, weights=np.tile(weights, 2), minlength=len(belts))
+
+    for belt, num_bags, weight in zip(belts.tolist(), belt_count.tolist(), belt_weight.tolist()):
+        store.commit_bulk(belt, num_bags, weight)
+
+    # baggage paths, with the same structure of 'min_cost_computation'
+    baggage_best_path = Compact_solution.from_belts(G, edges, baggage_table.id[rows],
+                                                    first, second).to_dict()
+
+    # the baggage reached their destinations and the source buffers are
+    # empty now
+    destination_nodes = np.array([core.node_index[name] for name in baggage_table.destinations])
+    reached = core.head[second]
+
+    for d, destination in enumerate(baggage_table.destinations):
+        G.nodes[destination]['baggage_list'].extend(np.sort(rows[reached == destination_nodes[d]]).tolist())
+
+    for source in baggage_table.sources:
+        buffer = G.nodes[source]['baggage_list']
+        G.nodes[source]['baggage_list'] = range(buffer.stop, buffer.stop)
+
+    return baggage_best_path
@@ -1,26 +1,18 @@
+import heapq
+import math
+import time
+import numpy as np
 from instance.instance_gen import *
+from instance.graph_gen import get_graph_core
+from instance.graph_core import INTERMEDIATE
+from instance.baggage_table import get_baggage_table
+from .compact_solution import Compact_solution
 
-def no_selected_edge_computation(edge_id, edges, baggage):
-
-    """ This function is called in the min_cost_computation to bring again belt 
-    statistics to the previous condition. This is important since any baggage
-    path is chosen according to the conveyor belt condition. This means that
-    for each baggage all belt statistics are momentaneously updated 
-    supposing that the bag is sent through that belt. Then, if that belt is 
-    not selected, statistics go back to their previous values using this 
-    function. It takes as input the id of the edge that is not selected 
-    "edge_id", the list of all the graph edges 'edges'
-    and the evaluated baggage 'baggage'. """
-
-    for edge in edges.values():
-        if edge_id == edge["info"].id:
-            edge["info"].total_consumption = edge["info"].total_consumption - edge["info"].baggage_consumption
-            edge["info"].total_weight -= baggage.weight
-            edge["info"].current_capacity_available += 1
-            edge["info"].current_weight_available = edge["info"].current_weight_available + baggage.weight
-                
+# width [kg] of the baggage weight classes of the candidate heaps (see 
+# 'select_candidate'). With integer weights each class holds one weight.
+WEIGHT_BIN = 1.0
 
-def min_cost_computation(G,edges):
+def min_cost_computation(G,edges, stats = None, compact = False):
 
     """ This function aims to compute the best path for each baggage in terms of 
     energy consumption related to conveyor belts use. The approach is based
@@ -29,44 +21,58 @@ def min_cost_computation(G,edges):
     the generated graph 'G' and the edges_list 'edges' as input parameters. They
     are both defined in the 'graph_gen' code. Then, it returns a dictionary 
     "baggage_best path" reporting the path selected for each baggage and the 
-    relative consumption. """
-
-    # Step 1: organization of the nodes list. Even if nodes information are 
-    # already associated to the graph structure, it is useful to define 
-    # three different lists for input, intermediate and output nodes. This 
-    # is done to manage nodes information in an easier way, making also
-    # the code more readable.
-
-    s = 0
-    i = 0
-    d = 0
-    
-    input = []
-    intermediate = []
-    output = []
-   
-    # "data = True" is specified according to take node data during the for loop.
-    # Without this specification, "node" would be just a string with the node name
-    # On the other hand, with this instruction, node is a tuple structure
-    # ("node name", {"demand": x, "baggage_list": {} }).
-
-    for node in G.nodes(data = True):
-        if node[0] == f'S{s+1}':
-            input.append(node)
-            s += 1
-        if node[0] == f'I{i+1}':
-            intermediate.append(node)
-            i += 1
-        if node[0] == f'D{d+1}':
-            output.append(node)
-            d += 1
+    relative consumption. If a Solver_stats instance is given as 'stats', the 
+    time of each phase and the hot-path counters are added to it (see 
+    'record_stats'); otherwise nothing is measured. If 'compact' is True, 
+    the dictionary is not built and a Compact_solution is returned instead,
+    with the belts of each baggage stored in NumPy arrays. """
+
+    # 'profile' is checked before each measure, so that nothing is done when
+    # no statistics are requested. The per-baggage values are accumulated
+    # in local variables and stored in 'stats' only at the end.
+
+    profile = stats is not None
+    if profile:
+        phase_start = time.perf_counter()
+        timings = dict.fromkeys(("setup", "candidate_selection",
+                                 "selection_commit", "intermediate_stage"), 0.0)
+        counters = dict.fromkeys(("baggage_routed", "belts_scanned",
+                                  "rejected_capacity", "rejected_weight",
+                                  "rejected_security", "security_fallbacks",
+                                  "commits"), 0)
+
+    # Step 1: the network is taken from the Graph_core built by 
+    # 'generate_edges'. Nodes are integer indexes (sources, intermediates and
+    # destinations in this order) and the belts leaving each node are in its
+    # CSR adjacency, so the solver works on integer ids and NumPy arrays
+    # instead of networkx attributes with string keys. Only the node buffers
+    # 'baggage_list' are still in the graph 'G', since they are part of the
+    # solution.
+
+    core = get_graph_core(G, edges)
+    node_names = core.node_names
+    head = core.head
+
+    # The belt state is stored in a Belt_store, whose arrays are read
+    # directly to check the capacity and weight constraints of the candidate
+    # belts of a baggage.
+
+    belt_store = core.store
+    power = belt_store.power
+    capacity_available = belt_store.capacity_available
+    weight_available = belt_store.weight_available
+
+    # node buffers, by node index. The intermediate and destination buffers
+    # are lists filled up in place during the computation.
+
+    buffers = [G.nodes[name]['baggage_list'] for name in node_names]
 
     # Step 2: Association of each baggage to its best path. Three for loop: 
     # the first one iterates on each input or intermediate node, the second one
-    # scans all the node baggage, while the third one iterates on any edge
-    # linked to the considered node according to select the best edge in terms of
-    # energy consumotion for that given baggage. Moreover, there are threshold
-    # values associated to each intermediate node that ensure an edge selection
+    # scans all the node baggage, while the best edge in terms of energy 
+    # consumption for that given baggage is taken from a priority queue of 
+    # the edges linked to the considered node. Moreover, there are threshold
+    # values associated to each link I -> D that ensure an edge selection
     # that prevent congestion even if it means more energy consumption. This 
     # is done to protect the system from failures.
 
@@ -77,241 +83,374 @@ def min_cost_computation(G,edges):
       
     baggage_best_path = {}
 
-    # 'j' is a "total counter" used as key of each G.nodes node.
-    j = 1  
-  
-  # node is ('node_name', {'demand: , 'baggage_list': {} } )
-    for node in input: 
+    # With 'compact', the paths are not stored in the dictionary: the ids of
+    # the S -> I and I -> D belts of each baggage are stored by table row 
+    # (0 for the baggage not routed) and encoded at the end.
 
-        # iteration over baggage of the node, where the stop point is len + 1 
-        # since baggage counter j start from 1
+    baggage_table = get_baggage_table(G)
 
-        for b in range(1,len(node[1]['baggage_list'])+1):
-            
-            bag = node[1]['baggage_list'][b]
-            bag_w = bag.weight
-            bag_d = bag.destination
-            bag_s = bag.start
+    if compact:
+        first_belts = [0]*len(baggage_table)
+        second_belts = np.zeros(len(baggage_table), dtype=np.int64)
 
-            baggage_best_path[bag.id] = []
-            baggage_best_path[bag.id].append(bag_s)
-            
+    # The baggage data are stored in the Baggage_table, while the node 
+    # buffers 'baggage_list' hold the table rows of the node baggage. 
+    # 'destination_nodes' gives the node index of each destination of the 
+    # table.
 
-            # 'possible edge' is a dictionary with the following structure:
-            # { key: ('next_node', edge id to reach the node, single baggage
-            # consumption), value: total consumption on the belt)}. It is used
-            # to store all these data supposing that the bag is added to that 
-            # belt. Indeed, if it is done for all the edges starting from 
-            # the node of the bag we are taking into account, 'possible_edge'
-            # will contain an overview about the impact that the bag would
-            # have on any edge it can potentially select to reach the next node.
-            # As for secure_possible_edge, it is the same of possible_edge but
-            # it stores information only related to those edge that are 
-            # almost full. This dictionary is taken into acoount only when
-            # 'possible edge' is empty, meaning that all the possible conveyor
-            # belts are almost full. 
-
-            possible_edge = {}
-            secure_possible_edge = {}
-            check_c = False # constraints check
-            security_check = False # bottleneck prevention check
-            i = 1
-            int_nodes = len(intermediate)
-            
-            for edge in edges.values():
-
-                #'c_threshold' and 'w_threshold' are values associated to the 
-                # output edge capacity and weight, considering that the edge
-                # starts from the intermedite node 'i' and it is linked to 
-                # the destination 'bag_d' of the bag. They are used to 
-                # leave a safe amount of space on the belt, so that the
-                # intermediate node 'i' is selcted by the sources only if 
-                # it can support the traffic towards the bag assigned 
-                # destination. 
-                 
-                if i <= int_nodes:
-                    c_threshold = int(G.nodes[f'I{i}']['output_edge_capacity'][bag_d]) - 10 # DA SISTEMARE CON VALORI ADEGUATI PER VERIFICHE SU POCHI BAGAGLI 
-                    w_threshold = int(G.nodes[f'I{i}']['output_edge_weight'][bag_d]) - (10+25/2) # DA SISTEMARE CON VALORI ADEGUATI PER VERIFICHE SU POCHI BAGAGLI 
-
-                # it is checked if the output node is an intermediate one, since
-                # in this loop they are the only to be taken into account 
-                # among all the "edges.values()". Then, if it is true, two 
-                # constraints has to be satisfied: 1) Capacity 2) Weight,
-                # meaning that the edge should have space to take another 
-                # baggage and it should be able to support that total weight.
-                # Then, if the check is true, we add to 'possible_edge'
-                # the potential consumption of that edge with that new baggage.
-                # However, if the total amount of baggae, sent through the node
-                # 'i' and directed towards the destination 'bag_d', is too high,
-                # that edge linking 'i' to 'bag_d' is not added to 'possible_edge'
-                # but to 'secure_possible_edge', since 'security_check' is false.
-                # That link is taken again into account only when 'possible_edge'
-                # becomes empty, so that the energy consumption comparison
-                # has to be performed between the edges that are all almost
-                # congested. To conclude, this approach leads to the selection
-                # of an adge that is not necessary the best in terms of energy
-                # consumption if it is risky for the system stability.
-
-                if edge['info'].output_node == f'I{i}' and edge['info'].input_node == node[0]:
-
-                    # constraint check
-
-                    if edge["info"].current_capacity_available - 1 >= 0 and edge["info"].current_weight_available - bag_w >= 0:
-                        check_c = True
-                    else:
-                        check_c = False
+    destination_nodes = np.array([core.node_index[name] for name in baggage_table.destinations], 
+                                 dtype=np.int64)
 
-                    # security check
+    if profile:
+        timings["setup"] += time.perf_counter() - phase_start
+  
+    for s in core.sources.tolist(): 
 
-                    if G.nodes[f'I{i}']["current_edge_capacity"][bag_d] + 1 <= c_threshold and G.nodes[f'I{i}']["current_edge_weight"][bag_d] + bag_w <= w_threshold:
-                        security_check = True
-                    else:
-                        security_check = False
-                
-                    # possible edge addition
-
-                    if check_c == True and security_check == True:
-                        # we call the power_consumption_computation function
-                        # defined in instance_gen
-                        total_consumption, baggage_consumption = edge["info"].power_consumption_computation(bag)
-                        possible_edge[(edge["info"].output_node, edge["info"].id, baggage_consumption)] = (total_consumption) 
-                    
-                    # security edge addition
-
-                    if check_c == True and security_check == False:
-                            total_consumption, baggage_consumption = edge["info"].power_consumption_computation(bag)
-                            secure_possible_edge[(edge["info"].output_node, edge["info"].id, baggage_consumption)] = (total_consumption)
-
-                    i+=1
-                    
-            if possible_edge:
-                # this portion of code is executed only if there are edges 
-                # satisfying the constraints discussed before.
-
-                # We delete the baggage information from the node that the 
-                # baggage is leaving
-                del node[1]['baggage_list'][b] 
-                
-                # next_node is the tuple between the 'possible_edge' keys
-                # associated to the lowest total consumption value. It is the 
-                # heart of the algorithm, where the best selection is performed,
-                # ensuring the best path in terms of energy consumption.
+        source = node_names[s]
 
-                next_node = min(possible_edge, key=possible_edge.get) #get restituisce i valori associati alle chiavi
-                
-                # we add to 'baggage_best_path' the tuple next node associated
-                # to the bag.id, so that we can store all the information 
-                # abount the next hop of the bag, the edge exploited and its cost 
-                baggage_best_path[bag.id].append(next_node) 
+        # belts leaving the node: only the belts reaching an intermediate 
+        # node are candidates for the first hop of the baggage
 
-                # We move the bag to the next node of the graph
-                G.nodes[next_node[0]]['baggage_list'][j] = bag
+        node_belts = core.out_belts(s)
+        candidates = node_belts[core.node_kind[head[node_belts]] == INTERMEDIATE]
 
-                # output node link parametrs updating 
-                G.nodes[next_node[0]]["current_edge_weight"][bag_d] += bag_w
-                G.nodes[next_node[0]]["current_edge_capacity"][bag_d] += 1
+        # 'candidate_links' is a dictionary {destination: list of the ids of
+        # the belts linking the intermediate node of each candidate to that
+        # destination (0 if there is no such belt)}, used for the security
+        # check. 'candidate_heaps' is a dictionary {(destination, baggage 
+        # weight class): (safe heap, secure heap)}. The weight classes are
+        # WEIGHT_BIN wide, so their number does not grow with the number of
+        # distinct (real valued) weights. The heaps hold the (total 
+        # consumption the belt would have with a baggage of the lowest 
+        # weight of the class, candidate index) pairs, so the best belt is 
+        # found without evaluating all of them. The safe heap plays the role of the old 
+        # 'possible_edge' dictionary, the secure heap the one of 
+        # 'secure_possible_edge' (see 'select_candidate').
 
-                # For those edges that are not selected, the updated information
-                # have to go back to their previous values, since the impact
-                # of the bag on those edges does not have to be considered.
-                 
-                for edge in possible_edge.keys():
-                    if edge[0] != next_node[0]:
-                        no_selected_edge_computation(edge[1],edges,bag)
+        candidate_links = {}
+        candidate_heaps = {}
+        candidate_ids = candidates.tolist()
 
-                j += 1
+        # iteration over baggage of the node. Their ids, weights and 
+        # destinations are taken from the table columns all at once.
 
-            elif secure_possible_edge:
-                
-                # This portion of code is executed only when there are no more 
-                # safe 'possible edge', but its working principle is still
-                # the same of the 'if' statement at line 187.
+        rows = buffers[s]
+        bag_ids, bag_weights, _ = baggage_table.rows_data(rows)
+        bag_destinations = destination_nodes[baggage_table.destination[baggage_table.row_selector(rows)]].tolist()
+
+        for b, row in enumerate(rows):
             
-                del node[1]['baggage_list'][b] 
+            bag_id = bag_ids[b]
+            bag_w = bag_weights[b]
+            bag_d = bag_destinations[b]
+
+            if not compact:
+                baggage_best_path[bag_id] = []
+                baggage_best_path[bag_id].append(source)
+
+            if profile:
+                phase_start = time.perf_counter()
+
+            # the links and the heaps are built the first time a baggage 
+            # with this destination (and weight class) is found
+            links = candidate_links.get(bag_d)
+
+            if links is None:
+                links = core.find_belts(head[candidates], np.full(len(candidates), bag_d)).tolist()
+                candidate_links[bag_d] = links
+
+            weight_class = math.floor(bag_w/WEIGHT_BIN)
+            class_w = weight_class*WEIGHT_BIN
+            heaps = candidate_heaps.get((bag_d, weight_class))
+
+            if heaps is None:
+                safe_heap = [(float((belt_store.total_weight[id] + class_w)*power[id]), k)
+                             for k, id in enumerate(candidate_ids)]
+                heapq.heapify(safe_heap)
+                heaps = (safe_heap, [])
+                candidate_heaps[(bag_d, weight_class)] = heaps
+
+            k, secure = select_candidate(core, heaps, candidate_ids, links, 
+                                         bag_w, class_w, counters if profile else None)
+
+            if profile:
+                selection_start = time.perf_counter()
+                timings["candidate_selection"] += selection_start - phase_start
+
+            if k is None:
+                # the code arrives here if there are no edges satisfying 
+                # the constraints, so the solution is infeasible
+                if profile:
+                    record_stats(stats, timings, counters)
+                baggage_best_path = None
+                return baggage_best_path
 
-                next_node = min(secure_possible_edge, key=secure_possible_edge.get)
-                
-                baggage_best_path[bag.id].append(next_node) 
-                
-                G.nodes[next_node[0]]['baggage_list'][j] = bag
-                G.nodes[next_node[0]]["current_edge_weight"][bag_d] += bag_w
-                G.nodes[next_node[0]]["current_edge_capacity"][bag_d] += 1
-                 
-                for edge in secure_possible_edge.keys():
-                    if edge[0] != next_node[0]:
-                        no_selected_edge_computation(edge[1],edges,bag)
+            # next_node is the tuple ('next_node', edge id to reach the 
+            # node, single baggage consumption) of the selected belt, i.e.
+            # the one with the lowest total consumption. It is the heart of
+            # the algorithm, where the best selection is performed, ensuring 
+            # the best path in terms of energy consumption.
 
-                j += 1
-            
+            id = candidate_ids[k]
+            i = int(head[id])
 
+            if compact:
+                first_belts[row] = id
             else:
-                # the code arrives here if possible_edge is empty, so there
-                # are no edges satisfying the constraints, so the solution
-                # is infeasible
-                baggage_best_path = None
-                return baggage_best_path
+                next_node = (node_names[i], id, float(bag_w*power[id]))
                 
+                # we add to 'baggage_best_path' the tuple next node associated
+                # to the bag id, so that we can store all the information 
+                # abount the next hop of the bag, the edge exploited and its cost 
+                baggage_best_path[bag_id].append(next_node) 
+
+            # We move the bag to the next node of the graph
+            buffers[i].append(row)
+
+            # output link parametrs updating 
+            link = links[k]
+            core.reserved_weight[link] += bag_w
+            core.reserved_capacity[link] += 1
+
+            # Only the selected belt is updated with the bag. Its entries in
+            # the heaps are now lower than its real consumption, so they are
+            # updated when they reach the top of a heap.
+                 
+            belt_store.commit(id, bag_w)
+
+            if profile:
+                counters["commits"] += 1
+                if secure:
+                    counters["security_fallbacks"] += 1
+                timings["selection_commit"] += time.perf_counter() - selection_start
 
+        # all the baggage left the node, so its buffer becomes empty
+        G.nodes[source]['baggage_list'] = range(rows.stop, rows.stop)
     
     # Now, the same is done to move baggage from intemrediate nodes to their
     # destination. There are just few differences, so we could merge these
     # two portion of the code. However, for a better readability we 
     # decided to keep them separated. 
 
-    # Remember that node is ('node_name', {'demand: , 'baggage_list': {} } )
-    for node in intermediate: 
-        
-        #--------------------------------------------
-        # We are numbering the baggage list of intermediate nodes from scratch 
-        # because we need that the luggage go from index 1 to x, where x is the 
-        # last luggage. Otherwise we have that in the previous for, the indices 
-        # are given by j, which is a unique index for all luggage associated 
-        # with any node, and in that case it is not possible to
-        # scroll through the luggage as done in line 178.
-
-        baggage = list(node[1]["baggage_list"].values())
-        node[1]["baggage_list"].clear()
-
-        for i, value in enumerate(baggage):
-            node[1]["baggage_list"][i+1] = value
-        #--------------------------------------------
-
-        # len + 1 since baggage start from 1
-        for b in range(1,len(node[1]['baggage_list'])+1): 
-            bag = node[1]['baggage_list'][b]
-            bag_w = bag.weight
-            bag_d = bag.destination
-
-            possible_edge = {}
-            check_c = False
-                        
-            for edge in edges.values():
-
-                # == bag_d since tha baggage has to arrive to its
-                # assigned destination. Then, the code is almost the same as before
-
-                if edge['info'].output_node == bag_d and edge['info'].input_node == node[0]: 
-                    
-                    if edge["info"].current_capacity_available - 1 >= 0 and edge["info"].current_weight_available - bag_w >= 0:
-                        check_c = True
-                
-                # Here there is no "possible_edge". From each intermediate
-                # node there is only one possible selection corresponding to
-                # the destination node
-
-                    if check_c == True:
-                        total_consumption, baggage_consumption = edge["info"].power_consumption_computation(bag) 
-                        del node[1]['baggage_list'][b] 
-                        next_node = (edge["info"].output_node, edge["info"].id, baggage_consumption)
-                        baggage_best_path[bag.id].append(next_node)
-                        G.nodes[next_node[0]]['baggage_list'][j] = bag
-    
-                        j += 1
+    if profile:
+        phase_start = time.perf_counter()
+
+    for i in core.intermediates.tolist(): 
+
+        # the intermediate buffer is the list of the table rows received
+        # from the sources, in FIFO order
+
+        rows = buffers[i]
+        bag_ids, bag_weights, _ = baggage_table.rows_data(rows)
+
+        # since the baggage has to arrive to its assigned destination, the 
+        # only belt to be evaluated is the one linking the intermediate node
+        # to it. The belts of all the buffer are found at once (0 if the 
+        # belt does not exist).
+
+        bag_destinations = destination_nodes[baggage_table.destination[baggage_table.row_selector(rows)]]
+        bag_belts = core.find_belts(np.full(len(rows), i), bag_destinations).tolist()
 
-            if check_c == False:
+        for b, row in enumerate(rows): 
+            bag_id = bag_ids[b]
+            bag_w = bag_weights[b]
+            id = bag_belts[b]
+
+            # Here there is no "possible_edge". From each intermediate
+            # node there is only one possible selection corresponding to
+            # the destination node. Then, the code is almost the same as 
+            # before
+
+            if id == 0 or capacity_available[id] - 1 < 0 or weight_available[id] - bag_w < 0:
                 # INFEASIBLE SOLUTION
+                if profile:
+                    timings["intermediate_stage"] += time.perf_counter() - phase_start
+                    record_stats(stats, timings, counters)
                 baggage_best_path = None
                 return baggage_best_path
-    
+
+            belt_store.commit(id, bag_w)
+            d = int(head[id])
+            if not compact:
+                baggage_best_path[bag_id].append((node_names[d], id, float(bag_w*power[id])))
+            buffers[d].append(row)
+
+        if compact:
+            second_belts[baggage_table.row_selector(rows)] = bag_belts
+
+        if profile:
+            # one belt scanned and committed for each baggage
+            counters["belts_scanned"] += len(rows)
+            counters["commits"] += len(rows)
+            counters["baggage_routed"] += len(rows)
+
+        # all the baggage reached their destination
+        G.nodes[node_names[i]]['baggage_list'] = []
+
+    if profile:
+        timings["intermediate_stage"] += time.perf_counter() - phase_start
+        record_stats(stats, timings, counters)
+
+    if compact:
+        routed = np.flatnonzero(second_belts)
+        return Compact_solution.from_belts(G, edges, baggage_table.id[routed],
+                                           np.array(first_belts)[routed], second_belts[routed])
     
     return baggage_best_path
+
+
+def select_candidate(core, heaps, candidates, links, bag_w, class_w, counters = None):
+
+    """ This function selects the belt of the first hop of a baggage of 
+    weight 'bag_w'. 'heaps' is the pair (safe heap, secure heap) of the 
+    baggage destination and weight class, whose lowest weight is 'class_w',
+    built by 'min_cost_computation', 'candidates' the list of the ids of 
+    the belts leaving the source and 'links' the ids of the belts linking 
+    their intermediate nodes to the baggage destination. It returns the 
+    index of the selected belt in 'candidates' (None if no belt can take the
+    baggage) and True if it was taken from the secure heap. The selected 
+    belt is the same that would be found by evaluating all the candidates:
+    1) a belt without enough capacity or weight for the baggage of the 
+       class, or whose intermediate node is not linked to the destination, 
+       is removed, since the capacity and weight only decrease during the 
+       computation. A belt that cannot take this baggage but can take a 
+       lighter one of the class is only set aside.
+    2) a belt whose output link towards the destination is beyond the 
+       security thresholds (see below) for all the baggage of the class is
+       moved from the safe heap to the secure one, since the traffic on the
+       links only increases as well (it is set aside if only this baggage 
+       is beyond the thresholds). The secure heap is used only when the 
+       safe one is empty.
+    3) the consumption of a belt only grows when it takes a baggage, so an
+       entry can be lower than the real value: in this case it is updated 
+       and pushed again. The entries are computed with the weight 'class_w',
+       so an updated entry is a lower bound of the consumption with the 
+       baggage: the entries are evaluated with the weight of the baggage 
+       until the top of the heap is not lower than the best one found. 
+       With integer weights the class weight is the baggage weight, so the 
+       first updated entry at the top of the heap is the best belt.
+    Ties are broken by the candidate order, like the old 'min' over the 
+    candidates. 'counters' are the profiling counters of 
+    'min_cost_computation', or None. """
+
+    belt_store = core.store
+    capacity_available = belt_store.capacity_available
+    weight_available = belt_store.weight_available
+    total_weight = belt_store.total_weight
+    power = belt_store.power
+
+    safe_heap, secure_heap = heaps
+
+    for heap in (safe_heap, secure_heap):
+
+        secure = heap is secure_heap
+
+        # (consumption with the baggage, candidate index) of the best belt
+        # found, and the entries taken out of the heap for this baggage only
+        best = None
+        set_aside = []
+
+        while heap:
+
+            consumption, k = heap[0]
+
+            # the other entries are lower bounds not lower than the best one
+            if best is not None and (consumption, k) >= best:
+                break
+
+            id = candidates[k]
+            link = links[k]
+
+            if counters is not None:
+                counters["belts_scanned"] += 1
+
+            # constraint check: 1) Capacity 2) Weight, meaning that the edge
+            # should have space to take another baggage and it should be 
+            # able to support that total weight.
+
+            if link == 0 or capacity_available[id] - 1 < 0 or weight_available[id] - bag_w < 0:
+                if link == 0 or capacity_available[id] - 1 < 0 or weight_available[id] - class_w < 0:
+                    heapq.heappop(heap)
+                else:
+                    set_aside.append(heapq.heappop(heap))
+                if counters is not None:
+                    if capacity_available[id] - 1 < 0:
+                        counters["rejected_capacity"] += 1
+                    else:
+                        counters["rejected_weight"] += 1
+                continue
+
+            # security check. 'c_threshold' and 'w_threshold' are values 
+            # associated to the output link capacity and weight, considering
+            # that the link starts from the intermedite node of the belt and
+            # it reaches the destination of the bag. They are used to leave 
+            # a safe amount of space on the link, so that the intermediate 
+            # node is selcted by the sources only if it can support the 
+            # traffic towards the bag assigned destination. If the total 
+            # amount of baggage already sent through the intermediate node 
+            # towards that destination is too high, the belt is taken into 
+            # account only when all the other ones are almost congested, even
+            # if it means more energy consumption, since it is risky for the
+            # system stability.
+
+            if not secure:
+
+                c_threshold = int(belt_store.max_capacity[link]) - 10 # DA SISTEMARE CON VALORI ADEGUATI PER VERIFICHE SU POCHI BAGAGLI 
+                w_threshold = int(belt_store.max_weight[link]) - (10+25/2) # DA SISTEMARE CON VALORI ADEGUATI PER VERIFICHE SU POCHI BAGAGLI 
+
+                if not (core.reserved_capacity[link] + 1 <= c_threshold and core.reserved_weight[link] + bag_w <= w_threshold):
+                    if not (core.reserved_capacity[link] + 1 <= c_threshold and core.reserved_weight[link] + class_w <= w_threshold):
+                        heapq.heappush(secure_heap, heapq.heappop(heap))
+                    else:
+                        set_aside.append(heapq.heappop(heap))
+                    if counters is not None:
+                        counters["rejected_security"] += 1
+                    continue
+
+            # lazy update of the consumption the belt would have with a 
+            # baggage of the class weight
+            current_consumption = float((total_weight[id] + class_w)*power[id])
+
+            if current_consumption != consumption:
+                heapq.heapreplace(heap, (current_consumption, k))
+                continue
+
+            # consumption with this baggage
+            candidate = (float((total_weight[id] + bag_w)*power[id]), k)
+
+            if best is None or candidate < best:
+                best = candidate
+
+            set_aside.append(heapq.heappop(heap))
+
+        for entry in set_aside:
+            heapq.heappush(heap, entry)
+
+        if best is not None:
+            return best[1], secure
+
+    return None, False
+
+
+def record_stats(stats, timings, counters):
+
+    """ It stores in the Solver_stats 'stats' the phase timings and the 
+    counters collected by 'min_cost_computation':
+    - setup: node lists and belt index preparation
+    - candidate_selection: search of the best candidate in the heaps
+    - selection_commit: choice of the cheapest belt and its update
+    - intermediate_stage: I -> D hop of all the baggage
+    - baggage_routed: baggage that reached their destination
+    - belts_scanned: heap entries (and I -> D belts) evaluated
+    - rejected_capacity / rejected_weight: candidates removed from a heap 
+      since without capacity / without enough weight available
+    - rejected_security: candidates moved to a secure heap, since over the
+      security thresholds
+    - security_fallbacks: baggage sent over a belt beyond the thresholds,
+      since no safe belt was available
+    - commits: belt updates (one for each hop of each baggage) """
+
+    for phase, seconds in timings.items():
+        stats.add_time(phase, seconds)
+    for name, value in counters.items():
+        stats.count(name, value)
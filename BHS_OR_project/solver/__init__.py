@@ -1,7 +1,35 @@
 from .MCF_heu import min_cost_computation
 from .LNS_heu import local_search_with_neighborhood
+from .MCF_exact import exact_computation
+from .MCF_aggregated import aggregated_flow_computation
+from .LNS_parallel import multi_start_local_search
+from .solver_stats import Solver_stats
+from .online_router import Online_router, baggage_arrivals
+from .dag_router import Dag_router, dag_routing_computation
+from .time_expanded import Belt_timeline, draw_time_windows, throughput_scheduling
+from .lower_bound import lp_lower_bound, optimality_gap
+from .compact_solution import Compact_solution
+from .evaluation import total_consumption, evaluate_solution
+from .validation import validate_solution
 
 __all__ = [
     "min_cost_computation",
     "local_search_with_neighborhood",
+    "exact_computation",
+    "aggregated_flow_computation",
+    "multi_start_local_search",
+    "Solver_stats",
+    "Online_router",
+    "baggage_arrivals",
+    "Dag_router",
+    "dag_routing_computation",
+    "Belt_timeline",
+    "draw_time_windows",
+    "throughput_scheduling",
+    "lp_lower_bound",
+    "optimality_gap",
+    "Compact_solution",
+    "total_consumption",
+    "evaluate_solution",
+    "validate_solution",
 ]
\ No newline at end of file
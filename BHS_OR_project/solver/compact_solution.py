@@ -0,0 +1,171 @@
+import numpy as np
+from instance.graph_gen import get_graph_core
+from instance.baggage_table import get_baggage_table
+
+class Compact_solution:
+
+    """
+    Compact encoding of a solution of the S -> I -> D network. Instead of
+    the "baggage_best_path" dictionary, whose paths mix node names, tuples
+    and (for the LNS) Baggage objects, each routed baggage is a position in
+    four NumPy arrays:
+    - bag_id: baggage id (int32)
+    - first: id of the S -> I belt of the baggage (int32)
+    - second: id of the I -> D belt of the baggage (int32)
+    - consumption: consumption of the baggage on its two belts (float32)
+    The positions are sorted by baggage id. The node names are not stored:
+    they are taken from the Graph_core 'core' and the Baggage_table
+    'baggage_table' of the instance only when the old dictionary is built
+    with 'to_dict'.
+
+    """
+
+    def __init__(self, bag_id, first, second, consumption, core, baggage_table):
+
+        self.bag_id = np.asarray(bag_id, dtype=np.int32)
+        self.first = np.asarray(first, dtype=np.int32)
+        self.second = np.asarray(second, dtype=np.int32)
+        self.consumption = np.asarray(consumption, dtype=np.float32)
+
+        self.core = core
+        self.baggage_table = baggage_table
+
+
+    def __len__(self):
+        return len(self.bag_id)
+
+
+    @classmethod
+    def from_belts(cls, G, edges, bag_id, first, second):
+
+        """ It builds the compact solution of the baggage 'bag_id' routed on
+        the belts 'first' and 'second' (arrays of the same length). The
+        positions are sorted by baggage id and the consumption is computed
+        from the baggage weights and the belt powers. """
+
+        core = get_graph_core(G, edges)
+        baggage_table = get_baggage_table(G)
+
+        bag_id = np.asarray(bag_id, dtype=np.int64)
+        order = np.argsort(bag_id, kind='stable')
+        bag_id = bag_id[order]
+        first = np.asarray(first, dtype=np.int64)[order]
+        second = np.asarray(second, dtype=np.int64)[order]
+
+        # the row of a baggage in the table is its id - 1
+        weight = baggage_table.weight[bag_id - 1]
+        power = core.store.power
+        consumption = weight*power[first] + weight*power[second]
+
+        return cls(bag_id, first, second, consumption, core, baggage_table)
+
+
+    @classmethod
+    def from_dict(cls, G, edges, baggage_path):
+
+        """ It encodes a solution in the dictionary format, the one of
+        'min_cost_computation' or the one of 'local_search_with_neighborhood'
+        (with the Baggage after the starting node). Only S -> I -> D paths
+        can be encoded: a ValueError is raised if a path has a different 
+        number of belts, e.g. in a multi-stage network. """
+
+        bag_id = np.fromiter(baggage_path.keys(), dtype=np.int64, count=len(baggage_path))
+
+        # expected length of the paths: starting node, Baggage (only in the
+        # LNS format) and the two belts
+        length = 3
+        for path in baggage_path.values():
+            length = 3 if isinstance(path[1], tuple) else 4
+            break
+
+        lengths = np.fromiter((len(path) for path in baggage_path.values()),
+                              dtype=np.int64, count=len(baggage_path))
+
+        if (lengths != length).any():
+            bag = int(bag_id[np.argmax(lengths != length)])
+            raise ValueError(f"The path of the baggage {bag} does not have "
+                             "two belts, so it cannot be encoded.")
+
+        # the last two hops of each path are the S -> I and I -> D belts
+        first = np.fromiter((path[-2][1] for path in baggage_path.values()),
+                            dtype=np.int64, count=len(baggage_path))
+        second = np.fromiter((path[-1][1] for path in baggage_path.values()),
+                             dtype=np.int64, count=len(baggage_path))
+
+        return cls.from_belts(G, edges, bag_id, first, second)
+
+
+    def objective(self):
+
+        """ Total consumption of the solution. The float32 values are summed
+        in double precision. """
+
+        return float(np.sum(self.consumption, dtype=np.float64))
+
+
+    @property
+    def rows(self):
+
+        """ Rows of the baggage in the Baggage_table. """
+
+        return self.bag_id.astype(np.int64) - 1
+
+
+    @property
+    def sources(self):
+
+        """ Node index of the source of each baggage. """
+
+        return self.core.tail[self.first]
+
+
+    @property
+    def intermediates(self):
+
+        """ Node index of the intermediate node of each baggage. """
+
+        return self.core.head[self.first]
+
+
+    @property
+    def destinations(self):
+
+        """ Node index of the node reached by each baggage. """
+
+        return self.core.head[self.second]
+
+
+    def to_dict(self, with_baggage = False):
+
+        """ It decodes the solution in the "baggage_best_path" format of
+        'min_cost_computation': {'baggage_id': ["starting node", ('next
+        node', belt id, single baggage consumption), ...]}. If
+        'with_baggage' is True the Baggage is inserted after the starting
+        node, like in the solutions of 'local_search_with_neighborhood'.
+        The names and the hop consumptions (in double precision, like the
+        solvers) are computed with array operations, so only the final
+        dictionary is built in Python. """
+
+        node_names = np.array(self.core.node_names, dtype=object)
+        power = self.core.store.power
+        rows = self.rows
+        weight = self.baggage_table.weight[rows]
+
+        first = self.first.astype(np.int64)
+        second = self.second.astype(np.int64)
+
+        columns = zip(self.bag_id.tolist(),
+                      node_names[self.core.tail[first]].tolist(),
+                      node_names[self.core.head[first]].tolist(),
+                      first.tolist(), (weight*power[first]).tolist(),
+                      node_names[self.core.head[second]].tolist(),
+                      second.tolist(), (weight*power[second]).tolist())
+
+        if not with_baggage:
+            return {bag: [source, (node_i, first_belt, first_cons), (node_d, second_belt, second_cons)]
+                    for bag, source, node_i, first_belt, first_cons, node_d, second_belt, second_cons in columns}
+
+        return {bag: [source, self.baggage_table.baggage(row),
+                      (node_i, first_belt, first_cons), (node_d, second_belt, second_cons)]
+                for row, (bag, source, node_i, first_belt, first_cons, node_d, second_belt, second_cons)
+                in zip(rows.tolist(), columns)}
@@ -0,0 +1,474 @@
+import heapq
+import time
+import numpy as np
+from instance.graph_gen import get_graph_core
+from instance.baggage_table import get_baggage_table
+
+class Dag_router:
+
+    """
+    Router for networks of any depth: the baggage can go through any number
+    of intermediate stages (sorters, merges, make-up carousels, ...) as long
+    as the belts form a directed acyclic graph (DAG). It works on the
+    Graph_core of the instance, so any topology built by 'generate_edges'
+    can be routed.
+
+    The consumption of a baggage on a belt is its weight times the belt
+    power coefficient, so the marginal energy of a path is the baggage
+    weight times the sum of the power coefficients of its belts. The
+    cheapest path towards a destination is then the same for all the
+    baggage, and it is given by a shortest path tree rooted in the
+    destination: for each node, 'dist' is the power of its cheapest path to
+    the destination and 'next_belt' the first belt of that path.
+
+    Only the open belts are used by the trees: a belt is closed when it has
+    no capacity left or when its residual weight is lower than
+    'closing_weight', the weight of the baggage being routed (the heaviest
+    baggage at the beginning). When a lighter baggage is routed, the closing
+    weight is lowered to its weight and the belts closed only by their
+    weight that can take it are opened again (see 'lower_closing_weight'),
+    so the open belts are exactly the ones that can take the baggage and
+    the tree gives its cheapest feasible path. If the baggage are routed
+    from the heaviest, this happens at most once per distinct weight. The
+    trees are built the first time a
+    destination is found and then cached. Each tree is kept up to date only
+    in the nodes that can be reached from the sources routed to its
+    destination (its relevant nodes). When a belt is closed, only the trees
+    using it are repaired, and only in the relevant nodes upstream of the
+    belt whose distance changes, so the work per baggage does not grow with
+    the number of stages. If a baggage finds no path in its tree (the belts are
+    almost full), a shortest path with the exact residual weight of the
+    belts is computed for that baggage only.
+
+    """
+
+    def __init__(self, G, edges_list, closing_weight = None):
+
+        self.core = core = get_graph_core(G, edges_list)
+        self.store = core.store
+        num_nodes = core.num_nodes
+
+        # belts entering each node (reverse CSR adjacency)
+        adjacency = core.adjacency
+        order = np.argsort(core.head[adjacency], kind='stable')
+        self.in_adjacency = adjacency[order]
+        self.in_indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+        self.in_indptr[1:] = np.cumsum(np.bincount(core.head[adjacency], minlength=num_nodes))
+
+        # level of each node: 0 for the nodes without belts leaving them,
+        # otherwise one more than the highest level of the next nodes
+        self.level = self.compute_levels()
+
+        # the belts leaving the nodes of each level, sorted by their input
+        # node, for the vectorized computation of the trees: (belt ids,
+        # input nodes)
+        self.level_belts = []
+        belt_levels = self.level[core.tail[adjacency]]
+
+        for level in range(int(self.level.max(initial=0)) + 1):
+            belts = adjacency[belt_levels == level]
+            self.level_belts.append((belts, core.tail[belts]))
+
+        # belts that can be used by the trees
+        if closing_weight is None:
+            baggage_table = get_baggage_table(G)
+            closing_weight = float(baggage_table.weight.max()) if len(baggage_table) else 0.0
+
+        self.closing_weight = closing_weight
+        self.open = np.zeros(self.store.size, dtype=bool)
+        self.open[adjacency] = ((self.store.capacity_available[adjacency] >= 1) &
+                                (self.store.weight_available[adjacency] >= closing_weight))
+
+        # belts closed only by their weight, as a heap of (- residual weight,
+        # belt id): they can be opened again for lighter baggage. The
+        # residual weights in the heap can be higher than the real ones,
+        # when an exact search used the belt, and they are checked when
+        # popped.
+        weight_closed = adjacency[~self.open[adjacency] &
+                                  (self.store.capacity_available[adjacency] >= 1)]
+        self.weight_closed = list(zip((-self.store.weight_available[weight_closed]).tolist(),
+                                      weight_closed.tolist()))
+        heapq.heapify(self.weight_closed)
+
+        # cached trees: one row for each destination found so far
+        self.tree_row = {}
+        self.dist = np.empty((0, num_nodes), dtype=np.float64)
+        self.next_belt = np.empty((0, num_nodes), dtype=np.int64)
+        self.relevant = np.empty((0, num_nodes), dtype=bool)
+
+        # counters of the hot paths, read by 'dag_routing_computation'
+        self.counters = {"trees_built": 0, "belts_closed": 0,
+                         "belts_reopened": 0, "nodes_repaired": 0,
+                         "exact_searches": 0}
+
+
+    def compute_levels(self):
+
+        """ It computes the level of each node visiting the network backwards
+        from the nodes without belts leaving them (Kahn algorithm). A
+        ValueError is raised if the belts form a cycle. """
+
+        core = self.core
+        level = np.zeros(core.num_nodes, dtype=np.int64)
+        out_degree = np.diff(core.indptr)
+        ready = np.flatnonzero(out_degree == 0).tolist()
+        visited = 0
+
+        while ready:
+
+            node = ready.pop()
+            visited += 1
+
+            for belt in self.in_adjacency[self.in_indptr[node]:self.in_indptr[node+1]].tolist():
+
+                tail = core.tail[belt]
+                level[tail] = max(level[tail], level[node] + 1)
+                out_degree[tail] -= 1
+
+                if out_degree[tail] == 0:
+                    ready.append(tail)
+
+        if visited < core.num_nodes:
+            raise ValueError("the belts of the network form a cycle")
+
+        return level
+
+
+    def shortest_paths(self, destination, usable, relevant):
+
+        """ It computes the shortest path tree rooted in the node
+        'destination' using only the belts for which 'usable' is True, for
+        the nodes for which 'relevant' is True. The levels are visited from
+        the destinations upwards, and each level is computed at once with 
+        NumPy: for each node, the cheapest of its belts is found sorting 
+        them by (input node, cost). It returns the 'dist' and 'next_belt' 
+        arrays of the tree (inf and 0 for the nodes that cannot reach the 
+        destination or that are not relevant). """
+
+        power = self.store.power
+        head = self.core.head
+
+        dist = np.full(self.core.num_nodes, np.inf)
+        next_belt = np.zeros(self.core.num_nodes, dtype=np.int64)
+        dist[destination] = 0.0
+
+        for belts, tails in self.level_belts[1:]:
+
+            keep = relevant[tails]
+            belts = belts[keep]
+            tails = tails[keep]
+
+            if len(belts) == 0:
+                continue
+
+            cost = power[belts] + dist[head[belts]]
+            cost[~usable[belts]] = np.inf
+
+            # the belts are sorted by input node: the first of each group
+            # of belts with the same input node after sorting them by cost
+            starts = np.flatnonzero(np.r_[True, tails[1:] != tails[:-1]])
+            best = np.lexsort((cost, tails))[starts]
+
+            dist[tails[starts]] = cost[best]
+            next_belt[tails[starts]] = np.where(np.isfinite(cost[best]), belts[best], 0)
+
+        return dist, next_belt
+
+
+    def tree(self, source, destination):
+
+        """ Row of the cached tree of the node 'destination', updated for the
+        baggage of the node 'source'. The tree is built the first time the
+        destination is found, and built again when a new source makes some
+        nodes relevant, since their distances were not kept up to date. """
+
+        row = self.tree_row.get(destination)
+
+        if row is None:
+
+            row = len(self.tree_row)
+
+            # the tree arrays grow by doubling their rows
+            if row == len(self.dist):
+                size = max(1, 2*row)
+                self.dist = np.resize(self.dist, (size, self.core.num_nodes))
+                self.next_belt = np.resize(self.next_belt, (size, self.core.num_nodes))
+                self.relevant = np.resize(self.relevant, (size, self.core.num_nodes))
+
+            self.relevant[row] = False
+            self.tree_row[destination] = row
+
+        relevant = self.relevant[row]
+
+        if not relevant[source]:
+
+            # the nodes reached from the source become relevant, visiting
+            # the network one frontier of nodes at a time
+            frontier = np.array([source])
+            relevant[source] = True
+
+            while len(frontier):
+                heads = np.unique(self.core.head[self.core.out_belts_of(frontier)])
+                frontier = heads[~relevant[heads]]
+                relevant[frontier] = True
+
+            self.dist[row], self.next_belt[row] = self.shortest_paths(destination, self.open, relevant)
+            self.counters["trees_built"] += 1
+
+        return row
+
+
+    def close_belt(self, belt):
+
+        """ It closes the belt 'belt' and it repairs the cached trees using
+        it (see 'repair_tree'). """
+
+        self.open[belt] = False
+        self.counters["belts_closed"] += 1
+
+        if self.store.capacity_available[belt] >= 1:
+            heapq.heappush(self.weight_closed, (-float(self.store.weight_available[belt]), belt))
+
+        start = int(self.core.tail[belt])
+        trees = np.flatnonzero((self.next_belt[:len(self.tree_row), start] == belt) &
+                               self.relevant[:len(self.tree_row), start])
+
+        for row in trees.tolist():
+            self.repair_tree(row, [start])
+
+
+    def repair_tree(self, row, nodes):
+
+        """ It repairs the tree 'row' after the belts leaving the relevant
+        nodes 'nodes' were closed or opened. The nodes upstream are visited
+        by increasing level, so each node is computed again only after its
+        next nodes, and only while its distance changes: when it grows, the
+        nodes whose path goes through the node are computed again, when it
+        decreases all the nodes with a belt towards it. """
+
+        core = self.core
+        power = self.store.power
+        dist = self.dist[row]
+        next_belt = self.next_belt[row]
+        relevant = self.relevant[row]
+
+        heap = [(self.level[node], node) for node in nodes]
+        heapq.heapify(heap)
+        queued = set(nodes)
+
+        while heap:
+
+            level, node = heapq.heappop(heap)
+            self.counters["nodes_repaired"] += 1
+
+            belts = core.out_belts(node)
+            cost = power[belts] + dist[core.head[belts]]
+            cost[~self.open[belts]] = np.inf
+
+            best = int(np.argmin(cost)) if len(belts) else -1
+            new_dist = cost[best] if best >= 0 else np.inf
+            next_belt[node] = belts[best] if np.isfinite(new_dist) else 0
+
+            if new_dist == dist[node]:
+                continue
+
+            decreased = new_dist < dist[node]
+            dist[node] = new_dist
+
+            for in_belt in self.in_adjacency[self.in_indptr[node]:self.in_indptr[node+1]].tolist():
+
+                tail = core.tail[in_belt]
+                if (relevant[tail] and tail not in queued and
+                        (decreased or next_belt[tail] == in_belt)):
+                    queued.add(tail)
+                    heapq.heappush(heap, (self.level[tail], tail))
+
+
+    def lower_closing_weight(self, weight):
+
+        """ It lowers the closing weight to 'weight', opening again the
+        belts closed by their weight that can take it. The cached trees are
+        repaired from the input nodes of the opened belts (see 
+        'repair_tree'). """
+
+        store = self.store
+        self.closing_weight = weight
+        reopened = []
+
+        while self.weight_closed and -self.weight_closed[0][0] >= weight:
+
+            residual, belt = heapq.heappop(self.weight_closed)
+
+            if self.open[belt] or store.capacity_available[belt] < 1:
+                continue
+
+            if store.weight_available[belt] < weight:
+                # the residual weight decreased after the belt was closed
+                heapq.heappush(self.weight_closed, (-float(store.weight_available[belt]), belt))
+                continue
+
+            self.open[belt] = True
+            reopened.append(belt)
+
+        if not reopened:
+            return
+
+        self.counters["belts_reopened"] += len(reopened)
+        tails = np.unique(self.core.tail[reopened])
+
+        for row in self.tree_row.values():
+
+            nodes = tails[self.relevant[row, tails]]
+
+            if len(nodes):
+                self.repair_tree(row, nodes.tolist())
+
+
+    def route(self, source, destination, weight):
+
+        """ It routes a baggage of weight 'weight' from the node 'source' to
+        the node 'destination' (node indexes of the Graph_core) through the
+        cheapest path with enough residual capacity and weight, and it
+        commits the baggage to its belts. It returns the list of the belt
+        ids of the path, or None if the destination cannot be reached. """
+
+        store = self.store
+
+        if weight < self.closing_weight:
+            self.lower_closing_weight(weight)
+
+        row = self.tree(source, destination)
+        next_belt = self.next_belt[row]
+
+        # the tree belts can take any baggage up to 'closing_weight', and
+        # they are all the belts that can take a baggage of that weight
+        belts = None
+
+        if np.isfinite(self.dist[row, source]) and weight <= self.closing_weight:
+
+            belts = []
+            node = source
+
+            while node != destination:
+                belt = int(next_belt[node])
+                belts.append(belt)
+                node = self.core.head[belt]
+
+        else:
+
+            # shortest path with the exact residual values of the belts
+            self.counters["exact_searches"] += 1
+
+            usable = (store.capacity_available >= 1) & (store.weight_available >= weight)
+            dist, exact_next = self.shortest_paths(destination, usable, self.relevant[row])
+
+            if not np.isfinite(dist[source]):
+                return None
+
+            belts = []
+            node = source
+
+            while node != destination:
+                belt = int(exact_next[node])
+                belts.append(belt)
+                node = self.core.head[belt]
+
+        for belt in belts:
+
+            store.commit(belt, weight)
+
+            if self.open[belt] and (store.capacity_available[belt] < 1 or
+                                    store.weight_available[belt] < self.closing_weight):
+                self.close_belt(belt)
+
+        return belts
+
+
+def dag_routing_computation(G, edges, stats = None):
+
+    """
+    This function routes all the baggage stored in the source nodes with a
+    Dag_router, so it can be used on networks with any number of
+    intermediate stages. The baggage are routed from the heaviest to the
+    lightest, since the heavy ones gain more from the cheap paths, each one
+    through the cheapest path that can still take it. It receives the graph
+    'G' and the edges_list 'edges', like 'min_cost_computation', and it
+    returns "baggage_best_path" {'baggage_id':["starting node", ('next node',
+    conveyor belt used to reach the next node, single baggage consumption),
+    ...]}, with one tuple for each belt of the path, or None if a baggage
+    cannot reach its destination. If a Solver_stats is given as 'stats', the
+    time of the phases and the router counters are stored in it.
+
+    """
+
+    if stats is not None:
+        time_start = time.perf_counter()
+
+    router = Dag_router(G, edges)
+    core = router.core
+    power = router.store.power
+    baggage_table = get_baggage_table(G)
+
+    # all the baggage still in the source buffers, heaviest first
+    rows = np.concatenate([np.arange(G.nodes[source]['baggage_list'].start,
+                                     G.nodes[source]['baggage_list'].stop)
+                           for source in baggage_table.sources] or [np.empty(0, dtype=np.int64)])
+    rows = rows[np.argsort(-baggage_table.weight[rows], kind='stable')]
+
+    source_nodes = [core.node_index[name] for name in baggage_table.sources]
+    destination_nodes = [core.node_index[name] for name in baggage_table.destinations]
+
+    if stats is not None:
+        stats.add_time("setup", time.perf_counter() - time_start)
+        time_start = time.perf_counter()
+
+    baggage_best_path = {}
+    arrivals = {}
+
+    for row, bag_id, bag_w, start, bag_d in zip(rows.tolist(),
+                                                baggage_table.id[rows].tolist(),
+                                                baggage_table.weight[rows].tolist(),
+                                                baggage_table.start[rows].tolist(),
+                                                baggage_table.destination[rows].tolist()):
+
+        belts = router.route(source_nodes[start], destination_nodes[bag_d], bag_w)
+
+        if belts is None:
+            # INFEASIBLE SOLUTION
+            if stats is not None:
+                record_routing_stats(stats, router, time_start, len(baggage_best_path))
+            return None
+
+        path = [baggage_table.sources[start]]
+        for belt in belts:
+            path.append((core.node_names[core.head[belt]], belt, bag_w*power[belt]))
+
+        baggage_best_path[bag_id] = path
+        arrivals.setdefault(bag_d, []).append(row)
+
+    # the baggage reached their destinations and the source buffers are
+    # empty now
+    for bag_d, bag_rows in arrivals.items():
+        G.nodes[baggage_table.destinations[bag_d]]['baggage_list'].extend(sorted(bag_rows))
+
+    for source in baggage_table.sources:
+        buffer = G.nodes[source]['baggage_list']
+        G.nodes[source]['baggage_list'] = range(buffer.stop, buffer.stop)
+
+    if stats is not None:
+        record_routing_stats(stats, router, time_start, len(baggage_best_path))
+
+    return baggage_best_path
+
+
+def record_routing_stats(stats, router, time_start, baggage_routed):
+
+    """ It stores in the Solver_stats 'stats' the routing time (since
+    'time_start'), the number of baggage routed and the counters of the
+    Dag_router 'router'. It is called also when the routing stops on an
+    infeasible baggage. """
+
+    stats.add_time("routing", time.perf_counter() - time_start)
+    stats.count("baggage_routed", baggage_routed)
+    for name, value in router.counters.items():
+        stats.count(name, value)
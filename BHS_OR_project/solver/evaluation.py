@@ -0,0 +1,101 @@
+import numpy as np
+from instance.graph_gen import get_graph_core
+from instance.baggage_table import get_baggage_table
+from .compact_solution import Compact_solution
+
+def first_hop(baggage_path):
+
+    """ Position of the first belt in the paths of a solution dictionary: 1
+    for the solutions of 'min_cost_computation' (and of the other solvers
+    with the same format), 2 for the ones of 'local_search_with_neighborhood',
+    which have the Baggage after the starting node. """
+
+    for path in baggage_path.values():
+        return 1 if isinstance(path[1], tuple) else 2
+
+    return 1
+
+
+def solution_hops(solution):
+
+    """
+    It returns the hops of all the baggage of a solution (a dictionary in
+    any of the solver formats, with any number of belts per path, or a
+    Compact_solution) as three arrays with one entry per hop: the table row
+    of the baggage, the belt id and the consumption of the baggage on the
+    belt. The dictionaries are read with one pass over their paths; the
+    Compact_solution arrays are used as they are.
+
+    """
+
+    if isinstance(solution, Compact_solution):
+
+        rows = np.tile(solution.rows, 2)
+        belts = np.concatenate((solution.first, solution.second)).astype(np.int64)
+        weight = solution.baggage_table.weight[rows]
+
+        return rows, belts, weight*solution.core.store.power[belts]
+
+    start = first_hop(solution)
+    num_hops = sum(len(path) for path in solution.values()) - start*len(solution)
+
+    # the row of a baggage in the table is its id - 1
+    rows = np.repeat(np.fromiter(solution.keys(), dtype=np.int64, count=len(solution)) - 1,
+                     np.fromiter((len(path) - start for path in solution.values()),
+                                 dtype=np.int64, count=len(solution)))
+    belts = np.fromiter((hop[1] for path in solution.values() for hop in path[start:]),
+                        dtype=np.int64, count=num_hops)
+    consumption = np.fromiter((hop[2] for path in solution.values() for hop in path[start:]),
+                              dtype=np.float64, count=num_hops)
+
+    return rows, belts, consumption
+
+
+def total_consumption(solution):
+
+    """ Objective function of a solution (see 'solution_hops'): the sum of
+    the consumption of all the baggage on all their belts. """
+
+    if isinstance(solution, Compact_solution):
+        return solution.objective()
+
+    return float(solution_hops(solution)[2].sum())
+
+
+def evaluate_solution(G, edges, solution):
+
+    """
+    It evaluates a solution of the instance (G, edges) with NumPy
+    reductions over its hops. It returns a dictionary with:
+    - objective: total consumption of the solution
+    - belt_count, belt_weight: number and total weight of the baggage on
+      each belt, indexed by the belt id (np.bincount over the hops)
+    - capacity_utilization, weight_utilization: the same values divided by
+      the maximum capacity and weight of each belt (0 for the unused ids)
+    - destination_energy: consumption of the baggage of each destination,
+      indexed like the destinations of the Baggage_table
+
+    """
+
+    core = get_graph_core(G, edges)
+    store = core.store
+    baggage_table = get_baggage_table(G)
+
+    rows, belts, consumption = solution_hops(solution)
+
+    belt_count = np.bincount(belts, minlength=store.size)
+    belt_weight = np.bincount(belts, weights=baggage_table.weight[rows], minlength=store.size)
+
+    # utilization of the belts with a positive maximum value
+    capacity_utilization = np.divide(belt_count, store.max_capacity,
+                                     out=np.zeros(store.size), where=store.max_capacity > 0)
+    weight_utilization = np.divide(belt_weight, store.max_weight,
+                                   out=np.zeros(store.size), where=store.max_weight > 0)
+
+    destination_energy = np.bincount(baggage_table.destination[rows], weights=consumption,
+                                     minlength=len(baggage_table.destinations))
+
+    return {"objective": float(consumption.sum()), "belt_count": belt_count,
+            "belt_weight": belt_weight, "capacity_utilization": capacity_utilization,
+            "weight_utilization": weight_utilization,
+            "destination_energy": destination_energy}
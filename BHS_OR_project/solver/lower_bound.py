@@ -0,0 +1,238 @@
+import time
+import numpy as np
+from scipy.optimize import linprog
+from scipy.sparse import csr_matrix
+from instance.graph_gen import get_graph_core
+from instance.baggage_table import get_baggage_table
+
+
+def baggage_classes(G, baggage_table, weight_classes = None):
+
+    """
+    This function aggregates the baggage still stored in the source nodes
+    into classes with the same source, destination and weight class. If
+    'weight_classes' is None each distinct weight is a class, otherwise the
+    weights are split into that number of equal-width bins. It returns the
+    arrays (one value per class): source index, destination index, number
+    of baggage and weight of the class, that is the lightest weight of its
+    baggage, so the aggregated problem is a relaxation of the original one
+    (it is the same when each weight is a class). Then, it returns the
+    table rows of the baggage and the class of each of them.
+
+    """
+
+    rows = np.concatenate([np.arange(G.nodes[source]['baggage_list'].start,
+                                     G.nodes[source]['baggage_list'].stop)
+                           for source in baggage_table.sources] or [np.empty(0, dtype=np.int64)])
+
+    weights = baggage_table.weight[rows]
+    start = baggage_table.start[rows].astype(np.int64)
+    destination = baggage_table.destination[rows].astype(np.int64)
+
+    if len(rows) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty, np.empty(0), rows, empty
+
+    if weight_classes is None:
+        values, weight_bin = np.unique(weights, return_inverse=True)
+        num_bins = len(values)
+    else:
+        edges = np.linspace(weights.min(), weights.max(), weight_classes + 1)
+        weight_bin = np.clip(np.searchsorted(edges, weights, side='right') - 1, 0, weight_classes - 1)
+        num_bins = weight_classes
+
+    num_destinations = len(baggage_table.destinations)
+    key = (start*num_destinations + destination)*num_bins + weight_bin
+
+    keys, inverse, counts = np.unique(key, return_inverse=True, return_counts=True)
+
+    class_weight = np.full(len(keys), np.inf)
+    np.minimum.at(class_weight, inverse, weights)
+
+    commodity = keys // num_bins
+
+    return (commodity // num_destinations, commodity % num_destinations, counts,
+            class_weight, rows, inverse)
+
+
+def assignment_model(G, edges, weight_classes = None):
+
+    """
+    This function builds the model of the assignment of the baggage classes
+    (see 'baggage_classes') to the S -> I -> D paths of their source and
+    destination. The variable x[k, p] is the number of baggage of the class
+    k sent through the path p of its source and destination:
+
+        min  sum_k,p  w_k*(power of p)*x[k, p]
+        s.t. sum_p x[k, p] = n_k                    for each class k
+             sum_k,p: b in p  x[k, p] <= capacity available on b
+             sum_k,p: b in p  w_k*x[k, p] <= weight available on b
+             x[k, p] >= 0
+
+    The constraint matrices are assembled at once with NumPy as sparse
+    matrices, from the arrays of the Graph_core, so their size is the number
+    of (class, path) pairs and not the number of baggage. It returns a
+    dictionary with:
+    - cost, A_eq, b_eq, A_ub, b_ub: the arrays of the model, or None if
+      there are no baggage or a class has no path ('no_path' is True)
+    - variable_class, variable_first, variable_second: class, S -> I belt
+      and I -> D belt of each variable
+    - rows, row_class: table rows of the baggage and class of each of them
+    - num_variables, num_constraints: size of the model
+
+    """
+
+    core = get_graph_core(G, edges)
+    store = core.store
+    baggage_table = get_baggage_table(G)
+
+    # Step 1: baggage classes
+
+    class_source, class_destination, class_count, class_weight, rows, row_class = \
+        baggage_classes(G, baggage_table, weight_classes)
+    num_classes = len(class_count)
+
+    model = {"cost": None, "no_path": False, "rows": rows, "row_class": row_class,
+             "num_variables": 0, "num_constraints": 0}
+
+    if num_classes == 0:
+        return model
+
+    # Step 2: paths of each commodity (source, destination). The belts
+    # leaving the sources are gathered from the CSR adjacency, and for each
+    # one the belt linking its intermediate node to the destination is
+    # found with a vectorized search.
+
+    num_destinations = len(baggage_table.destinations)
+    source_nodes = np.array([core.node_index[name] for name in baggage_table.sources])
+    destination_nodes = np.array([core.node_index[name] for name in baggage_table.destinations])
+
+    commodities, class_commodity = np.unique(class_source*num_destinations + class_destination,
+                                             return_inverse=True)
+    commodity_source = source_nodes[commodities // num_destinations]
+    commodity_destination = destination_nodes[commodities % num_destinations]
+
+    out_degree = core.indptr[commodity_source + 1] - core.indptr[commodity_source]
+    path_commodity = np.repeat(np.arange(len(commodities)), out_degree)
+    first = core.out_belts_of(commodity_source)
+    second = core.find_belts(core.head[first], commodity_destination[path_commodity])
+
+    valid = second > 0
+    path_commodity, first, second = path_commodity[valid], first[valid], second[valid]
+
+    # the paths are grouped by commodity: 'path_start[c]' is the first path
+    # of the commodity c and 'path_count[c]' the number of its paths
+    path_count = np.bincount(path_commodity, minlength=len(commodities))
+    path_start = np.cumsum(path_count) - path_count
+
+    if (path_count == 0).any():
+        model["no_path"] = True
+        return model
+
+    # Step 3: variables, one for each (class, path of its commodity)
+
+    variable_count = path_count[class_commodity]
+    variable_class = np.repeat(np.arange(num_classes), variable_count)
+    variable_path = (np.repeat(path_start[class_commodity] - np.cumsum(variable_count) + variable_count, variable_count)
+                     + np.arange(variable_count.sum()))
+
+    num_variables = len(variable_class)
+    weight = class_weight[variable_class]
+    variable_first = first[variable_path]
+    variable_second = second[variable_path]
+
+    cost = weight*(store.power[variable_first] + store.power[variable_second])
+
+    # Step 4: constraints. Each class has an equality row; each used belt
+    # has a capacity row and a weight row, numbered by the used belts.
+
+    A_eq = csr_matrix((np.ones(num_variables), (variable_class, np.arange(num_variables))),
+                      shape=(num_classes, num_variables))
+    b_eq = class_count.astype(np.float64)
+
+    used_belts, belt_row = np.unique(np.concatenate((variable_first, variable_second)),
+                                     return_inverse=True)
+    num_belts = len(used_belts)
+    columns = np.tile(np.arange(num_variables), 2)
+
+    constraint_rows = np.concatenate((belt_row, belt_row + num_belts))
+    data = np.concatenate((np.ones(2*num_variables), np.tile(weight, 2)))
+    A_ub = csr_matrix((data, (constraint_rows, np.tile(columns, 2))), shape=(2*num_belts, num_variables))
+    b_ub = np.concatenate((store.capacity_available[used_belts].astype(np.float64),
+                           store.weight_available[used_belts]))
+
+    model.update(cost=cost, A_eq=A_eq, b_eq=b_eq, A_ub=A_ub, b_ub=b_ub,
+                 variable_class=variable_class, variable_first=variable_first,
+                 variable_second=variable_second, num_variables=num_variables,
+                 num_constraints=num_classes + 2*num_belts)
+
+    return model
+
+
+def lp_lower_bound(G, edges, weight_classes = None, stats = None):
+
+    """
+    This function computes a lower bound of the optimal consumption of the
+    instance by solving the LP relaxation of the baggage assignment (see
+    'assignment_model') with the HiGHS solver of SciPy, i.e. the number of
+    baggage of each class on each path is relaxed to a real value. The
+    instance is not modified, so the bound can be computed before running
+    the heuristics. It returns a dictionary with:
+    - bound: the lower bound, inf if the relaxation is infeasible (then the
+      instance is infeasible too), None if the solver failed
+    - status, message: the status of the HiGHS solution
+    - num_variables, num_constraints: size of the LP
+    If a Solver_stats is given as 'stats', the assembly and solution times
+    are stored in it.
+
+    """
+
+    time_start = time.perf_counter()
+
+    model = assignment_model(G, edges, weight_classes)
+
+    if model["no_path"]:
+        return {"bound": np.inf, "status": 2, "message": "a commodity has no path",
+                "num_variables": 0, "num_constraints": 0}
+
+    if model["cost"] is None:
+        return {"bound": 0.0, "status": 0, "message": "no baggage",
+                "num_variables": 0, "num_constraints": 0}
+
+    assembly_time = time.perf_counter()
+
+    # LP solution
+
+    solution = linprog(model["cost"], A_ub=model["A_ub"], b_ub=model["b_ub"],
+                       A_eq=model["A_eq"], b_eq=model["b_eq"],
+                       bounds=(0, None), method="highs")
+
+    if solution.status == 0:
+        bound = float(solution.fun)
+    elif solution.status == 2:
+        bound = np.inf
+    else:
+        bound = None
+
+    if stats is not None:
+        stats.add_time("assembly", assembly_time - time_start)
+        stats.add_time("solution", time.perf_counter() - assembly_time)
+        stats.count("variables", model["num_variables"])
+        stats.count("constraints", model["num_constraints"])
+
+    return {"bound": bound, "status": solution.status,
+            "message": solution.message, "num_variables": model["num_variables"],
+            "num_constraints": model["num_constraints"]}
+
+
+def optimality_gap(of, bound):
+
+    """ Percentage gap of the objective function 'of' of a solution with
+    respect to the lower bound 'bound', or None if one of them is not
+    available. Since the bound is not larger than the optimum, the gap is
+    an upper limit of the distance of the solution from the optimum. """
+
+    if of is None or bound is None or not np.isfinite(bound) or bound <= 0:
+        return None
+
+    return (of - bound)/bound*100
@@ -0,0 +1,220 @@
+import heapq
+import numpy as np
+from instance.instance_gen import *
+from instance.graph_gen import get_belt_index, get_belt_store
+from instance.baggage_table import get_baggage_table
+
+class Online_router:
+
+    """
+    Online routing of baggage arriving over time. Instead of reading all the
+    baggage from the source buffers, the router receives the arrivals one by
+    one and it assigns each baggage a path S -> I -> D as soon as it arrives.
+
+    The cost of a baggage on a belt is the one of 'Conveyor_belt' (weight
+    times power coefficient), so the cost of a path per kg of baggage is
+    static: the sum of the power coefficients of its two belts. For each
+    (source, destination) pair the router keeps a heap of its paths keyed by
+    this cost, so the cheapest feasible path is found in logarithmic time.
+    A path found full when popped (no capacity left on one of its belts) is
+    parked on that belt and pushed again only when the belt releases
+    capacity. A path without enough weight available for a heavy baggage is
+    just skipped for that baggage.
+
+    Here the capacity and the weight of a belt limit the baggage that are on
+    the belt at the same time: a baggage stays on each belt for
+    'transit_time' and then the belt capacity is released. Only the baggage
+    in flight are stored, so the memory does not grow with the stream.
+
+    """
+
+    def __init__(self, G, edges_list, transit_time = 1.0):
+
+        # the belts of the instance hold the router state
+        self.belt_index = get_belt_index(G, edges_list)
+        self.belt_store = get_belt_store(G, edges_list)
+        self.transit_time = transit_time
+
+        # {(source, destination): [(belt S->I, belt I->D)]}
+        self.paths = {}
+        # {(source, destination): heap of (cost per kg, path index)}
+        self.heaps = {}
+        # {(source, destination): array, True if the path is in the heap}
+        self.in_heap = {}
+        # {belt id: [(source, destination, path index)]} paths parked on a
+        # full belt
+        self.parked = {}
+
+        # heap of the departures (time, sequence number, belt id, weight) of
+        # the baggage in flight
+        self.departures = []
+        self.sequence = 0
+
+        # statistics of the stream
+        self.time = 0.0
+        self.routed = 0
+        self.rejected = 0
+        self.total_consumption = 0.0
+
+
+    def pair_heap(self, source, destination):
+
+        """ It returns the heap of the pair (source, destination), building
+        it the first time the pair is found. """
+
+        key = (source, destination)
+        heap = self.heaps.get(key)
+
+        if heap is None:
+
+            belts_by_nodes = self.belt_index["by_nodes"]
+            paths = []
+
+            for belt_in in self.belt_index["by_input"].get(source, []):
+                belt_out = belts_by_nodes.get((belt_in.output_node, destination))
+                if belt_out is not None:
+                    paths.append((belt_in, belt_out))
+
+            heap = [(belt_in.power + belt_out.power, p)
+                    for p, (belt_in, belt_out) in enumerate(paths)]
+            heapq.heapify(heap)
+
+            self.paths[key] = paths
+            self.heaps[key] = heap
+            self.in_heap[key] = np.ones(len(paths), dtype=bool)
+
+        return heap
+
+
+    def advance(self, time):
+
+        """ It moves the clock to 'time', releasing the belts left by the
+        baggage until then and pushing again the paths parked on them. """
+
+        departures = self.departures
+
+        while departures and departures[0][0] <= time:
+
+            leave_time, sequence, belt_id, weight = heapq.heappop(departures)
+            self.belt_index["by_id"][belt_id].consumption_release(weight)
+
+            for source, destination, p in self.parked.pop(belt_id, ()):
+
+                key = (source, destination)
+                if not self.in_heap[key][p]:
+                    belt_in, belt_out = self.paths[key][p]
+                    heapq.heappush(self.heaps[key], (belt_in.power + belt_out.power, p))
+                    self.in_heap[key][p] = True
+
+        self.time = max(self.time, time)
+
+
+    def route(self, time, bag):
+
+        """
+        It routes the Baggage 'bag' arriving at 'time' (not earlier than the
+        previous arrival). It returns its path with the same structure used
+        by 'min_cost_computation', ["starting node", ('next node', conveyor
+        belt id, single baggage consumption), ...], or None if no path can
+        take the baggage now (the baggage is rejected).
+
+        """
+
+        self.advance(time)
+
+        source, destination, weight = bag.start, bag.destination, bag.weight
+        heap = self.pair_heap(source, destination)
+        key = (source, destination)
+
+        capacity_available = self.belt_store.capacity_available
+        weight_available = self.belt_store.weight_available
+
+        # paths with capacity but not enough weight for this baggage
+        skipped = []
+        selected = None
+
+        while heap:
+
+            cost, p = heap[0]
+            belt_in, belt_out = self.paths[key][p]
+
+            full_belt = None
+            if capacity_available[belt_in.id] < 1:
+                full_belt = belt_in.id
+            elif capacity_available[belt_out.id] < 1:
+                full_belt = belt_out.id
+
+            if full_belt is not None:
+                # parked until the belt releases some capacity
+                heapq.heappop(heap)
+                self.in_heap[key][p] = False
+                self.parked.setdefault(full_belt, []).append((source, destination, p))
+
+            elif (weight_available[belt_in.id] < weight or
+                  weight_available[belt_out.id] < weight):
+                skipped.append(heapq.heappop(heap))
+
+            else:
+                selected = (belt_in, belt_out)
+                break
+
+        for entry in skipped:
+            heapq.heappush(heap, entry)
+
+        if selected is None:
+            self.rejected += 1
+            return None
+
+        # the baggage takes both belts: it leaves the first one after
+        # 'transit_time' and the second one after twice that time
+        path = [source]
+
+        for hop, belt in enumerate(selected):
+
+            total_consumption, baggage_consumption = belt.consumption_commit(weight)
+            path.append((belt.output_node, belt.id, baggage_consumption))
+            self.total_consumption += baggage_consumption
+
+            heapq.heappush(self.departures, (time + (hop + 1)*self.transit_time,
+                                             self.sequence, belt.id, weight))
+            self.sequence += 1
+
+        self.routed += 1
+
+        return path
+
+
+    def route_stream(self, arrivals):
+
+        """ Generator routing an iterable of (time, Baggage) arrivals sorted
+        by time, e.g. the one of 'baggage_arrivals'. It yields (baggage id,
+        path) for each arrival, where the path is None if the baggage was
+        rejected. """
+
+        for time, bag in arrivals:
+            yield bag.id, self.route(time, bag)
+
+
+    @property
+    def in_flight(self):
+
+        """ Number of belt occupations not released yet. """
+
+        return len(self.departures)
+
+
+def baggage_arrivals(G, arrival_rate = 1.0, seed = None):
+
+    """ Generator of the arrivals of the baggage of an instance: the
+    baggage of the Baggage_table arrive in random order, with exponential
+    inter-arrival times of mean 1/'arrival_rate'. It yields (time, Baggage)
+    pairs, so it can feed 'Online_router.route_stream'. """
+
+    baggage_table = get_baggage_table(G)
+    rng = np.random.default_rng(seed)
+
+    time = 0.0
+
+    for row in rng.permutation(len(baggage_table)).tolist():
+        time += rng.exponential(1/arrival_rate)
+        yield time, baggage_table.baggage(row)
@@ -0,0 +1,72 @@
+import json
+
+class Solver_stats:
+
+    """ Optional instrumentation of the solvers. An instance is passed to a
+    solver through its 'stats' argument and it collects the time spent in
+    each phase [s] and the hot-path counters (belts scanned, rejected
+    candidates, moves accepted, ...). When no instance is passed the solvers
+    skip all the measures, so the instrumentation costs nothing. The hot
+    loops accumulate their values in local variables and they store them
+    here only once, at the end of each phase. """
+
+    def __init__(self):
+
+        # {phase name: seconds}
+        self.timings = {}
+        # {counter name: value}
+        self.counters = {}
+
+
+    def add_time(self, phase, seconds):
+
+        """ It adds 'seconds' to the time of the given phase. """
+
+        self.timings[phase] = self.timings.get(phase, 0.0) + seconds
+
+
+    def count(self, name, value = 1):
+
+        """ It adds 'value' to the given counter. """
+
+        self.counters[name] = self.counters.get(name, 0) + int(value)
+
+
+    def merge(self, other):
+
+        """ It adds the timings and the counters of another Solver_stats, e.g.
+        the ones of the runs of a sweep. """
+
+        for phase, seconds in other.timings.items():
+            self.add_time(phase, seconds)
+        for name, value in other.counters.items():
+            self.count(name, value)
+
+
+    def to_dict(self):
+
+        return {"timings": dict(self.timings), "counters": dict(self.counters)}
+
+
+    def to_json(self, path = None):
+
+        """ It returns the statistics as a JSON string and, if 'path' is
+        given, it also writes them to that file. """
+
+        data = json.dumps(self.to_dict(), indent=2)
+
+        if path is not None:
+            with open(path, "w") as file:
+                file.write(data)
+
+        return data
+
+
+    def __repr__(self):
+
+        timings = ", ".join(f"{phase}={seconds:.4f}s"
+                            for phase, seconds in self.timings.items())
+        counters = ", ".join(f"{name}={value}"
+                             for name, value in self.counters.items())
+
+        return f"Solver_stats(timings: {timings}; counters: {counters})"
@@ -0,0 +1,278 @@
+import time
+import numpy as np
+from instance.graph_gen import get_graph_core
+from instance.baggage_table import get_baggage_table
+
+# number of time steps of each block of the belt timelines
+BLOCK_STEPS = 256
+
+
+class Belt_timeline:
+
+    """
+    Time-expanded state of the belts. In the time-expanded model the
+    capacity of a belt is a throughput: at each time step a belt can take
+    at most 'throughput[id]' baggage, with a total weight of at most
+    'weight_limit[id]'. The network expanded over 'num_steps' steps would
+    have one copy of each belt per step, so it is never built: the number
+    and the weight of the baggage entering each belt at each step are
+    stored in blocks of BLOCK_STEPS steps, allocated only when a baggage
+    uses the belt in that block. A 24 hours horizon at 1 minute resolution
+    (1440 steps) takes memory only for the (belt, block) pairs actually
+    used.
+
+    """
+
+    def __init__(self, num_steps, throughput, weight_limit):
+
+        self.num_steps = num_steps
+        self.throughput = throughput
+        self.weight_limit = weight_limit
+
+        # {(belt id, block): (count array, weight array)}
+        self.blocks = {}
+
+
+    def window(self, belt, start, stop):
+
+        """ It returns the number and the weight of the baggage entering the
+        belt at the steps start, ..., stop - 1, as two arrays. Blocks not
+        allocated yet are empty. """
+
+        count = np.zeros(stop - start, dtype=np.int32)
+        weight = np.zeros(stop - start, dtype=np.float32)
+
+        for block in range(start // BLOCK_STEPS, (stop - 1) // BLOCK_STEPS + 1):
+
+            data = self.blocks.get((belt, block))
+            if data is None:
+                continue
+
+            # overlap of the window with the block
+            first = max(start, block*BLOCK_STEPS)
+            last = min(stop, (block + 1)*BLOCK_STEPS)
+
+            count[first - start:last - start] = data[0][first - block*BLOCK_STEPS:last - block*BLOCK_STEPS]
+            weight[first - start:last - start] = data[1][first - block*BLOCK_STEPS:last - block*BLOCK_STEPS]
+
+        return count, weight
+
+
+    def free_steps(self, belt, start, stop, baggage_weight):
+
+        """ Boolean mask of the steps start, ..., stop - 1 at which the belt
+        can still take a baggage of the given weight. """
+
+        count, weight = self.window(belt, start, stop)
+
+        return ((count < self.throughput[belt]) &
+                (weight + baggage_weight <= self.weight_limit[belt]))
+
+
+    def add(self, belt, step, baggage_weight):
+
+        """ It records a baggage entering the belt at the given step. """
+
+        block, offset = divmod(step, BLOCK_STEPS)
+        data = self.blocks.get((belt, block))
+
+        if data is None:
+            data = (np.zeros(BLOCK_STEPS, dtype=np.int32),
+                    np.zeros(BLOCK_STEPS, dtype=np.float32))
+            self.blocks[(belt, block)] = data
+
+        data[0][offset] += 1
+        data[1][offset] += baggage_weight
+
+
+    @property
+    def memory(self):
+
+        """ Bytes allocated by the blocks. """
+
+        return len(self.blocks)*BLOCK_STEPS*(4 + 4)
+
+
+def draw_time_windows(G, num_steps, min_slack = 10, max_slack = 60, seed = None):
+
+    """ It draws the time window of each baggage of the Baggage_table of 'G':
+    the release step, when the baggage is available at its source, is
+    uniform over the horizon of 'num_steps' steps, and the deadline, the
+    last step at which it can reach its destination, follows it by a slack
+    between 'min_slack' and 'max_slack' steps (bounded by the horizon). It
+    returns the two arrays, indexed by the table rows. """
+
+    if min_slack > max_slack or min_slack >= num_steps:
+        raise ValueError("invalid slack bounds for the horizon")
+
+    rng = np.random.default_rng(seed)
+    num_baggage = len(get_baggage_table(G))
+
+    release = rng.integers(0, num_steps - min_slack, size=num_baggage)
+    slack = rng.integers(min_slack, max_slack, size=num_baggage, endpoint=True)
+    deadline = np.minimum(release + slack, num_steps - 1)
+
+    return release, deadline
+
+
+def throughput_scheduling(G, edges, num_steps, release, deadline,
+                          throughput = None, transit_steps = 1, stats = None):
+
+    """
+    This function routes and schedules the baggage stored in the source
+    nodes with the time-expanded belt model (see 'Belt_timeline'). Each
+    baggage has a release step 'release[row]' and a deadline
+    'deadline[row]' (arrays indexed by the Baggage_table rows, e.g. drawn by
+    'draw_time_windows'). It enters the first belt of its path at its
+    departure step, and each belt takes 'transit_steps' steps, so it enters
+    the k-th belt 'k*transit_steps' steps after its departure and it must
+    reach its destination by its deadline.
+
+    'throughput' is the array of the baggage each belt can take per step,
+    indexed by the belt id. By default it is the belt capacity spread over
+    the horizon, ceil(max_capacity/num_steps), i.e. the total capacity is
+    the same of the other solvers. The weight per step is limited in the
+    same proportion of the belt maximum weight, but never below the weight
+    of the heaviest baggage, so that a belt can always take one baggage.
+
+    The baggage are scheduled by earliest deadline (the heaviest first for
+    the same deadline). Each one takes the cheapest S -> I -> D path (the
+    consumption does not depend on time) that has a feasible departure in
+    its window, with the earliest such departure. It returns
+    "baggage_best_path", with the same format of 'min_cost_computation',
+    and "departures" {'baggage_id': [step at which the baggage enters each
+    belt of its path]}, or (None, None) if a baggage cannot meet its
+    deadline. If a Solver_stats is given as 'stats', the time of the phases
+    and the scheduling counters are stored in it.
+
+    """
+
+    if stats is not None:
+        time_start = time.perf_counter()
+
+    core = get_graph_core(G, edges)
+    store = core.store
+    baggage_table = get_baggage_table(G)
+
+    if throughput is None:
+        throughput = np.maximum(1, np.ceil(store.max_capacity / num_steps)).astype(np.int64)
+
+    # maximum weight per step, in proportion to the throughput
+    heaviest = float(baggage_table.weight.max()) if len(baggage_table) else 0.0
+    weight_limit = np.maximum(store.max_weight*throughput/np.maximum(store.max_capacity, 1),
+                              heaviest)
+
+    timeline = Belt_timeline(num_steps, throughput, weight_limit)
+    travel_steps = 2*transit_steps
+
+    # all the baggage still in the source buffers, by earliest deadline
+    rows = np.concatenate([np.arange(G.nodes[source]['baggage_list'].start,
+                                     G.nodes[source]['baggage_list'].stop)
+                           for source in baggage_table.sources] or [np.empty(0, dtype=np.int64)])
+    rows = rows[np.lexsort((-baggage_table.weight[rows], deadline[rows]))]
+
+    source_nodes = [core.node_index[name] for name in baggage_table.sources]
+    destination_nodes = [core.node_index[name] for name in baggage_table.destinations]
+
+    # {(source index, destination index): (S->I belt ids, I->D belt ids)}
+    # of the paths of each commodity, sorted by cost per kg
+    commodity_paths = {}
+
+    if stats is not None:
+        stats.add_time("setup", time.perf_counter() - time_start)
+        time_start = time.perf_counter()
+        paths_scanned = 0
+
+    baggage_best_path = {}
+    departures = {}
+    arrivals = {}
+
+    for row, bag_id, bag_w, start, bag_d in zip(rows.tolist(),
+                                                baggage_table.id[rows].tolist(),
+                                                baggage_table.weight[rows].tolist(),
+                                                baggage_table.start[rows].tolist(),
+                                                baggage_table.destination[rows].tolist()):
+
+        paths = commodity_paths.get((start, bag_d))
+
+        if paths is None:
+
+            first_ids = core.out_belts(source_nodes[start])
+            second_ids = core.find_belts(core.head[first_ids],
+                                         np.full(len(first_ids), destination_nodes[bag_d]))
+            valid = second_ids > 0
+            first_ids, second_ids = first_ids[valid], second_ids[valid]
+
+            order = np.argsort(store.power[first_ids] + store.power[second_ids], kind='stable')
+            paths = (first_ids[order].tolist(), second_ids[order].tolist())
+            commodity_paths[(start, bag_d)] = paths
+
+        # departure window of the baggage
+        first_step = int(release[row])
+        last_step = int(deadline[row]) - travel_steps
+
+        selected = None
+
+        if last_step >= first_step:
+
+            for first_belt, second_belt in zip(*paths):
+
+                if stats is not None:
+                    paths_scanned += 1
+
+                free = (timeline.free_steps(first_belt, first_step, last_step + 1, bag_w) &
+                        timeline.free_steps(second_belt, first_step + transit_steps,
+                                            last_step + transit_steps + 1, bag_w))
+
+                if free.any():
+                    selected = (first_belt, second_belt, first_step + int(np.argmax(free)))
+                    break
+
+        if selected is None:
+            # INFEASIBLE SCHEDULE
+            if stats is not None:
+                record_scheduling_stats(stats, timeline, time_start,
+                                        len(baggage_best_path), paths_scanned)
+            return None, None
+
+        first_belt, second_belt, departure = selected
+
+        timeline.add(first_belt, departure, bag_w)
+        timeline.add(second_belt, departure + transit_steps, bag_w)
+
+        baggage_best_path[bag_id] = [
+            baggage_table.sources[start],
+            (core.node_names[core.head[first_belt]], first_belt, bag_w*store.power[first_belt]),
+            (core.node_names[core.head[second_belt]], second_belt, bag_w*store.power[second_belt])]
+        departures[bag_id] = [departure, departure + transit_steps]
+        arrivals.setdefault(bag_d, []).append(row)
+
+    # the baggage reached their destinations and the source buffers are
+    # empty now
+    for bag_d, bag_rows in arrivals.items():
+        G.nodes[baggage_table.destinations[bag_d]]['baggage_list'].extend(sorted(bag_rows))
+
+    for source in baggage_table.sources:
+        buffer = G.nodes[source]['baggage_list']
+        G.nodes[source]['baggage_list'] = range(buffer.stop, buffer.stop)
+
+    if stats is not None:
+        record_scheduling_stats(stats, timeline, time_start,
+                                len(baggage_best_path), paths_scanned)
+
+    return baggage_best_path, departures
+
+
+def record_scheduling_stats(stats, timeline, time_start, baggage_scheduled,
+                            paths_scanned):
+
+    """ It stores in the Solver_stats 'stats' the scheduling time (since
+    'time_start'), the number of baggage scheduled, the number of paths
+    scanned and the blocks of the Belt_timeline 'timeline'. It is called
+    also when the scheduling stops on a baggage that cannot meet its
+    deadline. """
+
+    stats.add_time("scheduling", time.perf_counter() - time_start)
+    stats.count("baggage_scheduled", baggage_scheduled)
+    stats.count("paths_scanned", paths_scanned)
+    stats.count("timeline_blocks", len(timeline.blocks))
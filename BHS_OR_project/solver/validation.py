@@ -0,0 +1,139 @@
+import numpy as np
+from instance.graph_gen import get_graph_core
+from instance.baggage_table import get_baggage_table
+from .compact_solution import Compact_solution
+from .evaluation import solution_hops
+
+def validate_solution(G, edges, solution, tolerance = 1e-6):
+
+    """
+    This function checks a solution of the instance (G, edges), in any of
+    the solver formats (see 'solution_hops'), against the maximum values of
+    the belts and the supply and demand of the nodes. It does not use the
+    available capacity and weight of the Belt_store, which are changed by
+    the solvers, so it can be run on the instance after the solution. All
+    the hops are checked at once with NumPy: the load of the belts is
+    aggregated with np.bincount, and the paths are checked by sorting the
+    hops by baggage. It returns a dictionary with:
+    - feasible: True if no violation was found
+    - capacity_violations: ids of the belts with more baggage than their
+      maximum capacity
+    - weight_violations: ids of the belts with more weight than their
+      maximum weight (beyond 'tolerance')
+    - broken_paths: ids of the baggage whose path does not start from their
+      source, uses a belt that does not exist or has two consecutive belts
+      that are not linked
+    - wrong_destination: ids of the baggage whose path does not end at
+      their destination
+    - unknown_bags: ids of the solution that are not baggage of the
+      instance (their paths are not checked)
+    - missing_bags: ids of the baggage of the instance without a path
+    - duplicated_bags: ids of the baggage with more than one path
+    - supply_mismatch: {node name: (baggage leaving or reaching the node,
+      supply or demand of the node)} of the sources and destinations whose
+      flow is not the one required by the instance
+
+    """
+
+    core = get_graph_core(G, edges)
+    store = core.store
+    baggage_table = get_baggage_table(G)
+
+    # the consumption of the hops is not needed, and it cannot be computed
+    # for the baggage ids that are not in the table
+    if isinstance(solution, Compact_solution):
+        rows = np.tile(solution.rows, 2)
+        belts = np.concatenate((solution.first, solution.second)).astype(np.int64)
+    else:
+        rows, belts, _ = solution_hops(solution)
+
+    # Step 1: baggage ids. The hops of the ids that are not in the table
+    # are reported and left out of the other checks.
+
+    known = (rows >= 0) & (rows < len(baggage_table))
+    unknown_bags = np.unique(rows[~known]) + 1
+    rows, belts = rows[known], belts[known]
+
+    # Step 2: belt ids. A hop on a belt that does not exist is moved to the
+    # unused belt 0, whose end nodes are -1, so that its path is broken.
+
+    unknown = (belts <= 0) | (belts >= store.size)
+    belts = np.where(unknown, 0, belts)
+    unknown |= core.tail[belts] < 0
+
+    # Step 3: belt loads
+
+    belt_count = np.bincount(belts, minlength=store.size)
+    belt_weight = np.bincount(belts, weights=baggage_table.weight[rows], minlength=store.size)
+    belt_count[0] = 0
+    belt_weight[0] = 0
+
+    capacity_violations = np.flatnonzero(belt_count > store.max_capacity)
+    weight_violations = np.flatnonzero(belt_weight > store.max_weight + tolerance)
+
+    # Step 4: paths. The hops are sorted by baggage, keeping their order in
+    # the path, and the first and last hop of each baggage are marked.
+
+    order = np.argsort(rows, kind='stable')
+    rows, belts, unknown = rows[order], belts[order], unknown[order]
+
+    new_bag = np.ones(len(rows), dtype=bool)
+    new_bag[1:] = rows[1:] != rows[:-1]
+    last_hop = np.ones(len(rows), dtype=bool)
+    last_hop[:-1] = new_bag[1:]
+
+    source_nodes = np.array([core.node_index[name] for name in baggage_table.sources], dtype=np.int64)
+    destination_nodes = np.array([core.node_index[name] for name in baggage_table.destinations], dtype=np.int64)
+
+    tail = core.tail[belts]
+    head = core.head[belts]
+
+    broken = unknown.copy()
+    broken[new_bag] |= tail[new_bag] != source_nodes[baggage_table.start[rows[new_bag]]]
+    broken[:-1] |= ~last_hop[:-1] & (head[:-1] != tail[1:])
+
+    wrong = last_hop & (head != destination_nodes[baggage_table.destination[rows]])
+
+    # Step 5: baggage of the instance without a path or with more than one
+    # path (possible only in a Compact_solution)
+
+    routed = np.zeros(len(baggage_table), dtype=bool)
+    routed[rows] = True
+
+    if isinstance(solution, Compact_solution):
+        bag_ids, counts = np.unique(solution.bag_id, return_counts=True)
+        duplicated_bags = bag_ids[counts > 1].astype(np.int64)
+    else:
+        duplicated_bags = np.empty(0, dtype=np.int64)
+
+    # Step 6: supply and demand. The baggage leaving each source and reaching
+    # each destination are counted from the first and the last belt of the
+    # paths.
+
+    leaving = np.bincount(tail[new_bag & (tail >= 0)], minlength=core.num_nodes)
+    reaching = np.bincount(head[last_hop & (head >= 0)], minlength=core.num_nodes)
+
+    supply_mismatch = {}
+
+    for n in core.sources.tolist():
+        if leaving[n] != -core.demand[n]:
+            supply_mismatch[core.node_names[n]] = (int(leaving[n]), int(-core.demand[n]))
+
+    for n in core.destinations.tolist():
+        if reaching[n] != core.demand[n]:
+            supply_mismatch[core.node_names[n]] = (int(reaching[n]), int(core.demand[n]))
+
+    report = {
+        "capacity_violations": capacity_violations,
+        "weight_violations": weight_violations,
+        "broken_paths": np.unique(baggage_table.id[rows[broken]]),
+        "wrong_destination": baggage_table.id[rows[wrong]],
+        "unknown_bags": unknown_bags,
+        "missing_bags": baggage_table.id[~routed],
+        "duplicated_bags": duplicated_bags,
+        "supply_mismatch": supply_mismatch,
+    }
+
+    report["feasible"] = not any(len(value) for value in report.values())
+
+    return report
@@ -0,0 +1,340 @@
+import itertools
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from instance import *
+from solver import *
+
+# Methods available in a sweep, with the same names used in the results table
+METHODS = ("Method 1", "Method 2", "Method 3")
+
+# Warm starts of the LNS (Method 2) in a sweep: none, the MCF solution of the
+# same instance, or the best solution of the previous point of the sweep
+# whose instance differs only in min_c
+WARM_STARTS = (None, "mcf", "previous")
+
+
+def build_grid(seeds, sizes, min_c_values, max_c_values, min_b_values,
+               max_b_values, methods=METHODS):
+
+    """ It builds the list of the sweep points as the cartesian product of
+    the given values. 'sizes' is a list of (num_sources, num_intermediates,
+    num_destinations) tuples and 'methods' a list of names in METHODS. Each
+    point is a dictionary with the keys 'seed', 'sizes', 'min_c', 'max_c',
+    'min_b', 'max_b' and 'method'. Points whose min_c is not lower than
+    max_c are skipped, since the belt capacities could not be drawn. """
+
+    grid = []
+
+    for seed, size, min_c, max_c, min_b, max_b, method in itertools.product(
+            seeds, sizes, min_c_values, max_c_values, min_b_values,
+            max_b_values, methods):
+
+        if method not in METHODS:
+            raise ValueError(f"Unknown method '{method}'.")
+
+        if min_c >= max_c:
+            continue
+
+        grid.append({"seed": seed, "sizes": tuple(size), "min_c": min_c,
+                     "max_c": max_c, "min_b": min_b, "max_b": max_b,
+                     "method": method})
+
+    return grid
+
+
+def instance_key(point):
+
+    """ Sweep points with the same key share the same instance, since they
+    differ only in the method. """
+
+    return (point["seed"], point["sizes"], point["min_c"], point["max_c"],
+            point["min_b"], point["max_b"])
+
+
+def chain_key(point):
+
+    """ Sweep points with the same key have the same nodes, baggage and
+    belts, and they differ only in min_c, i.e. in the belt capacities. A
+    solution of one of them is a good warm start for the others. """
+
+    return (point["seed"], point["sizes"], point["max_c"], point["min_b"],
+            point["max_b"], point["method"])
+
+
+def build_instance(point, cache_dir = None):
+
+    """ It builds the graph and the edges of a sweep point, like main.py
+    does. It returns the instance to send to the workers and the build time.
+    The instance is the pickled (G, edges_list) or, if 'cache_dir' is given,
+    the directory of the instance in that cache (see 'instance_directory'):
+    in this case the instance is generated only if it was not cached by an
+    earlier run, and the workers memory map it instead of unpickling a
+    copy. """
+
+    num_sources, num_intermediates, num_destinations = point["sizes"]
+
+    built_time_start = time.time()
+
+    if cache_dir is not None:
+        directory = instance_directory(cache_dir, num_sources=num_sources, num_destinations=num_destinations, num_intermediates=num_intermediates, seed=point["seed"], min_baggage=point["min_b"], max_baggage=point["max_b"], min_c=point["min_c"], max_c=point["max_c"])
+        return directory, time.time() - built_time_start
+
+    G, sources, intermediates, destinations = create_tripartite_graph_nodes(num_sources=num_sources, num_destinations=num_destinations, num_intermediates=num_intermediates, seed=point["seed"], min_baggage=point["min_b"], max_baggage=point["max_b"])
+    graph, edges_list = generate_edges(G, sources, intermediates, destinations, seed=point["seed"], min_c=point["min_c"], max_c=point["max_c"])
+    built_time_stop = time.time()
+
+    return pickle.dumps((G, edges_list)), built_time_stop - built_time_start
+
+
+def load_point_instance(instance):
+
+    """ It returns a new copy (G, edges_list) of an instance built by
+    'build_instance'. """
+
+    if isinstance(instance, str):
+        G, sources, intermediates, destinations, edges_list = load_instance(instance)
+        return G, edges_list
+
+    return pickle.loads(instance)
+
+
+def run_method(method, G, edges_list, seed, max_iterations, stats = None,
+               initial_solution = None):
+
+    """ It runs one method on the instance (G, edges_list) and it returns
+    (baggage_path, of), where 'of' is None if the solution is infeasible.
+    'initial_solution' is the warm start of the LNS (Method 2). """
+
+    if method == "Method 1":
+        baggage_path = min_cost_computation(G, edges_list, stats=stats)
+    elif method == "Method 2":
+        baggage_path, of = local_search_with_neighborhood(G, edges_list, max_iterations=max_iterations, seed=seed, stats=stats, initial_solution=initial_solution)
+    else:
+        baggage_path = exact_computation(G, edges_list)
+
+    # given baggage_path, the of value is computed summing all the baggage
+    # consumption associated to their paths, i.e. to all the belts after 
+    # the starting node (the LNS returns it already)
+    if method != "Method 2":
+        if baggage_path:
+            of = total_consumption(baggage_path)
+        else:
+            of = None
+
+    return baggage_path, of
+
+
+def check_solution(G, edges_list, baggage_path):
+
+    """ It validates a solution of a sweep point (see 'validate_solution')
+    and it returns True if it is feasible, or None if there is no solution
+    to check. """
+
+    if baggage_path is None:
+        return None
+
+    return validate_solution(G, edges_list, baggage_path)["feasible"]
+
+
+def solve_point(method, instance, seed, max_iterations, profile = False,
+                warm_start = None):
+
+    """ It runs one method on its own copy of the instance (see
+    'build_instance'), since the solvers modify the belt statistics and the
+    node buffers. It returns
+    (of, sol_time, stats, valid), where 'of' is the objective function or 
+    None if the solution is infeasible, 'stats' is the Solver_stats of the 
+    run if 'profile' is True (only the heuristics are instrumented), else 
+    None, and 'valid' is the result of 'check_solution'.
+    The LNS is seeded with the instance seed, so that its result does not
+    depend on the worker that runs it. If 'warm_start' is "mcf", the LNS
+    starts from the MCF solution of another copy of the instance, and the
+    MCF time is part of the solution time. """
+
+    G, edges_list = load_point_instance(instance)
+
+    stats = Solver_stats() if profile and method != "Method 3" else None
+
+    sim_time_start = time.time()
+
+    initial_solution = None
+    if method == "Method 2" and warm_start == "mcf":
+        initial_solution = min_cost_computation(*load_point_instance(instance))
+
+    baggage_path, of = run_method(method, G, edges_list, seed, max_iterations,
+                                  stats, initial_solution)
+
+    sim_time_stop = time.time()
+
+    return (of, sim_time_stop - sim_time_start, stats,
+            check_solution(G, edges_list, baggage_path))
+
+
+def bound_instance(instance):
+
+    """ It computes the LP lower bound of an instance built by
+    'build_instance' (see 'lp_lower_bound') and it returns it with its
+    computation time. """
+
+    G, edges_list = load_point_instance(instance)
+
+    bound_time_start = time.time()
+    bound = lp_lower_bound(G, edges_list)["bound"]
+
+    return bound, time.time() - bound_time_start
+
+
+def solve_chain(method, tasks, max_iterations, profile = False):
+
+    """ It runs one method on a chain of sweep points that differ only in
+    min_c, given as a list of (instance, seed), in their order. The LNS
+    (Method 2) of each point starts from the best solution of the previous
+    one, repaired for the new capacities (see 'warm_start_solution'), or
+    from the MCF solution of its instance when there is no previous
+    solution (first point of the chain, or infeasible previous points), like
+    with the "mcf" warm start; the other methods do not use it. It returns the list of the (of, sol_time,
+    stats, valid) of the points, like 'solve_point'. """
+
+    results = []
+    previous_solution = None
+
+    for instance, seed in tasks:
+
+        G, edges_list = load_point_instance(instance)
+
+        stats = Solver_stats() if profile and method != "Method 3" else None
+
+        sim_time_start = time.time()
+
+        initial_solution = previous_solution
+        if method == "Method 2" and initial_solution is None:
+            initial_solution = min_cost_computation(*load_point_instance(instance))
+
+        baggage_path, of = run_method(method, G, edges_list, seed,
+                                      max_iterations, stats,
+                                      initial_solution)
+
+        sim_time_stop = time.time()
+
+        if of is not None:
+            previous_solution = baggage_path
+
+        results.append((of, sim_time_stop - sim_time_start, stats,
+                        check_solution(G, edges_list, baggage_path)))
+
+    return results
+
+
+def run_sweep(grid, workers = None, max_iterations = 100, cache_dir = None,
+              profile = False, warm_start = None, lower_bound = False):
+
+    """
+    This function runs all the points of a sweep 'grid' (see 'build_grid')
+    in a process pool of 'workers' processes (default: one per CPU). Each
+    instance is built only once in the main process and then shared by all
+    the methods of the grid, which are solved in parallel; 'max_iterations'
+    is the number of iterations of the LNS (Method 2). If 'cache_dir' is
+    given, the instances are stored in that on-disk cache and reused by the
+    next sweeps (see 'build_instance'). If 'profile' is True, the
+    heuristics collect their phase timings and counters. 'warm_start' (see
+    WARM_STARTS) is the starting solution of the LNS: None for a random
+    one, "mcf" for the MCF solution of the same instance, "previous" for the
+    best solution of the previous LNS point of the grid whose instance
+    differs only in min_c (these points are then solved in sequence by the
+    same worker, see 'solve_chain'). If 'lower_bound' is True, the LP lower
+    bound of each instance is computed too (see 'lp_lower_bound'). The
+    results are
+    collected as soon as each run finishes and they are returned as a list
+    of dictionaries, in the same order of the grid, with the keys of the
+    point plus: - of: objective function, None if infeasible. - sol_time:
+    solution time [s]. - build_time: time spent to build the instance [s].
+    - stats: Solver_stats of the run (None if not collected). - bound: LP
+    lower bound of the instance (None if not computed). - valid: True if
+    the solution passed 'validate_solution', None if there is no solution.
+
+    """
+
+    if warm_start not in WARM_STARTS:
+        raise ValueError(f"Unknown warm start '{warm_start}'.")
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(grid)))
+
+    results = [None]*len(grid)
+    instances = {}
+
+    # the instance is built the first time its key is found
+    for point in grid:
+        key = instance_key(point)
+        if key not in instances:
+            instances[key] = build_instance(point, cache_dir)
+
+    # the runs of the pool: lists of grid indexes, with one point each or,
+    # for the LNS warm started from the previous point, one chain each
+    runs = []
+    chains = {}
+
+    for index, point in enumerate(grid):
+        if warm_start == "previous" and point["method"] == "Method 2":
+            key = chain_key(point)
+            if key not in chains:
+                chains[key] = []
+                runs.append(chains[key])
+            chains[key].append(index)
+        else:
+            runs.append([index])
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+
+        futures = {}
+
+        for indexes in runs:
+
+            point = grid[indexes[0]]
+            chained = warm_start == "previous" and point["method"] == "Method 2"
+
+            if chained:
+                tasks = [(instances[instance_key(grid[index])][0], grid[index]["seed"])
+                         for index in indexes]
+                future = pool.submit(solve_chain, point["method"], tasks,
+                                     max_iterations, profile)
+            else:
+                future = pool.submit(solve_point, point["method"],
+                                     instances[instance_key(point)][0],
+                                     point["seed"], max_iterations, profile,
+                                     warm_start)
+
+            futures[future] = (indexes, chained)
+
+        bound_futures = {}
+
+        if lower_bound:
+            for key, (instance, build_time) in instances.items():
+                bound_futures[pool.submit(bound_instance, instance)] = key
+
+        bounds = {}
+
+        # results and bounds are collected as soon as each run finishes
+        for future in as_completed(list(futures) + list(bound_futures)):
+
+            if future in bound_futures:
+                bounds[bound_futures[future]] = future.result()[0]
+                continue
+
+            indexes, chained = futures[future]
+            run_results = future.result() if chained else [future.result()]
+
+            for index, (of, sol_time, stats, valid) in zip(indexes, run_results):
+                build_time = instances[instance_key(grid[index])][1]
+                results[index] = dict(grid[index], of=of, sol_time=sol_time,
+                                      build_time=build_time, stats=stats,
+                                      valid=valid)
+
+    # the bound of each instance, if computed, is added to all its results
+    for result in results:
+        result["bound"] = bounds.get(instance_key(result))
+
+    return results